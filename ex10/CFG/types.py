@@ -3,9 +3,12 @@ from CFG.utils import functions_to_dot
 from dataclasses import dataclass, fields, field
 import dataclasses
 from utils.typeshed import check_type
-from typing import Any, Dict, Optional, Union, List
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union, List
 from collections import defaultdict
 
+if TYPE_CHECKING:
+    from CFG.liveness import Liveness
+
 
 class TranslationUnit:
     def __init__(self) -> None:
@@ -98,6 +101,12 @@ class Function:
         Thereby, the data never gets outdated."""
         return CFG(self)
 
+    def liveness(self) -> "Liveness":
+        """Like the CFG, the liveness analysis is calculated every time we are asked for it."""
+        from CFG.liveness import Liveness
+
+        return Liveness(self)
+
     def sort_blocks(self) -> None:
         """Uses breath-first search to order the blocks. This makes the life
         of students hopefully a little bit easier."""
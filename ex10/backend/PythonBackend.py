@@ -0,0 +1,212 @@
+# coding: utf-8
+
+import logging
+from utils import double_dispatch
+from CFG.types import (
+    Add,
+    Assign,
+    Div,
+    Function,
+    Goto,
+    IfGoto,
+    LessEqual,
+    Load,
+    Mul,
+    Reference,
+    Return,
+    Store,
+    Sub,
+    TranslationUnit,
+    Variable,
+    Call,
+    BasicBlock,
+)
+from typing import Optional, Union
+
+logger = logging.getLogger("backend")
+
+
+class PythonBackend:
+    """Translates the IR ahead of time into Python functions.
+
+    Every IR function becomes a Python function with one local per IR
+    variable. The basic blocks are selected by a block-dispatch loop over
+    the block number in the local `bb`. Variables whose address is taken
+    by a Reference instruction live in the shared list `memory` instead
+    (one cell per variable, allocated on function entry); pointers are
+    indices into this list. The generated source is compiled once with
+    compile() and can then be run at CPython speed.
+
+    Like the IR interpreter, the arithmetic is done on unbounded Python
+    integers and Div rounds towards negative infinity.
+    """
+
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+        self.namespace: Optional[dict] = None
+
+    @property
+    def source(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+    def compile(self, filename: str = "<l0>") -> dict:
+        """Compiles the emitted source and returns the namespace of the generated functions."""
+        code = compile(self.source, filename, "exec")
+        self.namespace = {"memory": []}
+        exec(code, self.namespace)
+        return self.namespace
+
+    def run(self, name: str = "main", *args: int) -> int:
+        """Calls the generated function of the IR function `name`."""
+        if self.namespace is None:
+            self.compile()
+        assert self.namespace is not None
+        function = self.namespace[self.mangle_symbol(name)]
+        del self.namespace["memory"][:]
+        try:
+            return function(*args)
+        except RecursionError:
+            raise RuntimeError("Stack Overflow")
+
+    def emit(self, translation_unit: TranslationUnit):
+        for function in translation_unit.functions:
+            self.emit_function(function)
+
+    def emit_line(self, line: str, indent: int = 0):
+        self.lines.append("    " * indent + line)
+
+    def mangle_symbol(self, obj: Union[Function, str]):
+        """Mangle the name of a function to a Python identifier."""
+        if isinstance(obj, Function):
+            obj = obj.label.name
+        return "l0_" + obj
+
+    def emit_function(self, function: Function):
+        assert isinstance(function.entry_block, BasicBlock)
+        self.current_function = function
+
+        # Every variable becomes a local. The index makes the names of shadowed variables unique.
+        self.locals: dict[Variable, str] = {}
+        for idx, var in enumerate(function.parameters + function.variables):
+            self.locals[var] = "v{}_{}".format(idx, var.name)
+
+        # Referenced variables need an address, so they live in memory[base + idx].
+        self.cells: dict[Variable, int] = {}
+        for bb in function.basic_blocks:
+            for instr in bb.instructions:
+                if isinstance(instr, Reference):
+                    assert isinstance(instr.obj, Variable), "Only variables can be referenced"
+                    self.cells.setdefault(instr.obj, len(self.cells))
+
+        # The entry block is block 0, all other blocks follow in their layout order.
+        blocks = [function.entry_block] + [bb for bb in function.basic_blocks if bb != function.entry_block]
+        self.block_ids: dict[BasicBlock, int] = {bb: idx for idx, bb in enumerate(blocks)}
+        # Blocks without a jump fall through to the next block in the layout (like in the interpreter).
+        self.fallthrough: dict[BasicBlock, Optional[BasicBlock]] = dict(
+            zip(function.basic_blocks, function.basic_blocks[1:] + [None])
+        )
+
+        params = [self.locals[param] for param in function.parameters]
+        self.emit_line("def {}({}):".format(self.mangle_symbol(function), ", ".join(params)))
+        self.emit_line("# {}".format(function), 1)
+        others = [self.locals[var] for var in function.variables if var not in self.cells]
+        if others:
+            self.emit_line("{} = 0".format(" = ".join(others)), 1)
+        if self.cells:
+            self.emit_line("base = len(memory)", 1)
+            self.emit_line("memory.extend([0] * {})".format(len(self.cells)), 1)
+            for param in function.parameters:
+                if param in self.cells:
+                    self.emit_line("memory[base + {}] = {}".format(self.cells[param], self.locals[param]), 1)
+
+        if len(blocks) == 1:
+            self.emit_basic_block(function, blocks[0], 1)
+        else:
+            self.emit_line("bb = 0", 1)
+            self.emit_line("while True:", 1)
+            for idx, bb in enumerate(blocks):
+                self.emit_line("{} bb == {}:  # {}".format("if" if idx == 0 else "elif", idx, bb), 2)
+                self.emit_basic_block(function, bb, 3)
+        self.emit_line("")
+
+        logger.info(f"Generated Python function for {function} with {len(blocks)} blocks")
+
+    def emit_basic_block(self, function: Function, bb: BasicBlock, indent: int):
+        self.indent = indent
+        for instr in bb.instructions:
+            double_dispatch(self, "emit_", instr, function, bb)
+            if isinstance(instr, (Return, Goto, IfGoto)):
+                return
+
+        target = self.fallthrough[bb]
+        if target is None:
+            self.emit_line('raise RuntimeError("Missing return in {}")'.format(function), indent)
+        else:
+            self.emit_jump(target)
+
+    ################################################################
+    # Operands
+    def read(self, op: Union[Variable, int]) -> str:
+        if isinstance(op, int):
+            return str(op)
+        if op in self.cells:
+            return "memory[base + {}]".format(self.cells[op])
+        return self.locals[op]
+
+    def write(self, var: Variable, expr: str):
+        self.emit_line("{} = {}".format(self.read(var), expr), self.indent)
+
+    def emit_jump(self, target: BasicBlock):
+        self.emit_line("bb = {}".format(self.block_ids[target]), self.indent)
+        self.emit_line("continue", self.indent)
+
+    ################################################################
+    # Code Generators for each IR instruction
+    def emit_Add(self, instr: Add, function: Function, bb: BasicBlock):
+        self.write(instr.dst, "{} + {}".format(self.read(instr.lhs), self.read(instr.rhs)))
+
+    def emit_Sub(self, instr: Sub, function: Function, bb: BasicBlock):
+        self.write(instr.dst, "{} - {}".format(self.read(instr.lhs), self.read(instr.rhs)))
+
+    def emit_Mul(self, instr: Mul, function: Function, bb: BasicBlock):
+        self.write(instr.dst, "{} * {}".format(self.read(instr.lhs), self.read(instr.rhs)))
+
+    def emit_Div(self, instr: Div, function: Function, bb: BasicBlock):
+        self.write(instr.dst, "{} // {}".format(self.read(instr.lhs), self.read(instr.rhs)))
+
+    def emit_LessEqual(self, instr: LessEqual, function: Function, bb: BasicBlock):
+        self.write(instr.dst, "int({} <= {})".format(self.read(instr.lhs), self.read(instr.rhs)))
+
+    def emit_Assign(self, instr: Assign, function: Function, bb: BasicBlock):
+        self.write(instr.dst, self.read(instr.value))
+
+    def emit_Reference(self, instr: Reference, function: Function, bb: BasicBlock):
+        self.write(instr.dst, "base + {}".format(self.cells[instr.obj]))
+
+    def emit_Load(self, instr: Load, function: Function, bb: BasicBlock):
+        self.write(instr.dst, "memory[{}]".format(self.read(instr.ptr)))
+
+    def emit_Store(self, instr: Store, function: Function, bb: BasicBlock):
+        self.emit_line("memory[{}] = {}".format(self.read(instr.ptr), self.read(instr.value)), self.indent)
+
+    def emit_Goto(self, instr: Goto, function: Function, bb: BasicBlock):
+        self.emit_jump(instr.label.target)
+
+    def emit_IfGoto(self, instr: IfGoto, function: Function, bb: BasicBlock):
+        then_id = self.block_ids[instr.then_label.target]
+        else_id = self.block_ids[instr.else_label.target]
+        self.emit_line("bb = {} if {} else {}".format(then_id, self.read(instr.cond), else_id), self.indent)
+        self.emit_line("continue", self.indent)
+
+    def emit_Call(self, instr: Call, function: Function, bb: BasicBlock):
+        args = ", ".join(self.read(arg) for arg in instr.arguments)
+        self.write(instr.dst, "{}({})".format(self.mangle_symbol(instr.callee), args))
+
+    def emit_Return(self, instr: Return, function: Function, bb: BasicBlock):
+        if self.cells:
+            # Read the value before the cells of the function are released.
+            self.emit_line("ret = {}".format(self.read(instr.value)), self.indent)
+            self.emit_line("del memory[base:]", self.indent)
+            self.emit_line("return ret", self.indent)
+        else:
+            self.emit_line("return {}".format(self.read(instr.value)), self.indent)
@@ -55,9 +55,13 @@ class X86Backend:
             self.RA = SpillingRegisterAllocator(self)
         elif ra == "remember":
             self.RA = RememberingRegisterAllocator(self)
+        elif ra == "linearscan":
+            self.RA = LinearScanRegisterAllocator(self)
+        elif ra == "coloring":
+            self.RA = ColoringRegisterAllocator(self)
         else:
             raise RuntimeError(
-                "Unknown register allocation strategy: %s (possible values: spilling, remember)",
+                "Unknown register allocation strategy: %s (possible values: spilling, remember, linearscan, coloring)",
                 ra,
             )
 
@@ -187,7 +191,8 @@ class X86Backend:
         self.RA.write(lhs, instr.dst)
 
     def emit_Div(self, instr: Div, function: Function, bb: BasicBlock):
-        self.RA.load(0, "%edx")
+        # idiv overwrites %edx with the remainder
+        self.RA.load(0, "%edx", modify=True)
         self.RA.load(instr.lhs, "%eax", modify=True)
         self.RA.load(instr.rhs, "%ecx", modify=True)
         self.emit_instr("idiv", "%ecx")
@@ -212,10 +217,7 @@ class X86Backend:
         self.emit_instr("jmp", self.bb_label(function, instr.else_label.target))
 
     def emit_Assign(self, instr: Assign, function: Function, bb: BasicBlock):
-        src = self.RA.load(instr.value)
-        dst = self.RA.alloc_register()
-        self.emit_instr("mov", src, dst)
-        self.RA.write(dst, instr.dst)
+        self.RA.move(instr.value, instr.dst)
 
     def emit_Reference(self, instr: Reference, function: Function, bb: BasicBlock):
         assert isinstance(instr.obj, Variable)
@@ -415,6 +417,13 @@ class SpillingRegisterAllocator:
         self.backend.emit_instr("lea", self._var_operand(src), dst_reg)
         return dst_reg
 
+    def move(self, src: Union[Variable, int], variable: Variable):
+        """Copies a value to a variable (Assign)."""
+        src_reg = self.load(src)
+        dst_reg = self.alloc_register()
+        self.backend.emit_instr("mov", src_reg, dst_reg)
+        self.write(dst_reg, variable)
+
 
 class RememberingRegisterAllocator(SpillingRegisterAllocator):
     def before_Function(self, function):
@@ -422,21 +431,29 @@ class RememberingRegisterAllocator(SpillingRegisterAllocator):
 
         self.var_referenced: set[Variable] = set()
         # Durchläuft alle Basic Blocks in der Funktion
-        for basic_block in func.basic_blocks:
+        for basic_block in function.basic_blocks:
             # Durchläuft alle Anweisungen im Basic Block
             for instruction in basic_block.instructions:
                 # Überprüft, ob die Anweisung eine Referenz auf ein Variable-Objekt ist
                 if type(instruction) == Reference and type(instruction.obj) == Variable:
                     # Fügt die referenzierte Variable dem Set hinzu
-                    self.referenced_variables.add(instruction.obj)
+                    self.var_referenced.add(instruction.obj)
 
+        # Dirty registers of variables that are not live anymore need no spill.
+        self.liveness = function.liveness()
         self.reset_state()
 
     def before_BasicBlock(self, bb):
         self.reset_state()
+        self.live_after = iter(self.liveness.live_after(bb))
+        self.live_before = self.live = self.liveness.live_in[bb]
 
-    def before_Instruction(self, instr):
+    def before_Instruction(self, instruction):
         self.dump_state()
+        # Variables that are read by this instruction or afterwards
+        live_after = next(self.live_after)
+        self.live = self.live_before | live_after
+        self.live_before = live_after
         self.reg_free: dict[Register, bool] = {reg: True for reg in self.backend.registers}
 
         # Behandelt das Ende eines Basic Blocks (Goto oder IfGoto)
@@ -467,11 +484,11 @@ class RememberingRegisterAllocator(SpillingRegisterAllocator):
                     self._spill_register(reg)
                 self._kill_register(reg)
 
-    def after_Instruction(self, instr):
+    def after_Instruction(self, instruction):
         self.dump_state()
         # Behandelt Aufrufanweisungen (Call)
         if type(instruction) == Call:
-            for reg, value in self.register_values.items():
+            for reg, value in self.reg_values.items():
                 # Überprüft, ob das Register ein Argument ist
                 if value in instruction.arguments:
                     # Leert das Register, da das Argument nicht mehr gebraucht wird
@@ -498,6 +515,9 @@ class RememberingRegisterAllocator(SpillingRegisterAllocator):
         variable = self.reg_values[reg]
         if variable and self.reg_dirty[reg]:
             assert isinstance(variable, Variable)
+            if variable not in self.var_referenced and not self.live & self.liveness.bit(variable):
+                self.reg_dirty[reg] = False
+                return
             self.backend.emit_instr("mov", reg, self._var_operand(variable), comment=f"spill {variable}")
             self.reg_dirty[reg] = False
 
@@ -552,13 +572,17 @@ class RememberingRegisterAllocator(SpillingRegisterAllocator):
                 dst_reg = self._find_register(nonspill=True)
                 if dst_reg:
                     self.backend.emit_instr("mov", cache_reg, dst_reg)
+                else:
+                    # All other registers are dirty: modify the cached register after its spill.
+                    dst_reg = cache_reg
         assert dst_reg is not None, "Above code should decide on an register"
 
         # We only Spill the register, if the user intends to modify
         # the register. If it is only used as a source register thats
-        # just fine.
+        # just fine. A modified register does not cache its value anymore.
         if modify:
             self._spill_register(dst_reg)
+            self._kill_register(dst_reg)
 
         self.reg_free[dst_reg] = False
 
@@ -588,13 +612,17 @@ class RememberingRegisterAllocator(SpillingRegisterAllocator):
             self.backend.emit_instr("mov", "$" + str(src), dst_reg)
         elif isinstance(src, Variable):
             self.backend.emit_instr("mov", self._var_operand(src), dst_reg, comment=f"load {src}")
-        self.reg_values[dst_reg] = src
+        self.reg_values[dst_reg] = None if modify else src
         self.reg_dirty[dst_reg] = False
 
         return dst_reg
 
     def write(self, src_reg, variable):
         assert not self.reg_dirty[src_reg]
+        # Other registers that still cache the variable hold its old value.
+        for reg, value in self.reg_values.items():
+            if reg != src_reg and value == variable:
+                self._kill_register(reg)
         self.reg_values[src_reg] = variable
         self.reg_dirty[src_reg] = True
         # The actual mov to the slot is delayed
@@ -605,3 +633,378 @@ class RememberingRegisterAllocator(SpillingRegisterAllocator):
         self.reg_values[dst_reg] = None
         self.reg_dirty[dst_reg] = False
         return dst_reg
+
+
+class GlobalRegisterAllocator(SpillingRegisterAllocator):
+    """Base class of the allocators that assign every variable a home for the whole function.
+
+    The home of a variable is a register or its stack slot. The liveness of
+    the variables is computed from the IR over the whole function in
+    emission order (analyze()), and the subclasses assign the register homes
+    (allocate()). At every instruction, enough registers must stay free for
+    the scratch registers that the code generator needs (SCRATCH), and the
+    registers that it uses explicitly (FIXED) must not be homes of a live
+    variable. Referenced variables always live in their stack slot.
+
+    Calls and the function entry run in memory mode, like with the spilling
+    allocator. Before a call, the register homes of all live variables are
+    written to their stack slots, so all registers are available to the
+    calling convention. After the call, the homes of the variables that are
+    still live are reloaded. At the function entry, the calling convention
+    writes the parameters to their stack slots, and the register homes of
+    the parameters are loaded before the first instruction.
+    """
+
+    # Number of scratch registers that the code generator allocates for an instruction
+    SCRATCH = {Add: 2, Sub: 2, Mul: 2, Div: 3, LessEqual: 3, Assign: 2, Load: 2, Store: 2, Reference: 1, IfGoto: 1}
+    # Registers that the code generator uses explicitly for an instruction
+    FIXED = {
+        Div: ("%eax", "%ecx", "%edx"),
+        LessEqual: ("%eax",),
+        Return: ("%eax",),
+        # The return value of a call arrives in %eax before the homes are reloaded.
+        Call: ("%eax",),
+    }
+    # Registers that are never fixed are assigned first.
+    PREFERENCE = ("%ebx", "%esi", "%edi", "%ecx", "%edx", "%eax")
+
+    def before_Function(self, function: Function):
+        super().before_Function(function)
+        self.function = function
+        self.analyze(function)
+        self.allocate()
+        self.pos = -1
+        self.memory_mode = True  # Until the first instruction of the entry block
+        homes = ", ".join(f"{var}={reg}" for var, reg in self.home.items())
+        self.backend.emit_comment(f"RA homes: {homes}")
+
+    ################################################################
+    # Liveness and allocation
+    def analyze(self, function: Function):
+        """Computes the instructions in emission order, their live variables, and the live intervals."""
+        assert isinstance(function.entry_block, BasicBlock)
+        blocks = [function.entry_block] + [bb for bb in function.basic_blocks if bb != function.entry_block]
+        liveness = function.liveness()
+
+        # Referenced variables are only accessed through their stack slot.
+        self.referenced = liveness.to_set(liveness.referenced)
+        tracked = liveness.bits(liveness.variables) & ~liveness.referenced
+
+        # Live variables before and after every instruction in emission order. The backend emits
+        # the instructions of a block up to the first return.
+        self.blocks = blocks
+        self.successors = function.CFG().successors
+        self.order: list[Instruction] = []
+        self.block_at: list[BasicBlock] = []
+        self.live_before: list[set] = []
+        self.live_after: list[set] = []
+        defs: list[set] = []
+        for bb in blocks:
+            live = liveness.live_in[bb]
+            for instr, live_after in zip(bb.instructions, liveness.live_after(bb)):
+                self.order.append(instr)
+                self.block_at.append(bb)
+                self.live_before.append(liveness.to_set(live & tracked))
+                self.live_after.append(liveness.to_set(live_after & tracked))
+                defs.append(liveness.to_set(liveness.use_def(instr)[1] & tracked))
+                live = live_after
+                if isinstance(instr, Return):
+                    break
+
+        # Variables that occupy their home at every position, and their live interval [start, end]
+        self.live_at: list[set] = []
+        self.intervals: dict[Variable, list[int]] = {}
+        for pos, instr in enumerate(self.order):
+            self.live_at.append(self.live_before[pos] | self.live_after[pos] | defs[pos])
+            for var in self.live_at[pos]:
+                interval = self.intervals.setdefault(var, [pos, pos])
+                interval[1] = pos
+
+    def allocate(self):
+        """Assigns the homes (self.home) and the occupied homes at every position (self.homes_at)."""
+        raise NotImplementedError()
+
+    ################################################################
+    # Register-Allocation Interface
+    def before_Instruction(self, instr: Instruction):
+        self.pos += 1
+        assert self.order[self.pos] is instr, "Instruction order differs from the liveness analysis"
+
+        if self.memory_mode:
+            # First instruction: Load the parameters, which the calling convention stored in their slots.
+            self.memory_mode = False
+            for param in self.function.parameters:
+                if param in self.home and param in self.live_before[self.pos]:
+                    self.backend.emit_instr("mov", self._var_operand(param), self.home[param], comment=f"load {param}")
+
+        self.available_registers = [reg for reg in self.backend.registers if reg not in self.homes_at[self.pos]]
+
+        if isinstance(instr, Call):
+            # Save the homes of all live variables and leave all registers to the calling convention.
+            for var in self.live_before[self.pos]:
+                if var in self.home:
+                    self.backend.emit_instr("mov", self.home[var], self._var_operand(var), comment=f"save {var}")
+            self.memory_mode = True
+            self.available_registers = list(self.backend.registers)
+
+    def reset_state(self):
+        """Called after a call: Reload the homes of the variables that are still live."""
+        if not self.memory_mode:
+            return
+        instr = self.order[self.pos]
+        for var in self.live_after[self.pos]:
+            if var in self.home and var is not instr.operand_dst():
+                self.backend.emit_instr("mov", self._var_operand(var), self.home[var], comment=f"reload {var}")
+        self.memory_mode = False
+
+    def free_register(self, register: Register):
+        if register in self.homes_at[self.pos] and not self.memory_mode:
+            return  # A register home returned by load()
+        super().free_register(register)
+
+    def load(self, src: Union[Variable, int], dst_reg: Optional[Register] = None, modify=False):
+        if isinstance(src, Variable) and src in self.home and not self.memory_mode:
+            home = self.home[src]
+            if dst_reg is None and not modify:
+                return home
+            dst_reg = self.alloc_register(dst_reg)
+            self.backend.emit_instr("mov", home, dst_reg, comment=f"copy {src}")
+            return dst_reg
+        return super().load(src, dst_reg, modify)
+
+    def write(self, src_reg: Register, variable: Variable):
+        if variable in self.home and not self.memory_mode:
+            if src_reg != self.home[variable]:
+                self.backend.emit_instr("mov", src_reg, self.home[variable])
+            return
+        super().write(src_reg, variable)
+
+    def reference(self, src: Variable, dst_reg: Optional[Register] = None):
+        assert src not in self.home, "Referenced variables live in their stack slot"
+        return super().reference(src, dst_reg)
+
+    def move(self, src: Union[Variable, int], variable: Variable):
+        if self.memory_mode:
+            return super().move(src, variable)
+        if variable not in self.home:
+            self.write(self.load(src), variable)
+        elif isinstance(src, int):
+            self.backend.emit_instr("mov", "$" + str(src), self.home[variable])
+        elif src not in self.home:
+            self.backend.emit_instr("mov", self._var_operand(src), self.home[variable], comment=f"load {src}")
+        elif self.home[src] != self.home[variable]:
+            self.backend.emit_instr("mov", self.home[src], self.home[variable])
+
+
+class LinearScanRegisterAllocator(GlobalRegisterAllocator):
+    """Assigns the register homes by a linear scan over the live intervals (Poletto and Sarkar).
+
+    The live interval of a variable spans all positions from its first to
+    its last liveness. If the registers do not suffice, the interval that
+    ends last is spilled to its stack slot.
+    """
+
+    def allocate(self):
+        """Assigns the registers to the live intervals by a linear scan."""
+        self.home: dict[Variable, Register] = {}
+        # Register homes that are occupied at every position
+        self.homes_at: list[set] = [set() for _ in self.order]
+
+        def fits(var: Variable, reg: Register) -> bool:
+            start, end = self.intervals[var]
+            for pos in range(start, end + 1):
+                occupied = self.homes_at[pos]
+                instr_type = type(self.order[pos])
+                if reg in occupied or reg in self.FIXED.get(instr_type, ()):
+                    return False
+                if len(occupied) + 1 + self.SCRATCH.get(instr_type, 0) > len(self.backend.registers):
+                    return False
+            return True
+
+        def assign(var: Variable, reg: Register):
+            self.home[var] = reg
+            start, end = self.intervals[var]
+            for pos in range(start, end + 1):
+                self.homes_at[pos].add(reg)
+
+        def unassign(var: Variable):
+            reg = self.home.pop(var)
+            start, end = self.intervals[var]
+            for pos in range(start, end + 1):
+                self.homes_at[pos].discard(reg)
+
+        for var in sorted(self.intervals, key=lambda var: tuple(self.intervals[var])):
+            start, end = self.intervals[var]
+            for reg in self.PREFERENCE:
+                if fits(var, reg):
+                    assign(var, reg)
+                    break
+            else:
+                # Spill the overlapping interval that ends last, if this frees a register for var.
+                active = [other for other in self.home if self.intervals[other][1] >= start]
+                victim = max(active, key=lambda other: self.intervals[other][1], default=None)
+                if victim is None or self.intervals[victim][1] <= end:
+                    continue
+                reg = self.home[victim]
+                unassign(victim)
+                if fits(var, reg):
+                    assign(var, reg)
+                else:
+                    assign(victim, reg)
+
+
+class ColoringRegisterAllocator(GlobalRegisterAllocator):
+    """Assigns the register homes by coloring the interference graph (Chaitin, Briggs).
+
+    Two variables interfere if they occupy their homes at the same position.
+    The source and the destination of an Assign are coalesced into one node
+    if they do not interfere otherwise and the merged node stays colorable
+    (conservative coalescing by Briggs), so the Assign needs no instruction.
+    Variables that are live at an instruction with fixed registers never
+    get these registers as home.
+
+    Before the coloring, the variables with the lowest spill cost are spilled
+    until the homes and the scratch registers fit into the registers at
+    every position. The spill cost of a variable counts its uses and
+    definitions, weighted by 10 to the power of the loop depth. Nodes that
+    cannot be colored are spilled as well (optimistic coloring).
+    """
+
+    def loop_depths(self) -> dict[BasicBlock, int]:
+        """Returns the number of natural loops that contain each block."""
+        predecessors: dict[BasicBlock, list[BasicBlock]] = {bb: [] for bb in self.blocks}
+        for bb in self.blocks:
+            for succ in self.successors[bb]:
+                predecessors[succ].append(bb)
+
+        # Back edges lead to a block on the DFS stack, the header of the loop.
+        back_edges: list[tuple[BasicBlock, BasicBlock]] = []
+        visited, on_stack = {self.blocks[0]}, {self.blocks[0]}
+        stack = [(self.blocks[0], iter(self.successors[self.blocks[0]]))]
+        while stack:
+            bb, successors = stack[-1]
+            for succ in successors:
+                if succ in on_stack:
+                    back_edges.append((bb, succ))
+                elif succ not in visited:
+                    visited.add(succ)
+                    on_stack.add(succ)
+                    stack.append((succ, iter(self.successors[succ])))
+                    break
+            else:
+                stack.pop()
+                on_stack.discard(bb)
+
+        # The body of a loop are the blocks that reach a back edge without passing the header.
+        bodies: dict[BasicBlock, set] = {}
+        for tail, header in back_edges:
+            body = bodies.setdefault(header, {header})
+            worklist = [tail]
+            while worklist:
+                bb = worklist.pop()
+                if bb not in body:
+                    body.add(bb)
+                    worklist.extend(predecessors[bb])
+
+        depths = {bb: 0 for bb in self.blocks}
+        for body in bodies.values():
+            for bb in body:
+                depths[bb] += 1
+        return depths
+
+    def allocate(self):
+        """Spills, builds and coalesces the interference graph, and colors it."""
+        K = len(self.backend.registers)
+        # Deterministic order of the variables
+        variables = sorted(self.intervals, key=lambda var: (self.intervals[var], var.name))
+
+        depths = self.loop_depths()
+        cost: dict[Variable, float] = {var: 0 for var in variables}
+        for pos, instr in enumerate(self.order):
+            for op in instr.operands():
+                if isinstance(op, Variable) and op in cost:
+                    cost[op] += 10 ** depths[self.block_at[pos]]
+
+        # Spill until the homes and the scratch registers fit at every position
+        spilled: set = set()
+        for pos, instr in enumerate(self.order):
+            live = [var for var in variables if var in self.live_at[pos] and var not in spilled]
+            while len(live) > K - self.SCRATCH.get(type(instr), 0):
+                victim = min(live, key=lambda var: cost[var] / (self.intervals[var][1] - self.intervals[var][0] + 1))
+                spilled.add(victim)
+                live.remove(victim)
+
+        # Interference graph, excluded registers, and Assign pairs. The code generator writes the
+        # destination after reading the sources, so a destination may share the home of a dying source.
+        nodes = [var for var in variables if var not in spilled]
+        adjacent: dict[Variable, set] = {var: set() for var in nodes}
+        excluded: dict[Variable, set] = {var: set() for var in nodes}
+        moves = []
+
+        def interfere(group: list, others: list):
+            for var in group:
+                for other in others:
+                    if other is not var:
+                        adjacent[var].add(other)
+                        adjacent[other].add(var)
+
+        for pos, instr in enumerate(self.order):
+            for var in self.live_at[pos]:
+                if var in excluded:
+                    excluded[var].update(self.FIXED.get(type(instr), ()))
+            before = [var for var in self.live_before[pos] if var in adjacent]
+            after = [var for var in self.live_after[pos] if var in adjacent]
+            interfere(before, before)
+            interfere(after, after)
+            dst = instr.operand_dst()
+            if dst in adjacent:
+                if isinstance(instr, Assign) and instr.value in adjacent:
+                    moves.append((dst, instr.value))
+                    after = [var for var in after if var is not instr.value]
+                interfere([dst], after)
+
+        # Conservative coalescing: the merged node has less than K neighbors of significant degree.
+        alias: dict[Variable, Variable] = {}
+
+        def find(var: Variable) -> Variable:
+            while var in alias:
+                var = alias[var]
+            return var
+
+        for dst, src in moves:
+            dst, src = find(dst), find(src)
+            if dst is src or src in adjacent[dst]:
+                continue
+            neighbors = adjacent[dst] | adjacent[src]
+            if sum(1 for other in neighbors if len(adjacent[other]) >= K) >= K:
+                continue
+            alias[src] = dst
+            for other in adjacent.pop(src):
+                adjacent[other].discard(src)
+                adjacent[other].add(dst)
+            adjacent[dst] = neighbors
+            excluded[dst] |= excluded.pop(src)
+            cost[dst] += cost[src]
+
+        # Simplify: Remove nodes with less than K neighbors, otherwise the cheapest node per neighbor.
+        graph = {var: set(neighbors) for var, neighbors in adjacent.items()}
+        stack = []
+        while graph:
+            var = next((var for var in graph if len(graph[var]) < K), None)
+            if var is None:
+                var = min(graph, key=lambda var: cost[var] / len(graph[var]))
+            stack.append(var)
+            for other in graph.pop(var):
+                graph[other].discard(var)
+
+        # Select: Color the nodes in reverse order of removal.
+        colors: dict[Variable, Register] = {}
+        for var in reversed(stack):
+            used = {colors[other] for other in adjacent[var] if other in colors}
+            for reg in self.PREFERENCE:
+                if reg not in used and reg not in excluded[var]:
+                    colors[var] = reg
+                    break
+
+        self.home = {var: colors[find(var)] for var in nodes if find(var) in colors}
+        self.homes_at = [{self.home[var] for var in live if var in self.home} for live in self.live_at]
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""Compares the runtime of a program for all register allocators and calling conventions.
+
+Every binary is run several times and the minimum of the `L0 Runtime'
+reported by the x86 runtime is printed.
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+
+from parserll1.generator import load_parser
+from AST.analysis import SemanticAnalysis
+from CFG.codegen import CodeGeneration
+from backend.X86Backend import X86Backend
+
+
+def compile_program(source: str, ra: str, cc: str, elf_fn: str):
+    tree = load_parser("L", silent=True).parse(source)
+    SemanticAnalysis().traversal(tree)
+    ir = CodeGeneration().compile(tree)
+    backend = X86Backend(ra=ra, cc=cc)
+    backend.emit(ir)
+    backend.compile(elf_fn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runtime of the register allocators and calling conventions")
+    parser.add_argument("source", metavar="FILE", help="Source file to compile")
+    parser.add_argument("-n", "--repeat", type=int, default=20, help="Runs per binary")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with open(args.source) as fd:
+        source = fd.read()
+
+    print("{:<12} {:<10} {:>8} {:>14}".format("RA", "CC", "Return", "Runtime [ms]"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for ra in ("spilling", "remember", "linearscan", "coloring"):
+            for cc in ("stack", "register"):
+                elf_fn = os.path.join(tmpdir, f"{ra}-{cc}.elf")
+                compile_program(source, ra, cc, elf_fn)
+                runtimes = []
+                for _ in range(args.repeat):
+                    output = X86Backend.run(elf_fn, silent=True, timeout=10)
+                    runtimes.append(float(output["L0 Runtime"].strip().removesuffix("ms")))
+                print("{:<12} {:<10} {:>8} {:>14.4f}".format(ra, cc, output["L0 Return"].strip(), min(runtimes)))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from CFG.codegen import CodeGeneration
 from CFG.interpreter import Interpreter
 from CFG.optimizer import Optimizer
 from backend.X86Backend import X86Backend
+from backend.PythonBackend import PythonBackend
 
 import os
 import subprocess
@@ -48,8 +49,14 @@ def main():
     interpreter.add_argument("--trace-verbose", action="store_true", help="... dump call frames")
     interpreter.add_argument("--execute-dump", action="store_true", help="Dump interpreter state after execution")
 
+    python = parser.add_argument_group("Python Backend")
+    python.add_argument("--python", action="store_true", help="Translate the program to Python and execute it")
+    python.add_argument("--dump-python", action="store_true", help="Dump the generated Python code")
+
     backend = parser.add_argument_group("X86 Backend")
-    backend.add_argument("--ra", choices=["spilling", "remember"], default="spilling", help="Register Allocator")
+    backend.add_argument(
+        "--ra", choices=["spilling", "remember", "linearscan", "coloring"], default="spilling", help="Register Allocator"
+    )
     backend.add_argument("--cc", choices=["stack", "register"], default="stack", help="Calling Convention")
     backend.add_argument("--dump-asm", action="store_true", help="Dump the Assembler instead of producing a binary")
     backend.add_argument("--run", action="store_true", help="Run the binary directly")
@@ -107,6 +114,16 @@ def main():
 
         return
 
+    if args.python or args.dump_python:
+        python = PythonBackend()
+        python.emit(ir)
+        if args.dump_python:
+            print(python.source)
+            return
+        python.compile(args.source)
+        logging.info("Program returned: %s", python.run())
+        return
+
     backend = X86Backend(ra=args.ra, cc=args.cc)
 
     backend.emit(ir)
@@ -5,6 +5,9 @@ from pathlib import Path
 from AST.analysis import SemanticAnalysis
 from CFG.codegen import CodeGeneration
 from backend.X86Backend import X86Backend
+from backend.PythonBackend import PythonBackend
+from CFG.interpreter import Interpreter
+from CFG.optimizer import Optimizer
 import tempfile
 
 
@@ -91,15 +94,122 @@ class TestBackend(unittest.TestCase):
         else:
             assert False, "Function xchg not found"
 
+    def test_remember_dead_spills(self):
+        """The remembering allocator does not spill variables that are not live anymore."""
+        with open("programs/fib.src") as fd:
+            tree = self.parser.parse(fd.read())
+        SemanticAnalysis().traversal(tree)
+        ir = CodeGeneration().compile(tree)
+
+        backend = X86Backend(ra="remember", cc="stack")
+        spilled = defaultdict(set)
+        backend_emit_instr = backend.emit_instr
+
+        def my_emit(opcode, *args, comment=""):
+            backend_emit_instr(opcode, *args, comment=comment)
+            if comment.startswith("spill "):
+                spilled[backend.current_function.name].add(comment.removeprefix("spill "))
+
+        backend.emit_instr = my_emit
+        backend.emit(ir)
+
+        # The loop body of fib_iter only keeps a, b, and n: tmp, t5, and t6 die within the block.
+        self.assertEqual(spilled["fib_iter"] & {"tmp", "t5", "t6"}, set())
+        self.assertIn("a", spilled["fib_iter"])
+
+    def test_linearscan_memory_operands(self):
+        """The linear-scan allocator keeps variables in registers instead of their stack slots."""
+
+        def memory_operands(ra):
+            _, asm = self._compile("programs/fib.src", cc="register", ra=ra)
+            return sum(1 for instrs in asm.values() for _, args in instrs for arg in args if "(%ebp)" in str(arg))
+
+        self.assertLess(memory_operands("linearscan"), memory_operands("spilling") // 2)
+
+    def test_coloring_coalescing(self):
+        """The coloring allocator gives both sides of an Assign the same home if they do not interfere."""
+        with open("programs/fib.src") as fd:
+            tree = self.parser.parse(fd.read())
+        SemanticAnalysis().traversal(tree)
+        ir = CodeGeneration().compile(tree)
+
+        backend = X86Backend(ra="coloring", cc="register")
+        homes = {}
+        allocate = backend.RA.allocate
 
-for fn, expected in (("fib.src", 2 * 55), ("fastcall.src", 100), ("xchg.src", 42), ("multiarg.src", 82)):
-    for ra in ("spilling", "remember"):
+        def record_homes():
+            allocate()
+            homes[backend.RA.function.name] = {var.name: reg for var, reg in backend.RA.home.items()}
+
+        backend.RA.allocate = record_homes
+        backend.emit(ir)
+
+        # n := n - 1 in the loop of fib_iter: t6 := Sub p0_n, 1; p0_n := Assign t6
+        self.assertIn("t6", homes["fib_iter"])
+        self.assertEqual(homes["fib_iter"]["t6"], homes["fib_iter"]["p0_n"])
+        # Variables that are live across a division or a call never live in the fixed registers.
+        self.assertNotEqual(homes["fib"].get("p0_n"), "%eax")
+
+
+for fn, expected in (
+    ("fib.src", 2 * 55),
+    ("fastcall.src", 100),
+    ("xchg.src", 42),
+    ("multiarg.src", 82),
+    ("reg-cache.src", 62),
+):
+    for ra in ("spilling", "remember", "linearscan", "coloring"):
         for cc in ("stack", "register"):
             name = f"test_{fn.removesuffix('.src')}_{ra}_{cc}"
             test = make_compile_run_test(fn, expected, ra, cc)
             setattr(TestBackend, name, test)
 
 
+class TestPythonBackend(unittest.TestCase):
+    """Test the translation of the IR to Python."""
+
+    def setUp(self):
+        """Load the L0 Grammar."""
+        from parserll1.generator import load_parser
+
+        self.parser = load_parser("L", silent=True)
+
+    def _compile(self, filename, opt=False):
+        with open(filename) as fd:
+            tree = self.parser.parse(fd.read())
+        SemanticAnalysis().traversal(tree)
+        ir = CodeGeneration().compile(tree)
+        if opt:
+            Optimizer().optimize(ir)
+        return ir
+
+    def test_programs(self):
+        """The generated Python code returns the same values as the interpreter."""
+        for filename in sorted(Path("programs").glob("*.src")):
+            for opt in (False, True):
+                with self.subTest(filename=filename.name, opt=opt):
+                    ir = self._compile(filename, opt)
+                    backend = PythonBackend()
+                    backend.emit(ir)
+                    self.assertEqual(backend.run(), Interpreter(ir).exec())
+
+    def test_function_call(self):
+        """Single functions can be called with arguments."""
+        backend = PythonBackend()
+        backend.emit(self._compile("programs/fib.src"))
+        self.assertEqual(backend.run("fib", 20), 6765)
+        self.assertEqual(backend.run("fib_iter", 20), 6765)
+
+    def test_stack_overflow(self):
+        """Unbounded recursion is reported like in the interpreter."""
+        tree = self.parser.parse("func f(n : int) : int { return f(n + 1); } func main() : int { return f(0); }")
+        SemanticAnalysis().traversal(tree)
+        backend = PythonBackend()
+        backend.emit(CodeGeneration().compile(tree))
+        with self.assertRaisesRegex(RuntimeError, "Stack Overflow"):
+            backend.run()
+
+
 # Start unit testing when module is directly loaded.
 if __name__ == "__main__":
     unittest.main()
@@ -1,24 +1,25 @@
+import functools
+import os
 from dataclasses import Field, dataclass, fields, field
 from utils.typeshed import check_type
-from typing import Any, Iterator, Optional, List
+from typing import Any, ClassVar, Iterator, Optional, List
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
+    # Validate the initialization values of every node (see __post_init__). Set L0_VALIDATE=0
+    # or Node.validate = False to construct nodes without the (expensive) runtime type checks.
+    validate: ClassVar[bool] = os.environ.get("L0_VALIDATE", "1") != "0"
+
     def __post_init__(self) -> None:
         """For AST Nodes, we do some validation on the initialization values:
         1. Ensure that all fields are either children or attribute
         2. Children have to be initialized to the correct type
         """
-        for f in fields(self):
-            field_name = "{}.{}".format(type(self).__name__, f.name)
-            assert f.metadata.get("valid"), "The field {} is not annotated as Node.child() or Node.attribute()".format(
-                field_name
-            )
-
-            # Check the type
-            if f.init and f.type:
-                check_type(f.name, getattr(self, f.name), f.type)
+        if not Node.validate:
+            return
+        for name, type_ in _field_info(type(self))[0]:
+            check_type(name, getattr(self, name), type_)
 
     @staticmethod
     def child(multiple: bool = False, repr: bool = False) -> Field:
@@ -26,44 +27,62 @@ class Node:
         return field(init=True, repr=repr, metadata=dict(valid=True, child=True, multiple=multiple))
 
     @staticmethod
-    def attribute(init: bool = False) -> Field:
+    def attribute(init: bool = False, repr: bool = True, compare: bool = True) -> Field:
         """Field initializer for AST children"""
         if init:
-            return field(init=True, metadata=dict(valid=True, child=False))
+            return field(init=True, repr=repr, compare=compare, metadata=dict(valid=True, child=False))
         else:
-            return field(init=False, default=None, metadata=dict(valid=True, child=False))
+            return field(init=False, default=None, repr=repr, compare=compare, metadata=dict(valid=True, child=False))
 
     def name(self) -> str:
         return type(self).__name__
 
     def children(self) -> Iterator[Any]:
-        for f in fields(self):
-            value = getattr(self, f.name)
-            if f.metadata["child"]:
-                if value is None:
-                    continue
-                if f.metadata["multiple"]:
-                    for idx, child in enumerate(value):
-                        yield "{}[{}]".format(f.name, idx), child
-                else:
-                    yield (f.name, value)
-
-
-@dataclass
+        for name, multiple in _field_info(type(self))[1]:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            if multiple:
+                for idx, child in enumerate(value):
+                    yield "{}[{}]".format(name, idx), child
+            else:
+                yield (name, value)
+
+
+@functools.cache
+def _field_info(cls: type) -> tuple[tuple[tuple[str, Any], ...], tuple[tuple[str, bool], ...]]:
+    """Returns the precomputed field metadata of a node class:
+    1. (name, type) of all fields that are checked on initialization
+    2. (name, multiple) of all child fields
+    """
+    checked, children = [], []
+    for f in fields(cls):
+        field_name = "{}.{}".format(cls.__name__, f.name)
+        assert f.metadata.get("valid"), "The field {} is not annotated as Node.child() or Node.attribute()".format(
+            field_name
+        )
+        if f.init and f.type:
+            checked.append((f.name, f.type))
+        if f.metadata["child"]:
+            children.append((f.name, f.metadata["multiple"]))
+    return tuple(checked), tuple(children)
+
+
+@dataclass(slots=True)
 class TypeExpr(Node):
     ...
     # FIXME: Forbid __eq__ and implement specific __eq__ methods (alternative: equal()).
 
 
-@dataclass
+@dataclass(slots=True)
 class Decl(Node): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Stmt(Node): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Expr(Stmt):
     type: TypeExpr = Node.attribute()
 
@@ -72,13 +91,13 @@ class Expr(Stmt):
 # Types
 
 
-@dataclass
+@dataclass(slots=True)
 class TypeInt(TypeExpr):
     def __repr__(self) -> str:
         return "int"
 
 
-@dataclass
+@dataclass(slots=True)
 class TypePointer(TypeExpr):
     pointee: TypeExpr = Node.child(repr=True)
 
@@ -91,7 +110,7 @@ class TypePointer(TypeExpr):
         return self.pointee == other.pointee
 
 
-@dataclass
+@dataclass(slots=True)
 class TypeFunction(TypeExpr):
     return_type: TypeExpr = Node.child(repr=True)
     param_types: List[TypeExpr] = Node.child(repr=True, multiple=True)
@@ -109,32 +128,36 @@ class TypeFunction(TypeExpr):
 # Declarations
 
 
-@dataclass
+@dataclass(slots=True)
 class Identifier(Expr):
     name: str = Node.attribute(init=True)
+    # Declaration the identifier refers to (set by the semantic analysis)
+    decl: Any = Node.attribute(repr=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expr):
     value: int = Node.attribute(init=True)
 
 
-@dataclass
+@dataclass(slots=True)
 class CodeBlock(Node):
     statements: List[Stmt] = Node.child(multiple=True)
 
 
-@dataclass
+@dataclass(slots=True)
 class NamedDecl(Decl):
     name: str = Node.attribute(init=True)
     type: TypeExpr = Node.child()
+    # IR object of the declaration (set by the code generation)
+    ir_obj: Any = Node.attribute(repr=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class VarDecl(NamedDecl, Stmt): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class FuncDecl(NamedDecl):
     params: List[VarDecl] = Node.child(multiple=True)
     statements: List[Stmt] = Node.child(multiple=True)
@@ -144,38 +167,39 @@ class FuncDecl(NamedDecl):
         self.statements = statements
         param_types = [p.type for p in params]
         func_type = TypeFunction(return_type, param_types)
-        super().__init__(name, func_type)
+        # dataclass(slots=True) replaces the class, so the implicit __class__ cell of super() would be stale.
+        super(FuncDecl, self).__init__(name, func_type)
 
     def __repr__(self):
         return f"FuncDecl(name={self.name}, type={self.type})"
 
 
-@dataclass
+@dataclass(slots=True)
 class TranslationUnitDecl(Decl):
     decls: List[NamedDecl] = Node.child(multiple=True)
 
 
 ################################################################
 # Statements
-@dataclass
+@dataclass(slots=True)
 class IfStmt(Stmt):
     cond: Expr = Node.child()
     then_block: CodeBlock = Node.child()
     else_block: Optional[CodeBlock] = Node.child()
 
 
-@dataclass
+@dataclass(slots=True)
 class ReturnStmt(Stmt):
     expr: Expr = Node.child()
 
 
-@dataclass
+@dataclass(slots=True)
 class WhileStmt(Stmt):
     cond: Expr = Node.child()
     body: CodeBlock = Node.child()
 
 
-@dataclass
+@dataclass(slots=True)
 class ForStmt(Stmt):
     init: Expr = Node.child()
     cond: Expr = Node.child()
@@ -183,12 +207,12 @@ class ForStmt(Stmt):
     body: CodeBlock = Node.child()
 
 
-@dataclass
+@dataclass(slots=True)
 class BreakStmt(Stmt):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class ContinueStmt(Stmt):
     pass
 
@@ -197,58 +221,58 @@ class ContinueStmt(Stmt):
 # Expressions
 
 
-@dataclass
+@dataclass(slots=True)
 class UnopExpr(Expr):
     expr: Expr = Node.child()
 
 
-@dataclass
+@dataclass(slots=True)
 class Not(UnopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Neg(UnopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Ref(UnopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Deref(UnopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class BinopExpr(Expr):
     lhs: Expr = Node.child()
     rhs: Expr = Node.child()
 
 
-@dataclass
+@dataclass(slots=True)
 class Assign(BinopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Add(BinopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Sub(BinopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Mul(BinopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Div(BinopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class LessEqual(BinopExpr): ...
 
 
-@dataclass
+@dataclass(slots=True)
 class CallExpr(Expr):
     callee: Identifier = Node.child()
     arguments: List[Expr] = Node.child(multiple=True)
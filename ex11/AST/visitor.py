@@ -3,6 +3,10 @@ from utils import double_dispatch
 from typing import Any, Optional
 
 
+# Stack marker of Visitor._traversal to leave a node
+_LEAVE = object()
+
+
 class Visitor:
     """Base Class for a Pre/Post AST-Tree Visitor."""
 
@@ -29,13 +33,24 @@ class Visitor:
             return self._parent_paths[-1][1]
 
     def _traversal(self, tree: Node) -> None:
-        assert isinstance(tree, Node), "Cannot traverse a non-Node object: " + str(tree)
-        self._dispatch("pre_", tree)
-        for name, child in tree.children():
-            self._parent_paths.append((self, name, child))
-            self._traversal(child)
-            self._parent_paths.pop()
-        self._dispatch("post_", tree)
+        # Iterative pre/post-order traversal with an explicit stack. Thereby, the tree depth is
+        # not limited by Python's recursion limit. An entry is either (name, node) to enter a
+        # child, or (_LEAVE, node) to call the post_ method once all children have been visited.
+        dispatch, parent_paths = self._dispatch, self._parent_paths
+        stack: list = [(None, tree)]
+        while stack:
+            name, node = stack.pop()
+            if name is _LEAVE:
+                dispatch("post_", node)
+                parent_paths.pop()
+                continue
+            assert isinstance(node, Node), "Cannot traverse a non-Node object: " + str(node)
+            parent_paths.append((self, name, node))
+            dispatch("pre_", node)
+            stack.append((_LEAVE, node))
+            children = list(node.children())
+            children.reverse()
+            stack += children
 
 
 class ASTDumper(Visitor):
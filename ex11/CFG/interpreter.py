@@ -1,55 +1,106 @@
 # coding: utf-8
 
 from CFG.types import *
+from CFG.ssa import destruct_ssa, is_ssa
+from CFG.tracing import Observer, TextTracer
+from array import array
 from collections import defaultdict
-from typing import Optional
+from typing import Optional, Sequence
+import operator
+
+
+# Arithmetic of the binary instructions. Keep in Mind this is not 32 Bit Operations.
+BINOPS = {
+    LessEqual: lambda a, b: int(a <= b),
+    Add: operator.add,
+    Sub: operator.sub,
+    Mul: operator.mul,
+    Div: operator.floordiv,
+}
 
 
 class Interpreter:
-    def __init__(self, program: TranslationUnit) -> None:
-        self.memory = [None] * 1001
+    """Executes the IR of a translation unit.
+
+    The instructions are stored in self.code. The data memory is an array
+    of signed 64-bit integers (self.memory) with the following layout:
+
+        0                       null
+        1 ... heap_size         heap
+        stack_base ...          stack, grows upwards on demand
+
+    A call frame occupies the slots bp + 0 ... bp + len(frame_layout) - 1
+    of the stack. The return information of a call (callee, return address,
+    old base pointer, return value address) is kept on a separate control
+    stack (self.frames). The stack grows on demand up to stack_size slots.
+    """
+
+    def __init__(self, program: TranslationUnit, heap_size: int = 1024, stack_size: int = 1 << 24) -> None:
+        self.code: list[Optional[Instruction]] = []
 
         self.labels = {}
+        # (function, basic block) of every instruction address
+        self.locations: list[Optional[tuple[Function, BasicBlock]]] = [None, None]
         # Insert a first function call
         for function in program.functions:
             if function.label.name == "main":
                 main_ret = Variable("main_ret")
                 main_ret.slot = 0
-                self.memory[0] = Call(main_ret, function, [])
-                self.memory[1] = None
+                self.code += [Call(main_ret, function, []), None]
                 break
         else:
             raise RuntimeError("No main function found")
-        self.pc = 2
         for function in program.functions:
             self.load_function(function)
+        self.code.append(None)
+        self.locations.append(None)
+        # All frame layouts are known now, so we can resolve the frame slots.
+        self.ops = self.decode()
+
+        # Data memory. The slot at stack_base receives the return value of main.
+        self.stack_base = 1 + heap_size
+        self.stack_limit = self.stack_base + stack_size
+        self.memory = array("q", bytes(8 * (self.stack_base + 1024)))
+        self.frames: list[tuple] = []
 
         # 4 Register
-        self.hp = self.pc  # Heap Pointer
+        self.hp = 1  # Heap Pointer
         self.pc = 0  # Instruction Pointer
-        self.sp = len(self.memory) - 1  # Stack Pointer
-        self.bp = self.sp  # Base Pointer
+        self.bp = self.stack_base  # Base Pointer
+        self.sp = self.bp + 1  # Stack Pointer (first free slot)
 
         self.step_count = 0
 
     def load_function(self, function: Function) -> None:
+        if is_ssa(function):
+            # Phi instructions cannot be executed, so the function is converted back in place.
+            destruct_ssa(function)
         for bb in function.basic_blocks:
-            self.labels[bb.label] = self.pc  # Next Address
+            self.labels[bb.label] = len(self.code)  # Next Address
             if bb == function.entry_block:
                 self.labels[function.label] = self.labels[bb.label]
-            for instr in bb.instructions:
-                self.memory[self.pc] = instr
-                self.pc += 1
-
-            # Calculate Layout for Call_Frame
-            frame_layout = ["__ret__"]
-            for param in function.parameters:
-                param.slot = len(frame_layout)
-                frame_layout.append(param)
-            for variable in function.variables:
-                variable.slot = len(frame_layout)
-                frame_layout.append(variable)
-            function.frame_layout = frame_layout
+            self.code += bb.instructions
+            self.locations += [(function, bb)] * len(bb.instructions)
+
+        # Calculate Layout for Call_Frame
+        frame_layout = ["__ret__"]
+        for param in function.parameters:
+            param.slot = len(frame_layout)
+            frame_layout.append(param)
+        for variable in function.variables:
+            variable.slot = len(frame_layout)
+            frame_layout.append(variable)
+        function.frame_layout = frame_layout
+
+    def allocate_stack(self, sp: int) -> None:
+        """Makes sure that the stack reaches up to the (exclusive) slot sp."""
+        if sp > self.stack_limit:
+            raise RuntimeError("Stack Overflow")
+        size = len(self.memory)
+        if sp > size:
+            # Grow geometrically, the addresses of existing slots stay valid.
+            size = min(max(sp, 2 * size), self.stack_limit)
+            self.memory.frombytes(bytes(8 * (size - len(self.memory))))
 
     def dump(self) -> None:
         addr_to_label = defaultdict(list)
@@ -57,7 +108,7 @@ class Interpreter:
             addr_to_label[addr].append(label)
 
         dots = False
-        for addr, instr in enumerate(self.memory):
+        for addr, instr in enumerate(self.code):
             if instr is None:
                 if not dots:
                     print("...")
@@ -68,34 +119,287 @@ class Interpreter:
             if addr in addr_to_label:
                 extra = " # {}".format(addr_to_label[addr])
             print("{:>4}   {!r:<30}{}".format(addr, instr, extra))
+        print("Registers: pc={} bp={} sp={} hp={}".format(self.pc, self.bp, self.sp, self.hp))
+        print("Return value of main: {}".format(self.memory[self.stack_base]))
 
     def dump_frame(self, sp: int, bp: int):
-        (callee, return_addr, old_bp, return_value_addr) = self.memory[bp]
+        (callee, return_addr, old_bp, return_value_addr) = self.frames[-1]
         print(
             "| Call Frame: size={}, Return Address=&{}, Return Value=&{}".format(
                 len(callee.frame_layout), return_addr, return_value_addr
             )
         )
-        for idx in reversed(range(sp + 1, bp + 1)):
+        for idx in reversed(range(bp, sp)):
             extra = ""
-            offset = bp - idx
+            offset = idx - bp
             if offset >= 0 and offset < len(callee.frame_layout):
                 extra = "({})".format(callee.frame_layout[offset])
             print("| {:>4} {:<12} {!r:}".format(idx, extra, self.memory[idx]))
         print()
 
-    def exec(self, *args, max_steps: Optional[int] = None, **kwargs) -> int:
-        while max_steps is None or self.step_count <= max_steps:
-            x = self.step(*args, **kwargs)
-            if x is not None:
-                return x
+    def decode(self) -> list:
+        """Pre-decodes the loaded instructions for the fast execution engine (see run()).
+
+        The result is parallel to self.code: Every instruction address
+        holds either a closure or, for calls and returns, a tuple. A closure
+        gets the base pointer and the memory, executes the instruction, and
+        returns the address of the next instruction. Operands are resolved
+        to frame slots or constants, jump labels to absolute addresses.
+        """
+        return [
+            self.decode_instruction(instr, addr + 1) if instr is not None else None
+            for addr, instr in enumerate(self.code)
+        ]
+
+    @staticmethod
+    def decode_operand(op) -> tuple[Optional[int], Optional[int]]:
+        """Returns an operand as (frame slot, None) for variables and (None, constant) for constants."""
+        if isinstance(op, Variable):
+            return (op.slot, None)
+        elif isinstance(op, int):
+            return (None, op)
+        raise RuntimeError("Invalid Operand: {}".format(op))
+
+    def decode_instruction(self, instr: Instruction, next_pc: int):
+        labels = self.labels
+
+        if isinstance(instr, Call):
+            args = tuple(self.decode_operand(arg) for arg in instr.arguments)
+            params = tuple(param.slot for param in instr.callee.parameters)
+            return (
+                Call,
+                instr.callee,
+                len(instr.callee.frame_layout),
+                instr.dst.slot,
+                args,
+                params,
+                labels[instr.callee.label],
+                next_pc,
+            )
+        elif isinstance(instr, Return):
+            return (Return, self.decode_operand(instr.value))
+        elif type(instr) in BINOPS:
+            op = BINOPS[type(instr)]
+            dst = instr.dst.slot
+            (a, a_const), (b, b_const) = map(self.decode_operand, (instr.lhs, instr.rhs))
+            if a is not None and b is not None:
+
+                def run(bp, memory):
+                    memory[bp + dst] = op(memory[bp + a], memory[bp + b])
+                    return next_pc
+
+            elif a is not None:
+
+                def run(bp, memory):
+                    memory[bp + dst] = op(memory[bp + a], b_const)
+                    return next_pc
+
+            elif b is not None:
+
+                def run(bp, memory):
+                    memory[bp + dst] = op(a_const, memory[bp + b])
+                    return next_pc
+
+            elif op is operator.floordiv and b_const == 0:
+                # The division by zero faults when it is executed, not when it is decoded.
+
+                def run(bp, memory):
+                    memory[bp + dst] = op(a_const, b_const)
+                    return next_pc
+
+            else:
+                value = op(a_const, b_const)
+
+                def run(bp, memory):
+                    memory[bp + dst] = value
+                    return next_pc
+
+        elif isinstance(instr, Assign):
+            dst = instr.dst.slot
+            src, value = self.decode_operand(instr.value)
+            if src is not None:
+
+                def run(bp, memory):
+                    memory[bp + dst] = memory[bp + src]
+                    return next_pc
 
-    def step(self, trace: bool = False, calls: bool = False, frames: bool = False) -> Optional[int]:
+            else:
+
+                def run(bp, memory):
+                    memory[bp + dst] = value
+                    return next_pc
+
+        elif isinstance(instr, Reference):
+            dst, obj = instr.dst.slot, instr.obj.slot
+
+            def run(bp, memory):
+                memory[bp + dst] = bp + obj
+                return next_pc
+
+        elif isinstance(instr, Store):
+            ptr = instr.ptr.slot
+            src, value = self.decode_operand(instr.value)
+            if src is not None:
+
+                def run(bp, memory):
+                    memory[memory[bp + ptr]] = memory[bp + src]
+                    return next_pc
+
+            else:
+
+                def run(bp, memory):
+                    memory[memory[bp + ptr]] = value
+                    return next_pc
+
+        elif isinstance(instr, Load):
+            dst, ptr = instr.dst.slot, instr.ptr.slot
+
+            def run(bp, memory):
+                memory[bp + dst] = memory[memory[bp + ptr]]
+                return next_pc
+
+        elif isinstance(instr, IfGoto):
+            then_pc, else_pc = labels[instr.then_label], labels[instr.else_label]
+            cond, value = self.decode_operand(instr.cond)
+            if cond is not None:
+
+                def run(bp, memory):
+                    return then_pc if memory[bp + cond] != 0 else else_pc
+
+            else:
+                target = then_pc if value != 0 else else_pc
+
+                def run(bp, memory):
+                    return target
+
+        elif isinstance(instr, Goto):
+            target = labels[instr.label]
+
+            def run(bp, memory):
+                return target
+
+        else:
+
+            def run(bp, memory):
+                raise RuntimeError("Unsupported Operation: {}".format(instr))
+
+        return run
+
+    def exec(
+        self,
+        trace: bool = False,
+        calls: bool = False,
+        frames: bool = False,
+        max_steps: Optional[int] = None,
+        observers: Sequence[Observer] = (),
+    ) -> Optional[int]:
+        """Executes the program until main returns or more than max_steps
+        instructions have been executed.
+
+        The observers get notified about every instruction, call and return
+        (see CFG.tracing.Observer). The trace, calls and frames flags add
+        a TextTracer. Without observers, the program runs on the fast path
+        without any per-step hooks.
+        """
+        if trace or calls or frames:
+            observers = [*observers, TextTracer(trace, calls, frames)]
+        if observers:
+            return self.run_observed(observers, max_steps)
+        return self.run(max_steps)
+
+    def run(self, max_steps: Optional[int] = None) -> Optional[int]:
+        """Executes the pre-decoded program (see decode()) until main returns or
+        more than max_steps instructions have been executed.
+
+        Counts the steps and updates the registers like step().
+        """
+        memory, ops, frames = self.memory, self.ops, self.frames
+        pc, bp, sp = self.pc, self.bp, self.sp
+        capacity = len(memory)
+        steps = self.step_count
+        limit = float("inf") if max_steps is None else max_steps
+        try:
+            while steps <= limit:
+                steps += 1
+                op = ops[pc]
+                if op.__class__ is not tuple:
+                    if op is None:
+                        pc += 1
+                        return memory[self.stack_base]
+                    pc = op(bp, memory)
+                elif op[0] is Call:
+                    _, callee, frame_size, dst, args, params, entry, return_pc = op
+                    values = [memory[bp + slot] if slot is not None else value for slot, value in args]
+                    # Allocate Space on the stack for the Call Frame
+                    if sp + frame_size > capacity:
+                        self.allocate_stack(sp + frame_size)
+                        capacity = len(memory)
+                    # Return Information
+                    frames.append((callee, return_pc, bp, bp + dst))
+                    bp = sp
+                    sp += frame_size
+                    # Insert Arguments into the Call Frame
+                    for slot, value in zip(params, values):
+                        memory[bp + slot] = value
+                    pc = entry
+                else:
+                    slot, value = op[1]
+                    (_, old_pc, old_bp, return_value_ref) = frames.pop()
+                    memory[return_value_ref] = memory[bp + slot] if slot is not None else value
+                    sp, bp, pc = bp, old_bp, old_pc
+            return None
+        finally:
+            self.pc, self.bp, self.sp = pc, bp, sp
+            self.step_count = steps
+
+    def run_observed(self, observers: Sequence[Observer], max_steps: Optional[int] = None) -> Optional[int]:
+        """Like run(), but notifies the observers. Before every hook, the
+        registers and the step count of the interpreter are up to date."""
+        memory, ops, frames = self.memory, self.ops, self.frames
+        on_instr = [observer.on_instr for observer in observers]
+        on_call = [observer.on_call for observer in observers]
+        on_return = [observer.on_return for observer in observers]
+        limit = float("inf") if max_steps is None else max_steps
+        while self.step_count <= limit:
+            self.step_count += 1
+            pc, bp = self.pc, self.bp
+            for hook in on_instr:
+                hook(self, pc)
+            op = ops[pc]
+            if op.__class__ is not tuple:
+                self.pc = pc + 1
+                if op is None:
+                    return memory[self.stack_base]
+                self.pc = op(bp, memory)
+            elif op[0] is Call:
+                _, callee, frame_size, dst, args, params, entry, return_pc = op
+                values = [memory[bp + slot] if slot is not None else value for slot, value in args]
+                self.allocate_stack(self.sp + frame_size)
+                frames.append((callee, return_pc, bp, bp + dst))
+                self.bp = bp = self.sp
+                self.sp += frame_size
+                for slot, value in zip(params, values):
+                    memory[bp + slot] = value
+                self.pc = entry
+                for hook in on_call:
+                    hook(self, callee, values)
+            else:
+                slot, value = op[1]
+                value = memory[bp + slot] if slot is not None else value
+                for hook in on_return:
+                    hook(self, frames[-1][0], value)
+                (_, old_pc, old_bp, return_value_ref) = frames.pop()
+                memory[return_value_ref] = value
+                self.sp, self.bp, self.pc = bp, old_bp, old_pc
+        return None
+
+    def step(self) -> Optional[int]:
+        """Executes a single instruction, without the pre-decoded instructions."""
         self.step_count += 1
 
         def read(op):
             if isinstance(op, Variable):
-                return self.memory[self.bp - op.slot]
+                return self.memory[self.bp + op.slot]
             elif isinstance(op, int):
                 return op
             else:
@@ -104,59 +408,37 @@ class Interpreter:
                 )
 
         # Instruction Fetch
-        instr = self.memory[self.pc]
-        if trace:
-            print("TRACE", self.pc, instr)
-            if frames and self.bp != self.sp:
-                self.dump_frame(self.sp, self.bp)
+        instr = self.code[self.pc]
         self.pc += 1
         if isinstance(instr, Call):
             args = [read(arg) for arg in instr.arguments]
-            if calls:
-                print("CALL", instr.callee, instr.arguments)
             # Allocate Space on the stack for the Call Frame
+            self.allocate_stack(self.sp + len(instr.callee.frame_layout))
             old_bp = self.bp
             self.bp = self.sp
-            self.sp = self.sp - len(instr.callee.frame_layout)
-            if self.sp < self.hp:
-                raise RuntimeError("Stack Overflow")
+            self.sp = self.sp + len(instr.callee.frame_layout)
             # Return Information
-            self.memory[self.bp - 0] = (instr.callee, self.pc, old_bp, old_bp - instr.dst.slot)
+            self.frames.append((instr.callee, self.pc, old_bp, old_bp + instr.dst.slot))
             # Insert Arguments into the Call Frame
             for param, arg in zip(instr.callee.parameters, args):
-                self.memory[self.bp - param.slot] = arg
+                self.memory[self.bp + param.slot] = arg
             self.pc = self.labels[instr.callee.label]
 
-            if calls and frames:
-                self.dump_frame(self.sp, self.bp)
-
         elif isinstance(instr, Return):
-            (callee, old_pc, old_bp, return_value_ref) = self.memory[self.bp]
             return_value = read(instr.value)
-            if calls:
-                print("RETURN", callee, return_value)
-            if calls and frames:
-                self.dump_frame(self.sp, self.bp)
+            (callee, old_pc, old_bp, return_value_ref) = self.frames.pop()
             self.memory[return_value_ref] = return_value
             self.sp = self.bp
             self.bp = old_bp
             self.pc = old_pc
-        elif isinstance(instr, (LessEqual, Add, Sub, Mul, Div, Assign)):
-            ops = list(map(read, instr.operands_src()))
-            # Keep in Mind this is not 32 Bit Operations. I'm sorry Mum
-            operations = {
-                LessEqual: lambda a, b: int(a <= b),
-                Add: lambda a, b: (a + b),
-                Sub: lambda a, b: (a - b),
-                Mul: lambda a, b: (a * b),
-                Div: lambda a, b: (a // b),
-                Assign: lambda x: x,
-            }
-            value = operations[type(instr)](*ops)
-            self.memory[self.bp - instr.dst.slot] = value
+        elif isinstance(instr, (LessEqual, Add, Sub, Mul, Div)):
+            value = BINOPS[type(instr)](read(instr.lhs), read(instr.rhs))
+            self.memory[self.bp + instr.dst.slot] = value
+        elif isinstance(instr, Assign):
+            self.memory[self.bp + instr.dst.slot] = read(instr.value)
         elif isinstance(instr, Reference):
-            ref = self.bp - instr.obj.slot
-            self.memory[self.bp - instr.dst.slot] = ref
+            ref = self.bp + instr.obj.slot
+            self.memory[self.bp + instr.dst.slot] = ref
 
         elif isinstance(instr, Store):
             ptr = read(instr.ptr)
@@ -164,7 +446,7 @@ class Interpreter:
             self.memory[ptr] = value
         elif isinstance(instr, Load):
             ptr = read(instr.ptr)
-            self.memory[self.bp - instr.dst.slot] = self.memory[ptr]
+            self.memory[self.bp + instr.dst.slot] = self.memory[ptr]
         elif isinstance(instr, IfGoto):
             if read(instr.cond) != 0:
                 self.pc = self.labels[instr.then_label]
@@ -173,6 +455,6 @@ class Interpreter:
         elif isinstance(instr, Goto):
             self.pc = self.labels[instr.label]
         elif instr is None:
-            return self.memory[-1]
+            return self.memory[self.stack_base]
         else:
             raise RuntimeError("Unsupported Operation: {}".format(instr))
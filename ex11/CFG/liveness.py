@@ -0,0 +1,116 @@
+from typing import TYPE_CHECKING, Iterable
+from CFG.types import Instruction, Reference, Variable
+
+if TYPE_CHECKING:
+    from CFG.types import BasicBlock, Function
+
+
+class Liveness:
+    """Live variables of a function (backward dataflow analysis).
+
+    A variable is live at a point if its value might be read later on some
+    path through the CFG. Sets of variables are bit sets (Python integers),
+    where index[var] is the bit of var, so the transfer and merge functions
+    are a few integer operations per block. Use to_set() to convert a bit
+    set into a set of variables.
+
+    The analysis computes live_in and live_out per block. live_after(bb)
+    returns the variables that are live after each instruction of bb and is
+    computed on demand. Variables whose address is taken by a Reference
+    (referenced) can also be read through a pointer, so a write to them is
+    never dead, even if they are not live.
+    """
+
+    def __init__(self, function: "Function") -> None:
+        self.index: dict[Variable, int] = {}
+        self.variables: list[Variable] = []
+        for var in function.parameters + function.variables:
+            self.bit(var)
+
+        # Uses before any definition (gen) and definitions (kill) of every block
+        self.referenced = 0
+        self.gen: dict["BasicBlock", int] = {}
+        self.kill: dict["BasicBlock", int] = {}
+        for bb in function.basic_blocks:
+            gen = kill = 0
+            for instr in reversed(bb.instructions):
+                uses, defs = self.use_def(instr)
+                gen = (gen & ~defs) | uses
+                kill |= defs
+                if isinstance(instr, Reference) and isinstance(instr.obj, Variable):
+                    self.referenced |= self.bit(instr.obj)
+            self.gen[bb], self.kill[bb] = gen, kill
+
+        # Iterate until the live variables at the block boundaries are stable. Blocks are visited
+        # against the layout order, which is roughly the postorder.
+        CFG = function.CFG()
+        self.live_in: dict["BasicBlock", int] = dict.fromkeys(function.basic_blocks, 0)
+        self.live_out: dict["BasicBlock", int] = dict.fromkeys(function.basic_blocks, 0)
+        worklist = list(function.basic_blocks)
+        queued = set(worklist)
+        while worklist:
+            bb = worklist.pop()
+            queued.discard(bb)
+            live_out = 0
+            for succ in CFG.successors[bb]:
+                live_out |= self.live_in[succ]
+            self.live_out[bb] = live_out
+            live_in = self.gen[bb] | (live_out & ~self.kill[bb])
+            if live_in != self.live_in[bb]:
+                self.live_in[bb] = live_in
+                for pred in CFG.predecessors[bb]:
+                    if pred not in queued and pred in self.live_in:
+                        queued.add(pred)
+                        worklist.append(pred)
+
+        self._live_after: dict["BasicBlock", list[int]] = {}
+
+    def bit(self, var: Variable) -> int:
+        """Returns the bit of a variable, variables without a bit get the next free one."""
+        idx = self.index.get(var)
+        if idx is None:
+            idx = self.index[var] = len(self.variables)
+            self.variables.append(var)
+        return 1 << idx
+
+    def bits(self, variables: Iterable[Variable]) -> int:
+        ret = 0
+        for var in variables:
+            ret |= self.bit(var)
+        return ret
+
+    def to_set(self, bits: int) -> set[Variable]:
+        ret = set()
+        while bits:
+            low = bits & -bits
+            ret.add(self.variables[low.bit_length() - 1])
+            bits ^= low
+        return ret
+
+    def use_def(self, instr: Instruction) -> tuple[int, int]:
+        """Returns the variables read (uses) and written (defs) by an instruction."""
+        index = self.index
+        uses = 0
+        for op in instr.operands_src():
+            if isinstance(op, Variable):
+                idx = index.get(op)
+                uses |= self.bit(op) if idx is None else 1 << idx
+        dst = instr.operand_dst()
+        if not isinstance(dst, Variable):
+            return uses, 0
+        idx = index.get(dst)
+        return uses, self.bit(dst) if idx is None else 1 << idx
+
+    def live_after(self, bb: "BasicBlock") -> list[int]:
+        """Returns the variables that are live after each instruction of bb."""
+        ret = self._live_after.get(bb)
+        if ret is None:
+            ret = []
+            live = self.live_out[bb]
+            for instr in reversed(bb.instructions):
+                ret.append(live)
+                uses, defs = self.use_def(instr)
+                live = (live & ~defs) | uses
+            ret.reverse()
+            self._live_after[bb] = ret
+        return ret
@@ -17,11 +17,16 @@ from CFG.types import (
     Store,
     Call,
     Return,
+    Phi,
+    Instruction,
+    _operand_info,
 )
 from utils import double_dispatch  # type: ignore
-from CFG.utils import EquivalenceClasses  # For the constant value propagation
+from CFG.utils import EquivalenceClasses, forward_dataflow  # For the constant value propagation
+from CFG.ssa import construct_ssa  # For the sparse conditional constant propagation
 import logging
-from typing import Optional, Tuple, Union
+from collections import Counter
+from typing import Any, ClassVar, Iterable, Optional, Tuple, Union
 
 logger = logging.getLogger("optimizer")
 
@@ -31,6 +36,8 @@ class Optimizer:
         self.optimizers = []
         # Look at a single Instruction
         self.optimizers.append(ConstantFolding())
+        # Look at the executable paths of the whole function
+        self.optimizers.append(SparseConditionalConstantPropagation())
         # Look at a whole basic block
         self.optimizers.append(ConstantValuePropagation())
         # CFG-Optimization
@@ -38,37 +45,132 @@ class Optimizer:
         self.optimizers.append(RedundantJumpElimination())
         # Garbage Cleanup
         self.optimizers.append(DeadBlockElimination())
+        self.optimizers.append(DeadStoreElimination())
         self.optimizers.append(DeadVariableElimination())
 
     def optimize(self, program: TranslationUnit) -> None:
         for func in program.functions:
             self.optimize_function(func)
+        for name, stats in self.stats().items():
+            if stats:
+                logger.info(f"{name}: {dict(stats)}")
 
     def optimize_function(self, function: Function) -> bool:
-        changed = True
-        while changed:
-            changed = False
+        """Runs the passes until no pass changes the function anymore.
+
+        Instead of rerunning all passes until none of them reports a change,
+        a worklist keeps the passes that are affected by the changes so far.
+        After a pass has changed some blocks, only the passes triggered by
+        this kind of change are scheduled again. Local passes are only run
+        on the changed blocks. Like before, the passes run in rounds in the
+        pipeline order, but a round skips all passes that are not pending.
+        """
+        # Pending passes with the blocks to look at (used by local passes only)
+        pending: dict[OptimizerPass, dict[BasicBlock, None]] = {
+            optimizer: dict.fromkeys(function.basic_blocks) for optimizer in self.optimizers
+        }
+        changed = False
+        while pending:
             for optimizer in self.optimizers:
-                c = optimizer.optimize_function(function)
+                if optimizer not in pending:
+                    continue
+                blocks = pending.pop(optimizer)
+                before = optimizer.stats.copy()
+                optimizer.changes = {}
+                if optimizer.local:
+                    # Skip blocks that have been removed in the meantime
+                    CFG = function.CFG()
+                    c = optimizer.optimize_blocks(function, [bb for bb in blocks if bb in CFG.successors])
+                else:
+                    c = optimizer.optimize_function(function)
                 if c:
-                    logger.info(f"{function} changed by {optimizer.__class__.__name__}")
+                    delta = dict(optimizer.stats - before)
+                    logger.info(f"{function} changed by {optimizer.__class__.__name__}: {delta}")
                     changed = True
+                    self.schedule(function, optimizer.changes, pending)
         return changed
 
+    def schedule(
+        self,
+        function: Function,
+        changes: dict[str, dict[BasicBlock, None]],
+        pending: dict["OptimizerPass", dict[BasicBlock, None]],
+    ) -> None:
+        """Schedules the passes that are triggered by the changes of a pass."""
+        if "cfg" in changes:
+            # Changed edges also affect the (new) successors of the changed blocks.
+            CFG = function.CFG()
+            blocks = dict(changes["cfg"])
+            for bb in changes["cfg"]:
+                blocks.update(dict.fromkeys(CFG.successors.get(bb, ())))
+            changes = dict(changes, cfg=blocks)
+        for kind, blocks in changes.items():
+            for optimizer in self.optimizers:
+                if kind in optimizer.triggers:
+                    pending.setdefault(optimizer, {}).update(blocks)
+
+    def stats(self) -> dict[str, Counter]:
+        """Returns the statistics of every pass, accumulated over all optimized functions."""
+        return {optimizer.__class__.__name__: optimizer.stats for optimizer in self.optimizers}
+
+
+class OptimizerPass:
+    """Base class of the optimizer passes.
+
+    optimize_function() returns whether the pass changed the function. The
+    pass counts its changes by kind (e.g. "instructions rewritten", "blocks
+    removed") in self.stats, accumulated over all optimized functions.
+
+    For the worklist of the Optimizer, a pass reports the blocks it changed
+    with changed(): "instructions" if instructions were rewritten, inserted
+    or removed and "cfg" if the edges of the block changed. The pass is
+    scheduled again after a change of a kind in its triggers. Local passes
+    look at single blocks only and implement optimize_blocks(), which the
+    Optimizer calls with the changed blocks.
+    """
+
+    local: ClassVar[bool] = False
+    triggers: ClassVar[frozenset[str]] = frozenset({"instructions", "cfg"})
+
+    def __init__(self) -> None:
+        self.stats: Counter[str] = Counter()
+        self.changes: dict[str, dict[BasicBlock, None]] = {}
+
+    def optimize_function(self, function: Function) -> bool:
+        if self.local:
+            return self.optimize_blocks(function, list(function.basic_blocks))
+        raise NotImplementedError
+
+    def optimize_blocks(self, function: Function, blocks: Iterable[BasicBlock]) -> bool:
+        raise NotImplementedError
+
+    def count(self, kind: str, n: int = 1) -> None:
+        self.stats[kind] += n
+
+    def changed(self, kind: str, bb: BasicBlock) -> None:
+        self.changes.setdefault(kind, {})[bb] = None
+
 
 ################################################################
 # Part 1: Constant Folding
 
 
-class ConstantFolding:
-    def optimize_function(self, function: Function) -> bool:
+class ConstantFolding(OptimizerPass):
+    local = True
+    triggers = frozenset({"instructions"})
+
+    def optimize_blocks(self, function: Function, blocks: Iterable[BasicBlock]) -> bool:
         changed = False
-        for bb in function.basic_blocks:
+        for bb in blocks:
             for idx, instr in enumerate(bb.instructions):
                 replace = double_dispatch(self, "fold_", instr, ignore_missing=True)
                 if replace:
                     logger.debug(f"Constant-Folding: {instr} -> {replace}")
                     bb.instructions[idx] = replace
+                    self.count("instructions rewritten")
+                    self.changed("instructions", bb)
+                    if isinstance(replace, Goto):
+                        self.changed("cfg", bb)
                     changed = True
         return changed
 
@@ -107,37 +209,29 @@ class ConstantFolding:
 # Part 2: ConstantValuePropagation
 
 
-class ConstantValuePropagation:
-    def optimize_function(self, function: Function) -> bool:
-        changed = False
-        CFG = function.CFG()
-
-        states: dict[BasicBlock, EquivalenceClasses] = {}
-        for bb in function.basic_blocks:
-            states[bb] = EquivalenceClasses()
+def _differs(new: Any, old: Any) -> bool:
+    """Returns whether a rewrite replaced the operand old by a different operand new."""
+    # Equal integers are not necessarily the same object.
+    return new is not old and not (isinstance(new, int) and isinstance(old, int) and new == old)
 
-        worklist = list(function.basic_blocks)
-        while worklist != []:
-            bb = worklist.pop(0)
 
-            if bb != function.entry_block:
-                d_ins = [states[pred] for pred in CFG.predecessors[bb]]
-                d_in = EquivalenceClasses.merge(d_ins)
-            else:
-                d_in = EquivalenceClasses()
+class ConstantValuePropagation(OptimizerPass):
+    def optimize_function(self, function: Function) -> bool:
+        changed = False
 
+        def transfer(bb: BasicBlock, d_in: EquivalenceClasses) -> EquivalenceClasses:
+            nonlocal changed
             block_changed, d_out = self.transform(bb, d_in)
-
-            if d_out != states[bb]:
-                states[bb] = d_out
-                for succ in CFG.successors[bb]:
-                    worklist.append(succ)
-
             # Did the transformation change the instructions?
             changed = changed or block_changed
+            return d_out
 
-        for bb in function.basic_blocks:
-            logger.debug(f"{function}: {bb} after_state: {states[bb]}")
+        empty: EquivalenceClasses = EquivalenceClasses()
+        states = forward_dataflow(function, empty, empty, transfer, EquivalenceClasses.merge)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            for bb in function.basic_blocks:
+                logger.debug(f"{function}: {bb} after_state: {states[bb]}")
 
         return changed
 
@@ -158,23 +252,40 @@ class ConstantValuePropagation:
                     return elem
             return operand
 
+        def rewrite(instr, name):
+            """Replaces the operand instr.<name> and returns whether it changed."""
+            old = getattr(instr, name)
+            new = replace(old)
+            if _differs(new, old):
+                setattr(instr, name, new)
+                return True
+            return False
+
+        debug = logger.isEnabledFor(logging.DEBUG)
         for instr in bb.instructions:
-            old_str = repr(instr)
+            old_str = repr(instr) if debug else None
             if isinstance(instr, BinopInstruction):
-                instr.lhs = replace(instr.lhs)
-                instr.rhs = replace(instr.rhs)
+                # Both operands are rewritten (no short-circuit)
+                instr_changed = rewrite(instr, "lhs") | rewrite(instr, "rhs")
             elif isinstance(instr, (Assign, Store, Return)):
-                instr.value = replace(instr.value)
+                instr_changed = rewrite(instr, "value")
             elif isinstance(instr, Call):
-                r = replace(instr.callee)
-                assert isinstance(r, Function)
-                instr.callee = r
-                instr.arguments = [replace(a) for a in instr.arguments]
+                instr_changed = rewrite(instr, "callee")
+                assert isinstance(instr.callee, Function)
+                arguments = [replace(a) for a in instr.arguments]
+                if any(_differs(new, old) for new, old in zip(arguments, instr.arguments)):
+                    instr.arguments = arguments
+                    instr_changed = True
             elif isinstance(instr, IfGoto):
-                instr.cond = replace(instr.cond)
+                instr_changed = rewrite(instr, "cond")
+            else:
+                instr_changed = False
 
-            if old_str != repr(instr):
-                logger.debug(f"Value-Propagation: '{old_str}' -> '{instr}', values={equivalences}")
+            if instr_changed:
+                if debug:
+                    logger.debug(f"Value-Propagation: '{old_str}' -> '{instr}', values={equivalences}")
+                self.count("instructions rewritten")
+                self.changed("instructions", bb)
                 changed = True
 
             # Kill Equivalences
@@ -196,9 +307,11 @@ class ConstantValuePropagation:
 # Part 3: CFG-Optimization
 
 
-class MergeBlocks:
+class MergeBlocks(OptimizerPass):
     """Merge two blocks if they are strictly subsequent"""
 
+    triggers = frozenset({"cfg"})
+
     def optimize_function(self, function: Function) -> bool:
         changed = False
         CFG = function.CFG()
@@ -217,56 +330,67 @@ class MergeBlocks:
             if len(predecessors) != 1:
                 continue
     
-            # Merge instructions
+            # Merge instructions. The cached CFG follows the modified terminators of both blocks.
             block.instructions = block.instructions[:-1] + successor.instructions
-    
-            # Update CFG
-            CFG.successors[block] = CFG.successors[successor]
-    
-            # Invalidate the successor block
-            CFG.predecessors[successor] = []
-            CFG.successors[successor] = []
             successor.instructions = []
+            self.count("blocks merged")
+            self.changed("instructions", block)
+            self.changed("cfg", block)
+            self.changed("cfg", successor)
     
             changed = True
 
         return changed
 
 
-class RedundantJumpElimination:
-    def optimize_function(self, function: Function) -> bool:
+class RedundantJumpElimination(OptimizerPass):
+    local = True
+
+    def optimize_blocks(self, function: Function, blocks: Iterable[BasicBlock]) -> bool:
         changed = False
         CFG = function.CFG()
 
-        for this in function.basic_blocks:
+        for this in blocks:
             if len(CFG.successors[this]) == 1 and len(this.instructions) == 1:
                 goto_label = CFG.successors[this][0].label
                 for prev in CFG.predecessors[this]:
                     logger.debug(f"Dead-Code Elimination: {prev} -> {this} -> {goto_label}")
+                    # Replace the terminator instead of modifying it to keep the cached CFG current.
                     last_instr = prev.instructions[-1]
                     if isinstance(last_instr, Goto):
                         assert last_instr.label == this.label
-                        last_instr.label = goto_label
+                        prev.instructions[-1] = last_instr.replace(label=goto_label)
+                        self.count("jumps redirected")
+                        self.changed("cfg", prev)
                         changed = True
                     if isinstance(last_instr, IfGoto):
-                        if last_instr.then_label == this.label:
-                            last_instr.then_label = goto_label
-                            changed = True
-                        if last_instr.else_label == this.label:
-                            last_instr.else_label = goto_label
+                        then_label, else_label = last_instr.then_label, last_instr.else_label
+                        if then_label == this.label:
+                            then_label = goto_label
+                        if else_label == this.label:
+                            else_label = goto_label
+                        if (then_label, else_label) != (last_instr.then_label, last_instr.else_label):
+                            prev.instructions[-1] = last_instr.replace(then_label=then_label, else_label=else_label)
+                            self.count("jumps redirected")
+                            self.changed("cfg", prev)
                             changed = True
 
             # Remove everything after an return statement
             for idx, instr in enumerate(this.instructions):
                 if isinstance(instr, Return) and len(this.instructions[idx + 1 :]) > 0:
+                    self.count("instructions removed", len(this.instructions) - idx - 1)
                     del this.instructions[idx + 1 :]
+                    self.changed("instructions", this)
+                    self.changed("cfg", this)
                     changed = True
         return changed
 
 
-class DeadBlockElimination:
+class DeadBlockElimination(OptimizerPass):
     """Remove all blocks that have no predecessor."""
 
+    triggers = frozenset({"cfg"})
+
     def optimize_function(self, function: Function) -> bool:
         changed = False
 
@@ -275,7 +399,12 @@ class DeadBlockElimination:
         for bb in list(function.basic_blocks):
             if len(CFG.predecessors[bb]) == 0 and bb != function.entry_block:
                 logger.debug(f"Dead-Code Elimination: {bb} has no predecessors")
+                # The successors lose a predecessor and the instructions of bb are gone.
+                for succ in CFG.successors[bb]:
+                    self.changed("cfg", succ)
+                self.changed("instructions", bb)
                 function.basic_blocks.remove(bb)
+                self.count("blocks removed")
                 changed = True
 
         return changed
@@ -285,7 +414,9 @@ class DeadBlockElimination:
 # 4. Dead Variable Elimination
 
 
-class DeadVariableElimination:
+class DeadVariableElimination(OptimizerPass):
+    triggers = frozenset({"instructions"})
+
     def optimize_function(self, function: 'Function') -> bool:
         # Initialisiere die Menge der nie gelesenen Variablen
         never_read = set(function.variables)
@@ -312,10 +443,243 @@ class DeadVariableElimination:
                 if not (hasattr(instruction, 'dst') and instruction.dst in never_read):
                     filtered_instructions.append(instruction)
             # Aktualisiere die Instruktionen des Blocks mit der gefilterten Liste.
-            block.instructions = filtered_instructions
+            if len(filtered_instructions) != len(block.instructions):
+                self.count("instructions removed", len(block.instructions) - len(filtered_instructions))
+                self.changed("instructions", block)
+                block.instructions = filtered_instructions
 
     
         # Entferne nie gelesene Variablen aus der Variablenliste der Funktion
         function.variables = [var for var in function.variables if var not in never_read]
+        self.count("variables removed", len(never_read))
     
         return True
+
+
+################################################################
+# 5. Dead Store Elimination
+
+
+class DeadStoreElimination(OptimizerPass):
+    """Remove instructions that write a variable which is not live afterwards.
+
+    In contrast to the dead variable elimination, this pass is flow
+    sensitive: a write is dead if no path from it reads the value before
+    the next write (see CFG.liveness). Calls are kept for their side
+    effects, and writes to referenced variables are kept, as they might be
+    read through a pointer.
+    """
+
+    def optimize_function(self, function: Function) -> bool:
+        changed = False
+        # Removing instructions only shrinks the live sets, so the analysis stays conservative
+        # for the remaining blocks of this run.
+        liveness = function.liveness()
+        keep_always = liveness.referenced
+        for bb in list(function.basic_blocks):
+            live = liveness.live_out[bb]
+            instructions = []
+            for instr in reversed(bb.instructions):
+                uses, defs = liveness.use_def(instr)
+                if defs and not defs & (live | keep_always) and not isinstance(instr, Call):
+                    logger.debug(f"Dead-Store Elimination: {instr} in {bb}")
+                    continue
+                live = (live & ~defs) | uses
+                instructions.append(instr)
+            if len(instructions) != len(bb.instructions):
+                self.count("stores removed", len(bb.instructions) - len(instructions))
+                self.changed("instructions", bb)
+                instructions.reverse()
+                bb.instructions = instructions
+                changed = True
+        return changed
+
+
+################################################################
+# 6. Sparse Conditional Constant Propagation
+
+
+class SparseConditionalConstantPropagation(OptimizerPass):
+    """Propagate constants along the executable edges of the CFG (Wegman and Zadeck).
+
+    The analysis runs on the SSA form of the function (see CFG.ssa), where
+    every version of a variable has a single write. The value of a version
+    is TOP (no value seen yet), a constant, or BOTTOM (not constant).
+    Starting with the entry block, an edge becomes executable if its jump
+    can be taken: an IfGoto with a constant condition has only one
+    executable edge. Phi instructions only merge the values of the
+    executable edges, so a write in a dead branch does not spoil the
+    constant. A changed value revisits the instructions that read it.
+
+    Afterwards, the function gets its original instructions back, where
+    reads of constant versions become constants, instructions with a
+    constant result become assignments, and constant conditions become
+    gotos. The blocks that were never executable lose their predecessors
+    and are removed by the DeadBlockElimination. Loads, calls, and
+    referenced variables are never constant.
+    """
+
+    TOP: ClassVar[object] = object()
+    BOTTOM: ClassVar[object] = object()
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Evaluates the arithmetic like the constant folding does
+        self.folding = ConstantFolding()
+
+    def optimize_function(self, function: Function) -> bool:
+        original = {bb: list(bb.instructions) for bb in function.basic_blocks}
+        variables = list(function.variables)
+        construct_ssa(function)
+        values = dict.fromkeys(set(function.variables) - set(variables), self.TOP)
+        executable = self.analyze(function, values)
+
+        # Back to the original instructions, which are in the same order as in the SSA form after the phis
+        ssa = {bb: list(bb.instructions) for bb in function.basic_blocks}
+        for bb, instructions in original.items():
+            bb.instructions = instructions
+        function.variables = variables
+
+        def constant(ssa_op: Any, op: Any) -> Any:
+            value = values.get(ssa_op, self.BOTTOM) if isinstance(ssa_op, Variable) else ssa_op
+            return value if isinstance(value, int) else op
+
+        changed = False
+        for bb in executable:
+            phis = len(ssa[bb]) - len(original[bb])
+            for idx, (instr, ssa_instr) in enumerate(zip(original[bb], ssa[bb][phis:])):
+                replace = self.rewrite(instr, ssa_instr, constant)
+                if replace is None:
+                    continue
+                logger.debug(f"Sparse Conditional Constant Propagation: {instr} -> {replace}")
+                bb.instructions[idx] = replace
+                self.changed("instructions", bb)
+                if isinstance(replace, Goto):
+                    self.count("branches folded")
+                    self.changed("cfg", bb)
+                else:
+                    self.count("instructions rewritten")
+                changed = True
+        return changed
+
+    def analyze(self, function: Function, values: dict[Variable, Any]) -> dict[BasicBlock, None]:
+        """Computes the values of the versions in place and returns the executable blocks."""
+        CFG = function.CFG()
+        # The instructions that read each version
+        uses: dict[Variable, list[Tuple[BasicBlock, Instruction]]] = {}
+        for bb in function.basic_blocks:
+            for instr in bb.instructions:
+                for op in instr.operands_src():
+                    if op in values:
+                        uses.setdefault(op, []).append((bb, instr))
+
+        def value(op: Union[Variable, int]) -> Any:
+            return values.get(op, self.BOTTOM) if isinstance(op, Variable) else op
+
+        assert function.entry_block is not None
+        edges: set[Tuple[Optional[BasicBlock], BasicBlock]] = set()
+        executable: dict[BasicBlock, None] = {}
+        flow_worklist: list[Tuple[Optional[BasicBlock], BasicBlock]] = [(None, function.entry_block)]
+        ssa_worklist: list[Tuple[BasicBlock, Instruction]] = []
+
+        def visit(bb: BasicBlock, instr: Instruction) -> None:
+            if isinstance(instr, IfGoto):
+                cond = value(instr.cond)
+                if cond is self.TOP:
+                    return
+                if cond is self.BOTTOM or cond != 0:
+                    flow_worklist.append((bb, instr.then_label.target))
+                if cond is self.BOTTOM or cond == 0:
+                    flow_worklist.append((bb, instr.else_label.target))
+                return
+            dst = instr.operand_dst()
+            if dst not in values:
+                return
+            if isinstance(instr, Phi):
+                new = self.TOP
+                for label, op in zip(instr.labels, instr.values):
+                    if (label.target, bb) in edges:
+                        new = self.meet(new, value(op))
+            else:
+                new = self.evaluate(instr, value)
+            if new != values[dst]:
+                values[dst] = new
+                ssa_worklist.extend(uses.get(dst, ()))
+
+        while flow_worklist or ssa_worklist:
+            if flow_worklist:
+                edge = flow_worklist.pop()
+                if edge in edges:
+                    continue
+                edges.add(edge)
+                bb = edge[1]
+                if bb in executable:
+                    # Only the phi instructions see the new edge
+                    for instr in bb.instructions:
+                        if not isinstance(instr, Phi):
+                            break
+                        visit(bb, instr)
+                    continue
+                executable[bb] = None
+                for instr in bb.instructions:
+                    visit(bb, instr)
+                if not (bb.instructions and isinstance(bb.instructions[-1], IfGoto)):
+                    flow_worklist.extend((bb, succ) for succ in CFG.successors[bb])
+            else:
+                bb, instr = ssa_worklist.pop()
+                if bb in executable:
+                    visit(bb, instr)
+        return executable
+
+    def meet(self, a: Any, b: Any) -> Any:
+        if a is self.TOP:
+            return b
+        if b is self.TOP or a == b:
+            return a
+        return self.BOTTOM
+
+    def evaluate(self, instr: Instruction, value) -> Any:
+        """Returns the value that instr writes, given the values of its operands."""
+        if isinstance(instr, Assign):
+            return value(instr.value)
+        if not isinstance(instr, BinopInstruction):
+            return self.BOTTOM
+        lhs, rhs = value(instr.lhs), value(instr.rhs)
+        if lhs is self.BOTTOM or rhs is self.BOTTOM:
+            return self.BOTTOM
+        if lhs is self.TOP or rhs is self.TOP:
+            return self.TOP
+        if isinstance(instr, Div) and rhs == 0:
+            # Leave the division by zero to the execution
+            return self.BOTTOM
+        folded = double_dispatch(self.folding, "fold_", instr.replace(lhs=lhs, rhs=rhs), ignore_missing=True)
+        return folded.value if folded else self.BOTTOM
+
+    def rewrite(self, instr: Instruction, ssa_instr: Instruction, constant) -> Optional[Instruction]:
+        """Returns instr with the constants found for the operands of ssa_instr or None if nothing changes."""
+        if isinstance(instr, IfGoto):
+            cond = constant(ssa_instr.cond, instr.cond)
+            if isinstance(cond, int):
+                return Goto(instr.then_label if cond else instr.else_label)
+            return None
+        dst = ssa_instr.operand_dst()
+        if isinstance(dst, Variable) and not isinstance(instr, Call):
+            value = constant(dst, None)
+            if isinstance(value, int):
+                if isinstance(instr, Assign) and not _differs(value, instr.value):
+                    return None
+                return Assign(instr.dst, value)
+        changes = {}
+        for name, multiple in _operand_info(type(instr))[1]:
+            if name == "dst":
+                continue
+            old, ssa_op = getattr(instr, name), getattr(ssa_instr, name)
+            if multiple:
+                new = [constant(s, o) for s, o in zip(ssa_op, old)]
+                if any(_differs(n, o) for n, o in zip(new, old)):
+                    changes[name] = new
+            else:
+                new = constant(ssa_op, old)
+                if _differs(new, old):
+                    changes[name] = new
+        return instr.replace(**changes) if changes else None
@@ -0,0 +1,105 @@
+import json
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any
+from CFG.tracing import Observer
+
+if TYPE_CHECKING:
+    from CFG.interpreter import Interpreter
+    from CFG.types import Function
+
+
+class Profile(Observer):
+    """Dynamic instruction counts of an interpreter run.
+
+    Pass an instance to Interpreter.exec(observers=[...]). The profile counts
+    the executed instructions per address, the calls per function, and the
+    inclusive steps per function (all instructions executed between entering
+    and leaving the outermost activation of a function). The report methods
+    aggregate the counts per function, per basic block and per opcode.
+    """
+
+    def __init__(self, interpreter: "Interpreter") -> None:
+        self.interpreter = interpreter
+        self.counts = [0] * len(interpreter.code)
+        self.calls: Counter = Counter()
+        self.inclusive: Counter = Counter()
+        # Active calls (callee, step count at entry, outermost activation?) and running functions
+        self.active: list[tuple] = []
+        self.running: set = set()
+
+    def on_instr(self, machine: "Interpreter", pc: int) -> None:
+        self.counts[pc] += 1
+
+    def on_call(self, machine: "Interpreter", callee: "Function", args: list[int]) -> None:
+        self.calls[callee] += 1
+        self.active.append((callee, machine.step_count, callee not in self.running))
+        self.running.add(callee)
+
+    def on_return(self, machine: "Interpreter", callee: "Function", value: int) -> None:
+        callee, start, outermost = self.active.pop()
+        if outermost:
+            self.inclusive[callee] += machine.step_count - start
+            self.running.discard(callee)
+
+    def functions(self) -> list[dict[str, Any]]:
+        """Returns calls, own steps and inclusive steps for every executed function."""
+        steps: Counter = Counter()
+        for location, count in zip(self.interpreter.locations, self.counts):
+            if location and count:
+                steps[location[0]] += count
+        rows = [
+            dict(function=f.name, calls=self.calls[f], steps=steps[f], inclusive_steps=self.inclusive[f])
+            for f in steps.keys() | self.calls.keys()
+        ]
+        return sorted(rows, key=lambda row: (-row["steps"], row["function"]))
+
+    def blocks(self) -> list[dict[str, Any]]:
+        """Returns the executions and steps of every executed basic block."""
+        steps: dict = defaultdict(int)
+        entries: dict = defaultdict(int)
+        for location, count in zip(self.interpreter.locations, self.counts):
+            if location and count:
+                if location not in steps:
+                    # The first instruction of a block is executed once per block execution.
+                    entries[location] = count
+                steps[location] += count
+        rows = [
+            dict(function=f.name, block=bb.label.name, executions=entries[(f, bb)], steps=count)
+            for (f, bb), count in steps.items()
+        ]
+        return sorted(rows, key=lambda row: (-row["steps"], row["function"], row["block"]))
+
+    def opcodes(self) -> dict[str, int]:
+        """Returns the number of executed instructions per opcode."""
+        steps: Counter = Counter()
+        for instr, count in zip(self.interpreter.code, self.counts):
+            if instr is not None and count:
+                steps[instr.opcode] += count
+        return dict(steps.most_common())
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(
+            steps=self.interpreter.step_count,
+            functions=self.functions(),
+            blocks=self.blocks(),
+            opcodes=self.opcodes(),
+        )
+
+    def dump_json(self, fd) -> None:
+        json.dump(self.as_dict(), fd, indent=2)
+        fd.write("\n")
+
+    def dump_table(self, fd) -> None:
+        print("Steps: {}".format(self.interpreter.step_count), file=fd)
+        print(file=fd)
+        print("{:<20} {:>10} {:>12} {:>12}".format("Function", "Calls", "Steps", "Inclusive"), file=fd)
+        for row in self.functions():
+            print("{function:<20} {calls:>10} {steps:>12} {inclusive_steps:>12}".format(**row), file=fd)
+        print(file=fd)
+        print("{:<20} {:<8} {:>10} {:>12}".format("Function", "Block", "Executions", "Steps"), file=fd)
+        for row in self.blocks():
+            print("{function:<20} {block:<8} {executions:>10} {steps:>12}".format(**row), file=fd)
+        print(file=fd)
+        print("{:<20} {:>12}".format("Opcode", "Steps"), file=fd)
+        for opcode, count in self.opcodes().items():
+            print("{:<20} {:>12}".format(opcode, count), file=fd)
@@ -0,0 +1,218 @@
+from collections import Counter
+from typing import Union
+from CFG.types import Assign, BasicBlock, Function, Goto, IfGoto, Instruction, Phi, Variable, _operand_info
+from CFG.utils import dominance_frontiers, immediate_dominators
+
+
+def is_ssa(function: Function) -> bool:
+    """Returns whether function contains phi instructions."""
+    return any(bb.instructions and isinstance(bb.instructions[0], Phi) for bb in function.basic_blocks)
+
+
+def construct_ssa(function: Function) -> None:
+    """Converts function into (pruned) SSA form (Cytron et al.).
+
+    Every write of a variable gets a new version of the variable, named
+    <variable>.<n>. A phi instruction is placed in the dominance frontier
+    of the blocks that write a variable, if the variable is live there.
+    Afterwards, the versions are renamed along the dominator tree. The
+    original variable stands for the value at function entry, so the
+    parameters and uninitialized variables keep their name until the first
+    write. Referenced variables can be written through pointers and stay
+    as they are, as do unreachable blocks.
+    """
+    assert not is_ssa(function), "{} is already in SSA form".format(function)
+    CFG = function.CFG()
+    liveness = function.liveness()
+    idom = immediate_dominators(function)
+    frontiers = dominance_frontiers(function, idom)
+    referenced = liveness.referenced
+
+    # Blocks that write each variable
+    writes: dict[Variable, dict[BasicBlock, None]] = {}
+    for bb in idom:
+        for instr in bb.instructions:
+            dst = instr.operand_dst()
+            if isinstance(dst, Variable) and not liveness.bit(dst) & referenced:
+                writes.setdefault(dst, {})[bb] = None
+
+    # Phi placement: The variables that need a phi instruction at each block
+    phi_vars: dict[BasicBlock, list[Variable]] = {bb: [] for bb in idom}
+    for var, blocks in writes.items():
+        bit = liveness.bit(var)
+        worklist = list(blocks)
+        placed = set()
+        while worklist:
+            bb = worklist.pop()
+            for frontier in frontiers[bb]:
+                if frontier not in placed and liveness.live_in[frontier] & bit:
+                    placed.add(frontier)
+                    phi_vars[frontier].append(var)
+                    if frontier not in blocks:
+                        worklist.append(frontier)
+
+    # Renaming along the dominator tree
+    children: dict[BasicBlock, list[BasicBlock]] = {bb: [] for bb in idom}
+    for bb, parent in idom.items():
+        if bb is not parent:
+            children[parent].append(bb)
+
+    versions: dict[Variable, list[Variable]] = {var: [var] for var in writes}
+    counter: Counter = Counter()
+    new_variables: list[Variable] = []
+    phi_dst: dict[tuple[BasicBlock, Variable], Variable] = {}
+    phi_values: dict[tuple[BasicBlock, Variable], dict[BasicBlock, Variable]] = {}
+
+    def new_version(var: Variable) -> Variable:
+        counter[var] += 1
+        version = Variable("{}.{}".format(var.name, counter[var]), var.temporary)
+        new_variables.append(version)
+        versions[var].append(version)
+        return version
+
+    def current(op):
+        return versions[op][-1] if isinstance(op, Variable) and op in versions else op
+
+    assert function.entry_block is not None
+    stack: list[tuple[BasicBlock, bool]] = [(function.entry_block, False)]
+    pushed: dict[BasicBlock, list[Variable]] = {}
+    while stack:
+        bb, leave = stack.pop()
+        if leave:
+            for var in pushed.pop(bb):
+                versions[var].pop()
+            continue
+
+        pushed[bb] = []
+        for var in phi_vars[bb]:
+            phi_dst[(bb, var)] = new_version(var)
+            pushed[bb].append(var)
+
+        instructions = []
+        for instr in bb.instructions:
+            changes = rename_operands(instr, current)
+            dst = instr.operand_dst()
+            if isinstance(dst, Variable) and dst in versions:
+                changes["dst"] = new_version(dst)
+                pushed[bb].append(dst)
+            instructions.append(instr.replace(**changes) if changes else instr)
+        bb.instructions = instructions
+
+        for succ in dict.fromkeys(CFG.successors[bb]):
+            for var in phi_vars[succ]:
+                phi_values.setdefault((succ, var), {})[bb] = current(var)
+
+        stack.append((bb, True))
+        stack.extend((child, False) for child in reversed(children[bb]))
+
+    # Insert the phi instructions, now that their values are known
+    for bb, variables in phi_vars.items():
+        if not variables:
+            continue
+        preds = [pred for pred in dict.fromkeys(CFG.predecessors[bb]) if pred in idom]
+        phis: list[Instruction] = []
+        for var in variables:
+            values = phi_values.get((bb, var), {})
+            phis.append(Phi(phi_dst[(bb, var)], [values.get(pred, var) for pred in preds], [p.label for p in preds]))
+        bb.instructions = phis + list(bb.instructions)
+
+    used = set()
+    for bb in function.basic_blocks:
+        for instr in bb.instructions:
+            used.update(instr.operands())
+    function.variables = [var for var in function.variables if var in used] + new_variables
+
+
+def rename_operands(instr: Instruction, rename) -> dict:
+    """Returns the changed source operands of instr (for instr.replace()) after applying rename to each."""
+    changes = {}
+    for name, multiple in _operand_info(type(instr))[1]:
+        if name == "dst" or isinstance(instr, Phi):
+            continue
+        value = getattr(instr, name)
+        if multiple:
+            new = [rename(op) for op in value]
+            if any(a is not b for a, b in zip(new, value)):
+                changes[name] = new
+        else:
+            new = rename(value)
+            if new is not value:
+                changes[name] = new
+    return changes
+
+
+def destruct_ssa(function: Function) -> None:
+    """Replaces the phi instructions of function by copies (Assign) in the predecessor blocks.
+
+    The phi instructions of a block are evaluated in parallel, so the
+    copies on an edge are sequentialized (see sequentialize_copies()).
+    A critical edge, which leaves a block with several successors, is
+    split by a new block for the copies.
+    """
+    CFG = function.CFG()
+    for bb in list(function.basic_blocks):
+        count = 0
+        while count < len(bb.instructions) and isinstance(bb.instructions[count], Phi):
+            count += 1
+        if count == 0:
+            continue
+        phis: list[Phi] = bb.instructions[:count]  # type: ignore
+        bb.instructions = bb.instructions[count:]
+
+        preds: dict[BasicBlock, list[tuple[Variable, Union[Variable, int]]]] = {}
+        for phi in phis:
+            for label, value in zip(phi.labels, phi.values):
+                assert isinstance(label.target, BasicBlock)
+                preds.setdefault(label.target, []).append((phi.dst, value))
+
+        for pred, copies in preds.items():
+            copies = [(dst, value) for dst, value in copies if dst is not value]
+            if not copies:
+                continue
+            if len(set(CFG.successors[pred])) > 1:
+                pred = split_edge(function, pred, bb)
+            terminator = pred.instructions[-1]
+            assert isinstance(terminator, (Goto, IfGoto)), "{} does not end with a jump".format(pred)
+            pred.instructions[-1:] = sequentialize_copies(function, copies) + [terminator]
+
+
+def split_edge(function: Function, pred: BasicBlock, succ: BasicBlock) -> BasicBlock:
+    """Inserts a new block on the edge pred -> succ and returns it."""
+    bb = function.create_block()
+    bb.append(Goto, succ.label)
+    terminator = pred.instructions[-1]
+    if isinstance(terminator, IfGoto):
+        changes = {}
+        if terminator.then_label.target is succ:
+            changes["then_label"] = bb.label
+        if terminator.else_label.target is succ:
+            changes["else_label"] = bb.label
+        pred.instructions[-1] = terminator.replace(**changes)
+    else:
+        assert isinstance(terminator, Goto)
+        pred.instructions[-1] = Goto(bb.label)
+    return bb
+
+
+def sequentialize_copies(function: Function, copies: list[tuple[Variable, Union[Variable, int]]]) -> list[Assign]:
+    """Returns Assign instructions that perform the parallel copies dst_i := value_i.
+
+    A copy is emitted as soon as its destination is no longer read by a
+    pending copy. If only cycles remain (e.g. a swap), the old value of one
+    destination is saved in a new temporary variable.
+    """
+    pending = list(copies)
+    ret = []
+    while pending:
+        for idx, (dst, value) in enumerate(pending):
+            if not any(other is dst for _, other in pending):
+                ret.append(Assign(dst, value))
+                del pending[idx]
+                break
+        else:
+            dst = pending[0][0]
+            tmp = Variable("{}.tmp".format(dst.name), temporary=True)
+            function.variables.append(tmp)
+            ret.append(Assign(tmp, dst))
+            pending = [(other, tmp if value is dst else value) for other, value in pending]
+    return ret
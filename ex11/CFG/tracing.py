@@ -0,0 +1,130 @@
+import json
+import struct
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterator
+from CFG.types import Function
+
+if TYPE_CHECKING:
+    from CFG.interpreter import Interpreter
+
+
+class Observer:
+    """Interface for observing an interpreter run (see Interpreter.exec(observers=...)).
+
+    The registers and the step count of the interpreter are up to date when
+    a hook is called.
+    """
+
+    def on_instr(self, machine: "Interpreter", pc: int) -> None:
+        """Called before the instruction machine.code[pc] is executed."""
+        pass
+
+    def on_call(self, machine: "Interpreter", callee: Function, args: list[int]) -> None:
+        """Called after the call frame of callee has been set up."""
+        pass
+
+    def on_return(self, machine: "Interpreter", callee: Function, value: int) -> None:
+        """Called before the call frame of callee is removed."""
+        pass
+
+
+class TextTracer(Observer):
+    """Prints executed instructions (trace), calls and returns (calls), and call frames (frames)."""
+
+    def __init__(self, trace: bool = False, calls: bool = False, frames: bool = False) -> None:
+        self.trace = trace
+        self.calls = calls
+        self.frames = frames
+
+    def on_instr(self, machine: "Interpreter", pc: int) -> None:
+        if self.trace:
+            print("TRACE", pc, machine.code[pc])
+            if self.frames and machine.frames:
+                machine.dump_frame(machine.sp, machine.bp)
+
+    def on_call(self, machine: "Interpreter", callee: Function, args: list[int]) -> None:
+        if self.calls:
+            # Print the operands of the Call instruction, which stands before the return address.
+            instr = machine.code[machine.frames[-1][1] - 1]
+            print("CALL", callee, instr.arguments)
+            if self.frames:
+                machine.dump_frame(machine.sp, machine.bp)
+
+    def on_return(self, machine: "Interpreter", callee: Function, value: int) -> None:
+        if self.calls:
+            print("RETURN", callee, value)
+            if self.frames:
+                machine.dump_frame(machine.sp, machine.bp)
+
+
+# Binary trace format: MAGIC, a length-prefixed JSON header, and a sequence of records.
+# Every record starts with a tag byte:
+#   INSTR:  address of the executed instruction (uint32)
+#   CALL:   entry address of the callee (uint32), number of arguments (uint16), arguments (int64 each)
+#   RETURN: return value (int64)
+MAGIC = b"L0TRACE1"
+INSTR, CALL, RETURN = 0, 1, 2
+_HEADER = struct.Struct("<I")
+_INSTR = struct.Struct("<BI")
+_CALL = struct.Struct("<BIH")
+_RETURN = struct.Struct("<Bq")
+_ARG = struct.Struct("<q")
+
+
+class BinaryTraceWriter(Observer):
+    """Writes a compact binary trace of an interpreter run to a file (see read_trace()).
+
+    The header contains the listing of the loaded code and the entry
+    address of every function, so the trace can be analyzed offline.
+    """
+
+    def __init__(self, fd: BinaryIO, machine: "Interpreter") -> None:
+        self.fd = fd
+        functions = {label.name: addr for label, addr in machine.labels.items() if isinstance(label.target, Function)}
+        header = dict(code=[None if instr is None else repr(instr) for instr in machine.code], functions=functions)
+        data = json.dumps(header).encode()
+        fd.write(MAGIC + _HEADER.pack(len(data)) + data)
+
+    def on_instr(self, machine: "Interpreter", pc: int) -> None:
+        self.fd.write(_INSTR.pack(INSTR, pc))
+
+    def on_call(self, machine: "Interpreter", callee: Function, args: list[int]) -> None:
+        self.fd.write(_CALL.pack(CALL, machine.labels[callee.label], len(args)))
+        for arg in args:
+            self.fd.write(_ARG.pack(arg))
+
+    def on_return(self, machine: "Interpreter", callee: Function, value: int) -> None:
+        self.fd.write(_RETURN.pack(RETURN, value))
+
+
+def read_trace(fd: BinaryIO) -> tuple[dict[str, Any], Iterator[tuple]]:
+    """Reads a trace written by BinaryTraceWriter.
+
+    :return: The header and an iterator over the records:
+             (INSTR, address), (CALL, entry address, arguments), (RETURN, value)
+    """
+    if fd.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a L0 trace file")
+    (length,) = _HEADER.unpack(fd.read(_HEADER.size))
+    header = json.loads(fd.read(length))
+
+    def records():
+        data = fd.read()
+        pos = 0
+        while pos < len(data):
+            tag = data[pos]
+            if tag == INSTR:
+                yield _INSTR.unpack_from(data, pos)
+                pos += _INSTR.size
+            elif tag == CALL:
+                _, entry, count = _CALL.unpack_from(data, pos)
+                pos += _CALL.size
+                args = [_ARG.unpack_from(data, pos + idx * _ARG.size)[0] for idx in range(count)]
+                pos += count * _ARG.size
+                yield (CALL, entry, args)
+            elif tag == RETURN:
+                yield _RETURN.unpack_from(data, pos)
+                pos += _RETURN.size
+            else:
+                raise ValueError("Invalid trace record at offset {}".format(pos))
+
+    return header, records()
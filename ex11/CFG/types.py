@@ -1,10 +1,16 @@
+import functools
+import os
 import sys
 from CFG.utils import functions_to_dot
 from dataclasses import dataclass, fields, field
 import dataclasses
+from operator import attrgetter
 from utils.typeshed import check_type
-from typing import Any, Dict, Optional, Union, List
-from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Dict, Optional, Union, List
+from collections import Counter, defaultdict
+
+if TYPE_CHECKING:
+    from CFG.liveness import Liveness
 
 
 class TranslationUnit:
@@ -27,6 +33,8 @@ class TranslationUnit:
 
 
 class Label:
+    __slots__ = ("target", "name")
+
     def __init__(self, target: Union["BasicBlock", "Function"], name: str) -> None:
         self.target = target
         self.name = name
@@ -36,6 +44,9 @@ class Label:
 
 
 class Variable:
+    # slot: Offset in the call frame of the interpreter
+    __slots__ = ("name", "temporary", "ebp_offset", "slot")
+
     def __init__(self, name: str, temporary: bool = False) -> None:
         self.name = name
         self.temporary = temporary
@@ -46,6 +57,23 @@ class Variable:
 
 
 class CFG:
+    """Successors and predecessors of the basic blocks of a function.
+
+    The CFG returned by Function.CFG() is cached and kept current by the
+    function: Every modification of a block's instruction list and of the
+    function's block list updates the edges of the affected blocks. The
+    edge lists are never modified in place but replaced (copy-on-write),
+    so a pass can iterate over an edge list while it edits the blocks.
+    The order of the predecessors is unspecified.
+
+    Jump targets must not be modified in place (instr.label = ...), but
+    the terminator has to be replaced (bb.instructions[-1] = ...). Set
+    L0_CHECK_CFG=1 or CFG.check = True to compare the cached CFG against
+    a fresh rebuild on every query.
+    """
+
+    check: ClassVar[bool] = os.environ.get("L0_CHECK_CFG", "0") != "0"
+
     def __init__(self, function: "Function") -> None:
         self.successors: Dict["BasicBlock", List["BasicBlock"]] = {}
         self.predecessors: Dict["BasicBlock", List["BasicBlock"]] = defaultdict(list)
@@ -54,6 +82,140 @@ class CFG:
             for bb2 in self.successors[bb]:
                 self.predecessors[bb2].append(bb)
 
+    def update_block(self, bb: "BasicBlock") -> None:
+        """Updates the outgoing edges of bb after its terminator might have changed."""
+        old = self.successors.get(bb)
+        if old is None:  # Not a block of this function (anymore)
+            return
+        new = bb.successors()
+        if old == new:
+            return
+        self.successors[bb] = new
+        for succ in old:
+            predecessors = list(self.predecessors[succ])
+            predecessors.remove(bb)
+            self.predecessors[succ] = predecessors
+        for succ in new:
+            self.predecessors[succ] = self.predecessors[succ] + [bb]
+
+    def add_block(self, bb: "BasicBlock") -> None:
+        if bb not in self.successors:
+            self.successors[bb] = []
+            self.update_block(bb)
+
+    def remove_block(self, bb: "BasicBlock") -> None:
+        if bb in self.successors:
+            # Drop the outgoing edges; edges from other blocks to bb remain (like in a fresh CFG).
+            for succ in self.successors.pop(bb):
+                predecessors = list(self.predecessors[succ])
+                predecessors.remove(bb)
+                self.predecessors[succ] = predecessors
+
+    def verify(self, function: "Function") -> None:
+        """Raises an AssertionError if this CFG differs from a fresh CFG of function."""
+        fresh = CFG(function)
+        assert self.successors == fresh.successors, "{}: cached successors {} != {}".format(
+            function, self.successors, fresh.successors
+        )
+        predecessors = {bb: Counter(preds) for bb, preds in self.predecessors.items() if preds}
+        fresh_predecessors = {bb: Counter(preds) for bb, preds in fresh.predecessors.items() if preds}
+        assert predecessors == fresh_predecessors, "{}: cached predecessors {} != {}".format(
+            function, predecessors, fresh_predecessors
+        )
+
+
+class _NotifyingList(list):
+    """A list that calls self.changed() after every modification."""
+
+    __slots__ = ()
+
+    def changed(self) -> None:
+        raise NotImplementedError
+
+
+def _notifying(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args):
+        ret = method(self, *args)
+        self.changed()
+        return ret
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+):
+    setattr(_NotifyingList, _name, _notifying(_name))
+
+
+class InstructionList(_NotifyingList):
+    """The instructions of a basic block, which keep the cached CFG current."""
+
+    __slots__ = ("block",)
+
+    def __init__(self, block: "BasicBlock", instructions=()) -> None:
+        list.__init__(self, instructions)
+        self.block = block
+
+    def changed(self) -> None:
+        block = getattr(self, "block", None)
+        if block is not None:
+            block.edges_changed()
+
+
+class BlockList(_NotifyingList):
+    """The basic blocks of a function, which keep the cached CFG current."""
+
+    __slots__ = ("function",)
+
+    def __init__(self, function: "Function", blocks=()) -> None:
+        list.__init__(self, blocks)
+        self.function = function
+
+    def append(self, bb: "BasicBlock") -> None:
+        # Fast path for Function.create_block()
+        list.append(self, bb)
+        bb.function = self.function
+        self.function._liveness = None
+        if self.function._cfg is not None:
+            self.function._cfg.add_block(bb)
+
+    def remove(self, bb: "BasicBlock") -> None:
+        # Fast path for the dead block elimination
+        list.remove(self, bb)
+        self.function._liveness = None
+        if self.function._cfg is not None and bb not in self:
+            self.function._cfg.remove_block(bb)
+
+    def changed(self) -> None:
+        function = getattr(self, "function", None)
+        if function is None:
+            return
+        for bb in self:
+            bb.function = function
+        function._liveness = None
+        cfg = function._cfg
+        if cfg is not None:
+            members = set(self)
+            for bb in [bb for bb in cfg.successors if bb not in members]:
+                cfg.remove_block(bb)
+            for bb in self:
+                cfg.add_block(bb)
+
 
 class Function:
     def __init__(self, name: str) -> None:
@@ -61,9 +223,20 @@ class Function:
         self.name = name
         self.parameters: list[Variable] = []
         self.variables: list[Variable] = []
+        self._cfg: Optional[CFG] = None
+        self._liveness: Optional["Liveness"] = None
         self.basic_blocks: list[BasicBlock] = []
         self.entry_block: Optional[BasicBlock] = None
 
+    @property
+    def basic_blocks(self) -> list["BasicBlock"]:
+        return self._basic_blocks
+
+    @basic_blocks.setter
+    def basic_blocks(self, blocks: list["BasicBlock"]) -> None:
+        self._basic_blocks = BlockList(self, blocks)
+        self._basic_blocks.changed()
+
     def create_block(self) -> "BasicBlock":
         bb = BasicBlock("BB{}".format(len(self.basic_blocks)))
         if not self.basic_blocks:
@@ -94,16 +267,27 @@ class Function:
         print("}")
 
     def CFG(self) -> CFG:
-        """We calculate an CFG instance every time, we are asked for it.
-        Thereby, the data never gets outdated."""
-        return CFG(self)
+        """Returns the cached CFG, which is kept current while the blocks are edited (see CFG)."""
+        if self._cfg is None:
+            self._cfg = CFG(self)
+        elif CFG.check:
+            self._cfg.verify(self)
+        return self._cfg
+
+    def liveness(self) -> "Liveness":
+        """Returns the cached liveness analysis, which is dropped whenever the blocks are edited."""
+        if self._liveness is None:
+            from CFG.liveness import Liveness
+
+            self._liveness = Liveness(self)
+        return self._liveness
 
     def sort_blocks(self) -> None:
         """Uses breath-first search to order the blocks. This makes the life
         of students hopefully a little bit easier."""
         visited = set()
         basic_blocks = []
-        cfg = CFG(self)
+        cfg = self.CFG()
 
         def recursive(BB1):
             if BB1 in visited:
@@ -125,8 +309,26 @@ class Function:
 class BasicBlock:
     def __init__(self, name: str) -> None:
         self.label = Label(self, name)
+        # The function is set when the block is added to the blocks of a function.
+        self.function: Optional[Function] = None
         self.instructions: list[Instruction] = []
 
+    @property
+    def instructions(self) -> list["Instruction"]:
+        return self._instructions
+
+    @instructions.setter
+    def instructions(self, instructions: list["Instruction"]) -> None:
+        self._instructions = InstructionList(self, instructions)
+        self.edges_changed()
+
+    def edges_changed(self) -> None:
+        """Updates the cached analyses of the function after the instructions have been modified."""
+        if self.function is not None:
+            self.function._liveness = None
+            if self.function._cfg is not None:
+                self.function._cfg.update_block(self)
+
     def dump(self):
         print("{}: # successors: {}".format(self, self.successors()))
         for instr in self.instructions:
@@ -159,18 +361,20 @@ class BasicBlock:
         return "{}".format(self.label.name)
 
 
-@dataclass
+@dataclass(slots=True)
 class Instruction:
+    # Validate the operand types of every instruction (see __post_init__). Set L0_VALIDATE=0
+    # or Instruction.validate = False to construct instructions without the runtime type checks.
+    validate: ClassVar[bool] = os.environ.get("L0_VALIDATE", "1") != "0"
+
     def __post_init__(self) -> None:
         """For IR Instruction, we validation that all attributes ahave the
         correct type.
         """
-        for f in self.__operand_fields():
-            assert f.type, "All operands must be typed."
-            check_type(f.name, getattr(self, f.name), f.type)
-
-    def __operand_fields(self):
-        return [field for field in fields(self) if field.init]
+        if not Instruction.validate:
+            return
+        for name, type_ in _operand_info(type(self))[0]:
+            check_type(name, getattr(self, name), type_)
 
     @property
     def opcode(self) -> str:
@@ -181,31 +385,75 @@ class Instruction:
 
     def operands(self, ignore: List[str] = []) -> List[Any]:
         ret = []
-        for f in self.__operand_fields():
-            if f.name in ignore:
+        for name, multiple in _operand_info(type(self))[1]:
+            if name in ignore:
                 continue
-            if f.metadata.get("multiple"):
-                ret.extend(getattr(self, f.name))
+            if multiple:
+                ret.extend(getattr(self, name))
             else:
-                ret.append(getattr(self, f.name))
+                ret.append(getattr(self, name))
         return ret
 
     def operand_dst(self) -> Optional[Variable]:
-        if hasattr(self, "dst"):
-            return self.dst  # type: ignore
+        return getattr(self, "dst", None)
 
     def operands_src(self) -> List[Any]:
-        return self.operands(ignore=["dst"])
+        return _operand_info(type(self))[2](self)
 
     def __repr__(self) -> str:
         operands = [repr(x) for x in self.operands_src()]
         ret = "{} {}".format(self.opcode, ", ".join(operands))
-        if self.operand_dst():
-            ret = "{!r:<3} := {}".format(self.operand_dst(), ret)
+        dst = self.operand_dst()
+        if dst:
+            ret = "{!r:<3} := {}".format(dst, ret)
         return ret
 
 
-@dataclass(repr=False)
+@functools.cache
+def _operand_info(
+    cls: type,
+) -> tuple[tuple[tuple[str, Any], ...], tuple[tuple[str, bool], ...], Callable[[Instruction], List[Any]]]:
+    """Returns the precomputed operand metadata of an instruction class:
+    1. (name, type) of all operands that are checked on initialization
+    2. (name, multiple) of all operands
+    3. A function that returns the source operands (all but dst) of an instruction
+    """
+    operands = []
+    for f in fields(cls):
+        if f.init:
+            assert f.type, "All operands must be typed."
+            operands.append((f.name, f.type, bool(f.metadata.get("multiple"))))
+    checked = tuple((name, type_) for name, type_, _ in operands)
+    names = tuple((name, multiple) for name, _, multiple in operands)
+
+    src = [(name, multiple) for name, multiple in names if name != "dst"]
+    if any(multiple for _, multiple in src):
+
+        def operands_src(instr):
+            ret = []
+            for name, multiple in src:
+                if multiple:
+                    ret.extend(getattr(instr, name))
+                else:
+                    ret.append(getattr(instr, name))
+            return ret
+
+    elif len(src) == 1:
+        get_one = attrgetter(src[0][0])
+
+        def operands_src(instr):
+            return [get_one(instr)]
+
+    else:
+        get_many = attrgetter(*[name for name, _ in src])
+
+        def operands_src(instr):
+            return list(get_many(instr))
+
+    return checked, names, operands_src
+
+
+@dataclass(slots=True, repr=False)
 class BinopInstruction(Instruction):
     dst: Variable
     lhs: Union[Variable, int]
@@ -213,40 +461,40 @@ class BinopInstruction(Instruction):
 
 
 # Shortcuts for type sets to match lecture 08
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Add(BinopInstruction): ...
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Sub(BinopInstruction): ...
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Mul(BinopInstruction): ...
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Div(BinopInstruction): ...
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class LessEqual(BinopInstruction): ...
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Assign(Instruction):
     dst: Variable
     value: Union[Variable, int]
 
 
 # Memory
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Reference(Instruction):
     dst: Variable
     obj: Union[Variable, Label]
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Load(Instruction):
     dst: Variable
     ptr: Variable
@@ -255,7 +503,7 @@ class Load(Instruction):
         return "{} := Load *{}".format(self.dst, self.ptr)
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Store(Instruction):
     ptr: Variable
     value: Union[Variable, int]
@@ -264,42 +512,60 @@ class Store(Instruction):
         return "*{} := Store {}".format(self.ptr, self.value)
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class StackAlloc(Instruction):
     dst: Variable
     size: int
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class HeapAlloc(Instruction):
     dst: Variable
     size: int
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class FreeAlloc(Instruction):
     value: Variable
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class IfGoto(Instruction):
     cond: Union[Variable, int]
     then_label: Label
     else_label: Label
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Goto(Instruction):
     label: Label
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Call(Instruction):
     dst: Variable
     callee: Function
     arguments: List[Union[Variable, int]] = field(metadata=dict(multiple=True))
 
 
-@dataclass(repr=False)
+@dataclass(slots=True, repr=False)
 class Return(Instruction):
     value: Union[Variable, int]
+
+
+# SSA form (see CFG.ssa)
+@dataclass(slots=True, repr=False)
+class Phi(Instruction):
+    """Selects values[i] if control reaches the block from the block of labels[i].
+
+    The phi instructions of a block stand at its beginning and are evaluated
+    in parallel on entering the block.
+    """
+
+    dst: Variable
+    values: List[Union[Variable, int]] = field(metadata=dict(multiple=True))
+    labels: List[Label] = field(metadata=dict(multiple=True))
+
+    def __repr__(self):
+        incoming = ", ".join("{}: {!r}".format(label, value) for label, value in zip(self.labels, self.values))
+        return "{!r:<3} := Phi [{}]".format(self.dst, incoming)
@@ -1,9 +1,10 @@
+import heapq
 import logging
-from typing import TypeVar, Generic, Optional, Iterable
+from typing import Callable, TypeVar, Generic, Optional, Iterable
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from CFG.types import Function
+    from CFG.types import BasicBlock, Function
 
 
 def functions_to_dot(functions: list["Function"], filename: str):
@@ -23,6 +24,134 @@ def functions_to_dot(functions: list["Function"], filename: str):
         print("}", file=fd)
 
 
+def reverse_postorder(function: "Function") -> list["BasicBlock"]:
+    """Returns the blocks that are reachable from the entry block in reverse postorder."""
+    CFG = function.CFG()
+    entry = function.entry_block
+    assert entry is not None
+    visited = {entry}
+    postorder = []
+    stack = [(entry, iter(CFG.successors[entry]))]
+    while stack:
+        bb, successors = stack[-1]
+        for succ in successors:
+            if succ not in visited:
+                visited.add(succ)
+                stack.append((succ, iter(CFG.successors[succ])))
+                break
+        else:
+            stack.pop()
+            postorder.append(bb)
+    postorder.reverse()
+    return postorder
+
+
+def immediate_dominators(function: "Function") -> dict["BasicBlock", "BasicBlock"]:
+    """Returns the immediate dominator of every reachable block; the entry block dominates itself.
+
+    Iterative algorithm by Cooper, Harvey, and Kennedy: The dominator tree
+    is refined in reverse postorder until it is stable.
+    """
+    CFG = function.CFG()
+    order = reverse_postorder(function)
+    index = {bb: idx for idx, bb in enumerate(order)}
+    idom = {order[0]: order[0]}
+
+    def intersect(a: "BasicBlock", b: "BasicBlock") -> "BasicBlock":
+        while a is not b:
+            while index[a] > index[b]:
+                a = idom[a]
+            while index[b] > index[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for bb in order[1:]:
+            new_idom = None
+            for pred in CFG.predecessors[bb]:
+                if pred in idom:
+                    new_idom = pred if new_idom is None else intersect(pred, new_idom)
+            assert new_idom is not None
+            if idom.get(bb) is not new_idom:
+                idom[bb] = new_idom
+                changed = True
+    return idom
+
+
+def dominance_frontiers(
+    function: "Function", idom: dict["BasicBlock", "BasicBlock"]
+) -> dict["BasicBlock", set["BasicBlock"]]:
+    """Returns the dominance frontier of every reachable block (see immediate_dominators())."""
+    CFG = function.CFG()
+    frontiers: dict["BasicBlock", set["BasicBlock"]] = {bb: set() for bb in idom}
+    for bb in idom:
+        preds = [pred for pred in CFG.predecessors[bb] if pred in idom]
+        if len(preds) < 2:
+            continue
+        for pred in preds:
+            runner = pred
+            while runner is not idom[bb]:
+                frontiers[runner].add(bb)
+                runner = idom[runner]
+    return frontiers
+
+
+S = TypeVar("S")
+
+
+def forward_dataflow(
+    function: "Function",
+    initial: S,
+    entry: S,
+    transfer: Callable[["BasicBlock", S], S],
+    merge: Callable[[list[S]], S],
+) -> dict["BasicBlock", S]:
+    """Solves a forward dataflow problem on the CFG of function.
+
+    :param initial: The initial out-state of every block.
+    :param entry: The in-state of the entry block.
+    :param transfer: Calculates the out-state of a block from its in-state.
+    :param merge: Calculates the in-state of a block from the out-states of its predecessors.
+    :return: The out-state of every block.
+
+    The worklist contains every block at most once and always continues
+    with the pending block that comes first in reverse postorder;
+    unreachable blocks come last. The states are compared with ==, so
+    they should support cheap comparisons and must not be modified by
+    transfer() and merge().
+    """
+    CFG = function.CFG()
+    order = reverse_postorder(function)
+    reachable = set(order)
+    order += [bb for bb in function.basic_blocks if bb not in reachable]
+    index = {bb: idx for idx, bb in enumerate(order)}
+
+    states = dict.fromkeys(order, initial)
+    worklist = list(range(len(order)))  # A heap of block indices
+    queued = [True] * len(order)
+    while worklist:
+        idx = heapq.heappop(worklist)
+        queued[idx] = False
+        bb = order[idx]
+
+        if bb is function.entry_block:
+            d_in = entry
+        else:
+            d_in = merge([states[pred] for pred in CFG.predecessors[bb]])
+        d_out = transfer(bb, d_in)
+
+        if d_out != states[bb]:
+            states[bb] = d_out
+            for succ in CFG.successors[bb]:
+                succ_idx = index[succ]
+                if not queued[succ_idx]:
+                    queued[succ_idx] = True
+                    heapq.heappush(worklist, succ_idx)
+    return states
+
+
 T = TypeVar("T")
 
 
@@ -35,26 +164,47 @@ class EquivalenceClasses(Generic[T]):
     query for the equivalent set and merge multiple instances of this
     class.
 
-    This datastructure uses some kind of union-find datastructure. The
-    self.data keys are all symbols that are know to the
-    data-structure. If two keys are equivalent they have the _SAME_
-    set as a mappping value. Thereby, the update mechanism is
-    relatively easy and efficient.
-
+    The self.data keys are all symbols that are equivalent to at least
+    one other symbol. Equivalent keys map to the _SAME_ frozenset, which
+    is never modified but replaced by union() and kill(). Hence, a copy
+    shares the dictionary with the original until one of them is
+    modified (copy-on-write). The fingerprint (XOR of the hashes of all
+    classes) is maintained incrementally, so unequal instances are
+    usually told apart without comparing their classes.
     """
 
     def __init__(self, other: Optional["EquivalenceClasses[T]"] = None):
         """If other is not None, copy the other EquivalenceClass object."""
-        self.data: dict[T, set[T]] = {}
         self.logger = logging.getLogger("ec")
         if other is None:
-            return
+            self.data: dict[T, frozenset[T]] = {}
+            self.fingerprint = 0
+            self.shared = False
+        else:
+            # Share the data until the first modification (see _own())
+            self.data = other.data
+            self.fingerprint = other.fingerprint
+            self.shared = other.shared = True
+
+    def _own(self) -> dict[T, frozenset[T]]:
+        """Returns self.data after copying it if it is shared with another instance."""
+        if self.shared:
+            self.data = self.data.copy()
+            self.shared = False
+        return self.data
 
-        # Copy the unions from the other class
-        for union in other.unions:
-            union = union.copy()
-            for elem in union:
-                self.data[elem] = union
+    def _set_class(self, cls: frozenset[T]) -> None:
+        if len(cls) > 1:
+            for elem in cls:
+                self.data[elem] = cls
+            self.fingerprint ^= hash(cls)
+        else:
+            for elem in cls:
+                self.data.pop(elem, None)
+
+    def _drop_class(self, cls: frozenset[T]) -> None:
+        if len(cls) > 1:
+            self.fingerprint ^= hash(cls)
 
     @property
     def symbols(self):
@@ -63,73 +213,80 @@ class EquivalenceClasses(Generic[T]):
 
     @property
     def unions(self):
-        copy = self.data.copy()
-        while copy:
-            key, ec = copy.popitem()
-            yield ec
-            for other in [x for x in ec if x != key]:
-                del copy[other]
-
-    def find(self, a: T):
+        return iter({id(cls): cls for cls in self.data.values()}.values())
+
+    def find(self, a: T) -> frozenset[T]:
         """Returns a set that includes all elements that are equivalent to a"""
-        if a in self.data:
-            return self.data[a]
-        return {a}
+        cls = self.data.get(a)
+        if cls is None:
+            return frozenset((a,))
+        return cls
 
     def union(self, a: T, b: T):
         a_set = self.find(a)
         b_set = self.find(b)
-        a_set.update(b_set)  # This is an in-place update!
-        self.data[a] = a_set
-        for elem in b_set:
-            self.data[elem] = a_set
+        if a_set is b_set or a in b_set:
+            return
+        self._own()
+        self._drop_class(a_set)
+        self._drop_class(b_set)
+        self._set_class(a_set | b_set)
         # self.logger.debug(f"UNION {a}, {b}, equiv-sets: {self}")
 
     def kill(self, a: T):
         """Remove a from any equivalence set"""
-        if a in self.data:
-            a_set = self.data[a]
-            del self.data[a]
-            a_set.remove(a)
-            if len(a_set) == 1:
-                del self.data[a_set.pop()]
+        a_set = self.data.get(a)
+        if a_set is not None:
+            data = self._own()
+            del data[a]
+            self._drop_class(a_set)
+            self._set_class(a_set - {a})
         # self.logger.debug(f"KILL {a} equiv-sets: {self}")
 
     @staticmethod
     def merge(many_equiv_classes: Iterable["EquivalenceClasses[T]"]):
-        ret = EquivalenceClasses()
-        # 1. Gather all symbols that occur in our sets
-        symbols = set().union(*[x.symbols for x in many_equiv_classes])
-
-        # 2. For every symbol, we find the intersection in all equivalence_classes
-        while symbols:
-            # 2.1 Get one symbol from the queue
-            symbol = symbols.pop()
-            # 2.2 Get all equivalence_sets from all classes
-            sets = [equiv_class.find(symbol) for equiv_class in many_equiv_classes]
-
-            # 2.3 Build the intersection.
-            #
-            # In equivalent, we will end up with all symbols that are
-            # equivalent to symbol in all equivalent classes
-            equivalent = set.intersection(*sets)
-            if len(equivalent) > 1:  # Avoid the trivial equivalence
-                for elem in equivalent:
-                    ret.data[elem] = equivalent
-
-            # 2.4 We already covered these
-            symbols -= equivalent  # We have already covered these symbols
+        many_equiv_classes = list(many_equiv_classes)
+        if not many_equiv_classes:
+            return EquivalenceClasses()
+        first, others = many_equiv_classes[0], many_equiv_classes[1:]
+        # Merging equal states is the common case (e.g., all predecessors passed the same state).
+        others = [other for other in others if other != first]
+        if not others:
+            return EquivalenceClasses(first)
 
+        # Two symbols are equivalent after the merge if they are equivalent
+        # in all instances. Hence, we start with a copy of the first instance
+        # and split its classes by the classes of the other instances. Shared
+        # classes (the same frozenset in all instances) are kept as they are.
+        ret = EquivalenceClasses(first)
+        for cls in list(first.unions):
+            elem = next(iter(cls))
+            if all(other.data.get(elem) is cls for other in others):
+                continue
+            groups = [list(cls)]
+            for other in others:
+                refined = []
+                for group in groups:
+                    by_class: dict[int, list[T]] = {}
+                    for elem in group:
+                        other_cls = other.data.get(elem)
+                        if other_cls is not None:
+                            by_class.setdefault(id(other_cls), []).append(elem)
+                    refined.extend(group for group in by_class.values() if len(group) > 1)
+                groups = refined
+            data = ret._own()
+            ret._drop_class(cls)
+            for elem in cls:
+                del data[elem]
+            for group in groups:
+                ret._set_class(frozenset(group))
         # logging.getLogger("ec").debug(f"MERGE: {many_equiv_classes} -> {ret}")
         return ret
 
     def __eq__(self, other):
         if not isinstance(other, EquivalenceClasses):
             return False
-        for symbol in self.symbols:
-            if self.find(symbol) != other.find(symbol):
-                return False
-        return True
+        return self.data is other.data or (self.fingerprint == other.fingerprint and self.data == other.data)
 
     def __repr__(self):
         return f"<EQ {list(self.unions)}>"
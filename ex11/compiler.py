@@ -3,14 +3,21 @@
 
 from parserll1.generator import *
 
+from AST.types import Node
 from AST.visitor import ASTDumper
 from AST.analysis import SemanticAnalysis
 from CFG.codegen import CodeGeneration
 from CFG.interpreter import Interpreter
+from CFG.profile import Profile
+from CFG.tracing import BinaryTraceWriter
 from CFG.optimizer import Optimizer
+from CFG.ssa import construct_ssa
+from CFG.types import CFG, Instruction
 
+import contextlib
 import os
 import subprocess
+import sys
 import logging
 import tempfile
 
@@ -32,20 +39,41 @@ def main():
 
     frontend = parser.add_argument_group("Parser and Semantic Analysis")
     frontend.add_argument("--dump-ast", action="store_true", help="Dump AST to standard out")
+    frontend.add_argument(
+        "--no-validate",
+        action="store_true",
+        help="Construct AST nodes and IR instructions without runtime type checks (or L0_VALIDATE=0)",
+    )
 
     codegen = parser.add_argument_group("IR-Code Generation")
     codegen.add_argument("--dump-ir", action="store_true", help="Dump IR Code to standard out")
     codegen.add_argument("--dump-cfg", action="store_true", help="Dump CFGs as DOT and PNG")
+    codegen.add_argument("--ssa", action="store_true", help="Convert the IR to SSA form (after the optimizer)")
 
     optimizer = parser.add_argument_group("IR-Code Optimizer")
     optimizer.add_argument("--opt", action="store_true", help="Run the IR-optimize fixpoint iteration")
+    optimizer.add_argument(
+        "--check-cfg", action="store_true", help="Check the cached CFGs against a rebuild (or L0_CHECK_CFG=1)"
+    )
 
     interpreter = parser.add_argument_group("IR-Code Interpreter")
     interpreter.add_argument("--execute", "-x", action="store_true", help="Execute program in interpreter")
     interpreter.add_argument("--trace-instr", "-t", action="store_true", help="... trace executed instructions")
     interpreter.add_argument("--trace-calls", "-c", action="store_true", help="... trace invoked functions")
     interpreter.add_argument("--trace-verbose", action="store_true", help="... dump call frames")
+    interpreter.add_argument("--trace-file", metavar="FILE", help="... write a binary trace to FILE")
     interpreter.add_argument("--execute-dump", action="store_true", help="Dump interpreter state after execution")
+    interpreter.add_argument(
+        "--profile", action="store_true", help="... count executed instructions per function, block and opcode"
+    )
+    interpreter.add_argument(
+        "--profile-format", choices=["table", "json"], default="table", help="... format of the profile"
+    )
+    interpreter.add_argument("--profile-output", metavar="FILE", help="... write the profile to FILE")
+    interpreter.add_argument("--heap-size", type=int, default=1024, help="... heap size in slots (default: 1024)")
+    interpreter.add_argument(
+        "--stack-size", type=int, default=1 << 24, help="... maximal stack size in slots (default: 16M)"
+    )
 
     args = parser.parse_args()
 
@@ -58,6 +86,11 @@ def main():
     ################################################################
     # Load File, Parse to AST, and perform Semantic Analysis
     logging.info("Read source file `%s'", args.source)
+    if args.no_validate:
+        Node.validate = False
+        Instruction.validate = False
+    if args.check_cfg:
+        CFG.check = True
     with open(args.source) as fd:
         parser = load_parser("L")
         tree = parser.parse(fd.read())
@@ -73,6 +106,10 @@ def main():
     if args.opt:
         Optimizer().optimize(ir)
 
+    if args.ssa:
+        for function in ir.functions:
+            construct_ssa(function)
+
     if args.dump_cfg:
         base, _ = os.path.splitext(args.source)
         dot_fn = base + ".dot"
@@ -90,11 +127,26 @@ def main():
         return
 
     if args.execute:
-        machine = Interpreter(ir)
-        ret = machine.exec(trace=args.trace_instr, calls=args.trace_calls, frames=args.trace_verbose)
+        machine = Interpreter(ir, heap_size=args.heap_size, stack_size=args.stack_size)
+        profile = Profile(machine) if args.profile else None
+        observers = [profile] if profile else []
+        # The trace is also closed if the program faults, so the partial trace can be inspected.
+        with open(args.trace_file, "wb") if args.trace_file else contextlib.nullcontext() as trace_file:
+            if trace_file:
+                observers.append(BinaryTraceWriter(trace_file, machine))
+            ret = machine.exec(
+                trace=args.trace_instr, calls=args.trace_calls, frames=args.trace_verbose, observers=observers
+            )
         logging.info("Interpreter executed for %s steps", machine.step_count)
         logging.info("Program returned: %s", ret)
 
+        if profile:
+            with open(args.profile_output, "w") if args.profile_output else contextlib.nullcontext(sys.stdout) as fd:
+                if args.profile_format == "json":
+                    profile.dump_json(fd)
+                else:
+                    profile.dump_table(fd)
+
         if args.execute_dump:
             machine.dump()
 
@@ -0,0 +1,101 @@
+# Unit testing framework
+import sys
+import unittest
+
+# Entities to test
+from AST.types import Add, Identifier, Literal, Neg, Node, TypeInt, VarDecl
+from AST.visitor import Visitor
+
+
+class TestNodeValidation(unittest.TestCase):
+    """Test the runtime validation of AST nodes."""
+
+    def setUp(self):
+        self.validate = Node.validate
+
+    def tearDown(self):
+        Node.validate = self.validate
+
+    def test_validate(self):
+        """Nodes with wrongly typed fields are rejected."""
+        Node.validate = True
+        Add(Literal(1), Identifier("x"))
+        with self.assertRaises(TypeError):
+            Add(Literal(1), "x")
+        with self.assertRaises(TypeError):
+            Literal("1")
+
+    def test_trusted(self):
+        """Without validation, nodes are constructed as given."""
+        Node.validate = False
+        node = Add(Literal(1), "x")
+        self.assertEqual(node.rhs, "x")
+        self.assertEqual([name for name, _ in node.children()], ["lhs", "rhs"])
+
+
+class TestNodeSlots(unittest.TestCase):
+    """Test the slotted AST node classes."""
+
+    def test_slots(self):
+        """Nodes have no per-instance dictionary, only the declared fields."""
+        node = Identifier("x")
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.unknown = 1
+
+    def test_analysis_attributes(self):
+        """The attributes set by later phases are neither printed nor compared."""
+        decl = VarDecl("x", TypeInt())
+        node = Identifier("x")
+        node.decl = decl
+        decl.ir_obj = object()
+        self.assertEqual(node, Identifier("x"))
+        self.assertEqual(repr(node), "Identifier(type=None, name='x')")
+        self.assertEqual(decl, VarDecl("x", TypeInt()))
+
+
+class RecordingVisitor(Visitor):
+    def __init__(self):
+        self.events = []
+
+    def pre_Node(self, N):
+        self.events.append(("pre", self.name(), type(N).__name__))
+
+    def post_Node(self, N):
+        self.events.append(("post", self.name(), type(N).__name__))
+
+
+class TestVisitor(unittest.TestCase):
+    """Test the iterative AST traversal."""
+
+    def test_order(self):
+        """pre_ and post_ methods are called in depth-first order with the name of the child."""
+        visitor = RecordingVisitor()
+        visitor.traversal(Add(Literal(1), Neg(Identifier("x"))))
+        self.assertEqual(
+            visitor.events,
+            [
+                ("pre", None, "Add"),
+                ("pre", "lhs", "Literal"),
+                ("post", "lhs", "Literal"),
+                ("pre", "rhs", "Neg"),
+                ("pre", "expr", "Identifier"),
+                ("post", "expr", "Identifier"),
+                ("post", "rhs", "Neg"),
+                ("post", None, "Add"),
+            ],
+        )
+
+    def test_deep_tree(self):
+        """Trees deeper than the recursion limit can be traversed."""
+        tree = Literal(0)
+        for i in range(sys.getrecursionlimit() * 2):
+            tree = Add(tree, Literal(i))
+        visitor = RecordingVisitor()
+        visitor.traversal(tree)
+        self.assertEqual(len(visitor.events), 2 * (sys.getrecursionlimit() * 4 + 1))
+
+
+# Start unit testing when module is directly loaded.
+if __name__ == "__main__":
+    unittest.main()
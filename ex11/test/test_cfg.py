@@ -0,0 +1,381 @@
+# Unit testing framework
+import unittest
+from pathlib import Path
+
+# Entities to test
+from AST.analysis import SemanticAnalysis
+from CFG.codegen import CodeGeneration
+from CFG.optimizer import Optimizer
+from CFG.types import CFG, Add, Assign, Call, Function, Goto, IfGoto, Instruction, Phi, Reference, Return, Variable
+from CFG.ssa import construct_ssa, destruct_ssa, is_ssa, sequentialize_copies
+from CFG.utils import (
+    EquivalenceClasses,
+    dominance_frontiers,
+    forward_dataflow,
+    immediate_dominators,
+    reverse_postorder,
+)
+
+
+class TestCachedCFG(unittest.TestCase):
+    """Test that the cached CFG follows the modifications of the blocks."""
+
+    def setUp(self):
+        self.check = CFG.check
+        CFG.check = True
+
+    def tearDown(self):
+        CFG.check = self.check
+
+    def _diamond(self):
+        function = Function("f")
+        bb0, bb1, bb2, bb3 = [function.create_block() for _ in range(4)]
+        bb0.append(IfGoto, 1, bb1.label, bb2.label)
+        bb1.append(Goto, bb3.label)
+        bb2.append(Goto, bb3.label)
+        bb3.append(Return, 0)
+        return function, (bb0, bb1, bb2, bb3)
+
+    def test_cached(self):
+        """The CFG is only built once."""
+        function, _ = self._diamond()
+        self.assertIs(function.CFG(), function.CFG())
+
+    def test_edits(self):
+        """Instruction and block edits keep the CFG current."""
+        function, (bb0, bb1, bb2, bb3) = self._diamond()
+        cfg = function.CFG()
+        self.assertEqual(cfg.successors[bb0], [bb1, bb2])
+        self.assertCountEqual(cfg.predecessors[bb3], [bb1, bb2])
+
+        # Replace a terminator
+        bb1.instructions[-1] = Goto(bb2.label)
+        self.assertEqual(cfg.successors[bb1], [bb2])
+        self.assertCountEqual(cfg.predecessors[bb2], [bb0, bb1])
+        self.assertEqual(cfg.predecessors[bb3], [bb2])
+
+        # Remove a terminator, assign a new instruction list
+        del bb2.instructions[-1]
+        self.assertEqual(cfg.successors[bb2], [])
+        self.assertEqual(cfg.predecessors[bb3], [])
+        bb2.instructions = [Goto(bb3.label)]
+        self.assertEqual(cfg.predecessors[bb3], [bb2])
+
+        # Remove a block that is no longer reachable
+        bb0.instructions[-1] = Goto(bb2.label)
+        function.basic_blocks.remove(bb1)
+        self.assertNotIn(bb1, cfg.successors)
+        self.assertEqual(cfg.predecessors[bb2], [bb0])
+
+        # Add a block
+        bb4 = function.create_block()
+        bb4.append(Goto, bb3.label)
+        self.assertCountEqual(cfg.predecessors[bb3], [bb2, bb4])
+
+        function.sort_blocks()
+        function.CFG().verify(function)
+
+    def test_copy_on_write(self):
+        """Edge lists held by a pass are not modified by later edits."""
+        function, (bb0, bb1, bb2, bb3) = self._diamond()
+        predecessors = function.CFG().predecessors[bb3]
+        bb1.instructions[-1] = Return(1)
+        self.assertCountEqual(predecessors, [bb1, bb2])
+        self.assertEqual(function.CFG().predecessors[bb3], [bb2])
+
+    def test_check(self):
+        """The debug check detects jump targets modified in place."""
+        function, (bb0, bb1, bb2, bb3) = self._diamond()
+        function.CFG()
+        bb1.instructions[-1].label = bb2.label
+        with self.assertRaises(AssertionError):
+            function.CFG()
+
+    def test_optimizer(self):
+        """The optimizer keeps the CFG of all programs current."""
+        from parserll1.generator import load_parser
+
+        parser = load_parser("L", silent=True)
+        for filename in sorted(Path("programs").glob("*.src")):
+            with self.subTest(filename=filename.name):
+                tree = parser.parse(filename.read_text())
+                SemanticAnalysis().traversal(tree)
+                ir = CodeGeneration().compile(tree)
+                Optimizer().optimize(ir)
+                for function in ir.functions:
+                    function.CFG().verify(function)
+
+
+class TestInstruction(unittest.TestCase):
+    """Test the IR instructions."""
+
+    def setUp(self):
+        self.validate = Instruction.validate
+
+    def tearDown(self):
+        Instruction.validate = self.validate
+
+    def test_operands(self):
+        """The operand accessors return the source and destination operands."""
+        x, y = Variable("x"), Variable("y")
+        add = Add(x, y, 1)
+        self.assertEqual(add.operands_src(), [y, 1])
+        self.assertEqual(add.operands(), [x, y, 1])
+        self.assertIs(add.operand_dst(), x)
+        self.assertEqual(repr(add), "x   := Add y, 1")
+
+        function = Function("f")
+        call = Call(x, function, [y, 2])
+        self.assertEqual(call.operands_src(), [function, y, 2])
+        self.assertIsNone(Return(y).operand_dst())
+        self.assertEqual(Return(y).operands_src(), [y])
+
+    def test_slots(self):
+        """Instructions have no instance dictionary."""
+        add = Add(Variable("x"), 1, 2)
+        self.assertFalse(hasattr(add, "__dict__"))
+        with self.assertRaises(AttributeError):
+            add.value = 1  # type: ignore
+
+    def test_validate(self):
+        """The operand types are only checked if validation is enabled."""
+        Instruction.validate = True
+        with self.assertRaises(TypeError):
+            Add(Variable("x"), "y", 1)  # type: ignore
+        Instruction.validate = False
+        self.assertEqual(Add(Variable("x"), "y", 1).operands_src(), ["y", 1])  # type: ignore
+
+
+class TestDataflow(unittest.TestCase):
+    """Test the dataflow helpers."""
+
+    def test_equivalence_classes(self):
+        """Union, kill and copies of equivalence classes."""
+        x = EquivalenceClasses()
+        x.union("a", "b")
+        x.union("b", 1)
+        self.assertEqual(x.find("a"), {"a", "b", 1})
+        self.assertEqual(x.find("c"), {"c"})
+
+        # Copies are independent of the original
+        y = EquivalenceClasses(x)
+        self.assertEqual(x, y)
+        y.kill("b")
+        self.assertEqual(y.find("a"), {"a", 1})
+        self.assertEqual(x.find("b"), {"a", "b", 1})
+        self.assertNotEqual(x, y)
+        self.assertNotEqual(y, x)
+
+        # Equality does not depend on the order of the operations
+        z = EquivalenceClasses()
+        z.union(1, "a")
+        self.assertEqual(y, z)
+        y.kill("a")
+        self.assertEqual(y, EquivalenceClasses())
+
+    def test_merge(self):
+        """Two symbols stay equivalent if they are equivalent in all merged instances."""
+        x = EquivalenceClasses()
+        x.union("a", "b")
+        x.union("a", "c")
+        x.union("d", "e")
+        y = EquivalenceClasses(x)
+        y.kill("c")
+        y.union("c", "d")
+        merged = EquivalenceClasses.merge([x, y])
+        self.assertEqual(merged.find("a"), {"a", "b"})
+        self.assertEqual(merged.find("c"), {"c"})
+        self.assertEqual(merged.find("d"), {"d", "e"})
+        self.assertEqual(EquivalenceClasses.merge([x, x]), x)
+        self.assertEqual(EquivalenceClasses.merge([]), EquivalenceClasses())
+
+    def test_forward_dataflow(self):
+        """The dataflow visits the blocks in reverse postorder until the states are stable."""
+        function = Function("f")
+        bb0, bb1, bb2, bb3 = [function.create_block() for _ in range(4)]
+        # bb0 -> bb1 <-> bb2, bb1 -> bb3
+        bb0.append(Goto, bb1.label)
+        bb1.append(IfGoto, 1, bb2.label, bb3.label)
+        bb2.append(Goto, bb1.label)
+        bb3.append(Return, 0)
+        self.assertEqual(reverse_postorder(function)[:2], [bb0, bb1])
+        self.assertEqual(set(reverse_postorder(function)), {bb0, bb1, bb2, bb3})
+
+        # Reachable blocks: the set of blocks on some path from the entry
+        visited = []
+
+        def transfer(bb, d_in):
+            visited.append(bb)
+            return d_in | {bb}
+
+        states = forward_dataflow(function, frozenset(), frozenset(), transfer, lambda ins: frozenset().union(*ins))
+        self.assertEqual(states[bb3], {bb0, bb1, bb2, bb3})
+        self.assertEqual(states[bb2], {bb0, bb1, bb2})
+        self.assertEqual(visited[:2], [bb0, bb1])
+
+
+class TestLiveness(unittest.TestCase):
+    """Test the liveness analysis."""
+
+    def _loop(self):
+        # x := 0; while (x <= 9) { y := x + 1; x := y }; return x; z is never read
+        function = Function("f")
+        x, y, z = function.create_variable("x"), function.create_variable("y"), function.create_variable("z")
+        bb0, bb1, bb2, bb3 = [function.create_block() for _ in range(4)]
+        bb0.append(Assign, x, 0)
+        bb0.append(Assign, z, 1)
+        bb0.append(Goto, bb1.label)
+        bb1.append(Add, y, x, -9)
+        bb1.append(IfGoto, y, bb2.label, bb3.label)
+        bb2.append(Add, y, x, 1)
+        bb2.append(Assign, x, y)
+        bb2.append(Goto, bb1.label)
+        bb3.append(Return, x)
+        return function, (x, y, z), (bb0, bb1, bb2, bb3)
+
+    def test_blocks(self):
+        """Live variables at the block boundaries, also around the loop."""
+        function, (x, y, z), (bb0, bb1, bb2, bb3) = self._loop()
+        liveness = function.liveness()
+        self.assertEqual(liveness.to_set(liveness.live_in[bb0]), set())
+        self.assertEqual(liveness.to_set(liveness.live_out[bb0]), {x})
+        self.assertEqual(liveness.to_set(liveness.live_in[bb1]), {x})
+        self.assertEqual(liveness.to_set(liveness.live_out[bb2]), {x})
+        self.assertEqual(liveness.to_set(liveness.live_in[bb3]), {x})
+
+    def test_live_after(self):
+        """Live variables after every instruction."""
+        function, (x, y, z), (bb0, bb1, bb2, bb3) = self._loop()
+        liveness = function.liveness()
+        self.assertEqual([liveness.to_set(bits) for bits in liveness.live_after(bb0)], [{x}, {x}, {x}])
+        self.assertEqual([liveness.to_set(bits) for bits in liveness.live_after(bb2)], [{y}, {x}, {x}])
+        self.assertFalse(liveness.live_after(bb0)[1] & liveness.bit(z))
+
+    def test_cached(self):
+        """The analysis is cached until the instructions or blocks of the function change."""
+        function, (x, y, z), (bb0, bb1, bb2, bb3) = self._loop()
+        liveness = function.liveness()
+        self.assertIs(function.liveness(), liveness)
+        bb3.instructions[-1] = Return(z)
+        self.assertIsNot(function.liveness(), liveness)
+        self.assertIn(z, function.liveness().to_set(function.liveness().live_out[bb0]))
+        liveness = function.liveness()
+        function.create_block().append(Return, 0)
+        self.assertIsNot(function.liveness(), liveness)
+
+    def test_referenced(self):
+        """Referenced variables are recorded, as they can be read through pointers."""
+        function, (x, y, z), (bb0, bb1, bb2, bb3) = self._loop()
+        bb0.instructions.insert(0, Reference(y, z))
+        liveness = function.liveness()
+        self.assertEqual(liveness.to_set(liveness.referenced), {z})
+
+
+class TestSSA(unittest.TestCase):
+    """Test the construction and destruction of the SSA form."""
+
+    def setUp(self):
+        from parserll1.generator import load_parser
+
+        self.parser = load_parser("L", silent=True)
+
+    def _compile(self, filename, optimize=False):
+        tree = self.parser.parse(Path(filename).read_text())
+        SemanticAnalysis().traversal(tree)
+        ir = CodeGeneration().compile(tree)
+        if optimize:
+            Optimizer().optimize(ir)
+        return ir
+
+    def test_dominators(self):
+        """Immediate dominators and dominance frontiers of a loop with a diamond."""
+        function = Function("f")
+        bb0, bb1, bb2, bb3, bb4, bb5 = [function.create_block() for _ in range(6)]
+        # bb0 -> bb1 -> (bb2 | bb3) -> bb4 -> bb1, bb1 -> bb5
+        bb0.append(Goto, bb1.label)
+        bb1.append(IfGoto, 1, bb2.label, bb5.label)
+        bb2.append(IfGoto, 1, bb3.label, bb4.label)
+        bb3.append(Goto, bb4.label)
+        bb4.append(Goto, bb1.label)
+        bb5.append(Return, 0)
+        idom = immediate_dominators(function)
+        self.assertEqual(idom, {bb0: bb0, bb1: bb0, bb2: bb1, bb3: bb2, bb4: bb2, bb5: bb1})
+        frontiers = dominance_frontiers(function, idom)
+        self.assertEqual(frontiers[bb3], {bb4})
+        self.assertEqual(frontiers[bb4], {bb1})
+        self.assertEqual(frontiers[bb2], {bb1})
+        self.assertEqual(frontiers[bb0], set())
+
+    def test_construct(self):
+        """Every variable is written once, and the loop header of fib_iter merges the loop variables."""
+        fib_iter = self._compile("programs/fib.src").find_function("fib_iter")
+        construct_ssa(fib_iter)
+        self.assertTrue(is_ssa(fib_iter))
+        writes = [instr.dst for bb in fib_iter.basic_blocks for instr in bb.instructions if instr.operand_dst()]
+        self.assertEqual(len(writes), len(set(writes)))
+        self.assertLessEqual(set(writes), set(fib_iter.variables))
+
+        header = fib_iter.basic_blocks[1]
+        phis = [instr for instr in header.instructions if isinstance(instr, Phi)]
+        # a, b, and n are live at the loop header; tmp and the temporaries are not.
+        self.assertEqual(sorted(phi.dst.name for phi in phis), ["a.2", "b.2", "p0_n.1"])
+        for phi in phis:
+            self.assertEqual({label.target for label in phi.labels}, set(fib_iter.CFG().predecessors[header]))
+
+    def test_programs(self):
+        """The programs compute the same result after the construction and destruction."""
+        from CFG.interpreter import Interpreter
+
+        for filename in sorted(Path("programs").glob("*.src")):
+            for optimize in (False, True):
+                with self.subTest(filename=filename.name, optimize=optimize):
+                    expected = Interpreter(self._compile(filename, optimize)).exec()
+                    ir = self._compile(filename, optimize)
+                    for function in ir.functions:
+                        construct_ssa(function)
+                    # The interpreter destructs the SSA form on loading.
+                    self.assertEqual(Interpreter(ir).exec(), expected)
+                    for function in ir.functions:
+                        self.assertFalse(is_ssa(function))
+                        function.CFG().verify(function)
+
+    def test_critical_edge(self):
+        """Copies on a critical edge get a block of their own."""
+        function = Function("f")
+        x, x1, x2 = function.create_variable("x"), function.create_variable("x1"), function.create_variable("x2")
+        bb0, bb1, bb2 = [function.create_block() for _ in range(3)]
+        bb0.append(Assign, x1, 1)
+        bb0.append(IfGoto, 1, bb1.label, bb2.label)
+        bb1.append(Assign, x2, 2)
+        bb1.append(Goto, bb2.label)
+        bb2.instructions = [Phi(x, [x1, x2], [bb0.label, bb1.label]), Return(x)]
+        destruct_ssa(function)
+        self.assertEqual(len(function.basic_blocks), 4)
+        split = function.basic_blocks[3]
+        self.assertEqual(function.CFG().successors[bb0], [bb1, split])
+        self.assertEqual(split.instructions[0], Assign(x, x1))
+        self.assertEqual(bb1.instructions[-2], Assign(x, x2))
+        self.assertEqual(bb2.instructions, [Return(x)])
+
+    def test_parallel_copies(self):
+        """Parallel copies are ordered, and cycles are broken with a temporary."""
+
+        def run(copies):
+            values = {var: var.name for var in (a, b, c)}
+            for instr in sequentialize_copies(function, copies):
+                values[instr.dst] = values[instr.value] if isinstance(instr.value, Variable) else instr.value
+            return {var.name: values[var] for var in (a, b, c)}
+
+        function = Function("f")
+        a, b, c = function.create_variable("a"), function.create_variable("b"), function.create_variable("c")
+        # a := b, b := c, c := 1 must read b and c before they are overwritten.
+        self.assertEqual(run([(a, b), (b, c), (c, 1)]), dict(a="b", b="c", c=1))
+        # Swap and rotation
+        self.assertEqual(run([(a, b), (b, a)]), dict(a="b", b="a", c="c"))
+        self.assertEqual(run([(a, b), (b, c), (c, a)]), dict(a="b", b="c", c="a"))
+        self.assertEqual(len(sequentialize_copies(function, [(a, b), (b, a)])), 3)
+
+
+# Start unit testing when module is directly loaded.
+if __name__ == "__main__":
+    unittest.main()
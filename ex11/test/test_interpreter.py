@@ -0,0 +1,150 @@
+# Unit testing framework
+import contextlib
+import io
+import unittest
+from pathlib import Path
+from AST.analysis import SemanticAnalysis
+from CFG.codegen import CodeGeneration
+from CFG.interpreter import Interpreter
+from CFG.optimizer import Optimizer
+from CFG.profile import Profile
+from CFG.tracing import CALL, INSTR, RETURN, BinaryTraceWriter, read_trace
+
+
+class TestInterpreter(unittest.TestCase):
+    """Test the pre-decoded execution engine against the step()-wise interpreter."""
+
+    def setUp(self):
+        """Load the L0 Grammar."""
+        from parserll1.generator import load_parser
+
+        self.parser = load_parser("L", silent=True)
+
+    def _compile(self, filename, optimize):
+        with open(filename) as fd:
+            return self._compile_source(fd.read(), optimize)
+
+    def _compile_source(self, source, optimize=False):
+        tree = self.parser.parse(source)
+        SemanticAnalysis().traversal(tree)
+        ir = CodeGeneration().compile(tree)
+        if optimize:
+            Optimizer().optimize(ir)
+        return ir
+
+    def _step(self, machine, max_steps=None):
+        while max_steps is None or machine.step_count <= max_steps:
+            x = machine.step()
+            if x is not None:
+                return x
+
+    def test_programs(self):
+        """Both engines compute the same result in the same number of steps."""
+        for filename in sorted(Path("programs").glob("*.src")):
+            for optimize in (False, True):
+                with self.subTest(program=filename.name, optimize=optimize):
+                    fast = Interpreter(self._compile(filename, optimize))
+                    slow = Interpreter(self._compile(filename, optimize))
+                    self.assertEqual(fast.run(), self._step(slow))
+                    self.assertEqual(fast.step_count, slow.step_count)
+                    self.assertEqual((fast.pc, fast.bp, fast.sp), (slow.pc, slow.bp, slow.sp))
+
+    def test_max_steps(self):
+        """Execution stops after max_steps and can be resumed."""
+        fast = Interpreter(self._compile("programs/fib.src", False))
+        slow = Interpreter(self._compile("programs/fib.src", False))
+        self.assertIsNone(fast.exec(max_steps=100))
+        self.assertIsNone(self._step(slow, max_steps=100))
+        self.assertEqual((fast.step_count, fast.pc, fast.bp), (slow.step_count, slow.pc, slow.bp))
+        self.assertEqual(fast.exec(), 2 * 55)
+
+    recursive_sum = """
+        func sum(n : int) : int {
+            if (n <= 0) {
+                return 0;
+            }
+            return n + sum(n - 1);
+        }
+
+        func main() : int {
+            var x : int;
+            var p : &int;
+            p := &x;
+            *p := sum(20000);
+            return x;
+        }
+    """
+
+    def test_deep_recursion(self):
+        """The stack grows on demand up to its maximal size."""
+        machine = Interpreter(self._compile_source(self.recursive_sum))
+        self.assertEqual(machine.exec(), 20000 * 20001 // 2)
+        self.assertEqual(self._step(Interpreter(self._compile_source(self.recursive_sum))), 20000 * 20001 // 2)
+
+        with self.assertRaisesRegex(RuntimeError, "Stack Overflow"):
+            Interpreter(self._compile_source(self.recursive_sum), stack_size=10000).exec()
+
+    def test_constant_division_by_zero(self):
+        """A constant division by zero only faults if it is executed."""
+        source = """
+            func main() : int {
+                var x : int;
+                x := 0;
+                if (x) {
+                    return 1 / 0;
+                }
+                return 3;
+            }
+        """
+        self.assertEqual(Interpreter(self._compile_source(source)).exec(), 3)
+        self.assertEqual(self._step(Interpreter(self._compile_source(source))), 3)
+        with self.assertRaises(ZeroDivisionError):
+            Interpreter(self._compile_source(source.replace("x := 0", "x := 1"))).exec()
+
+    def test_profile(self):
+        """The profile accounts for every executed instruction."""
+        machine = Interpreter(self._compile("programs/fib.src", False))
+        profile = Profile(machine)
+        self.assertEqual(machine.exec(observers=[profile]), 2 * 55)
+        functions = {row["function"]: row for row in profile.functions()}
+        self.assertEqual(functions["fib"]["calls"], 177)
+        self.assertEqual(functions["fib"]["steps"], functions["fib"]["inclusive_steps"])
+        self.assertEqual(functions["main"]["inclusive_steps"], machine.step_count - 2)
+        # All steps but the initial call of main and the final halt are inside functions.
+        self.assertEqual(sum(row["steps"] for row in functions.values()), machine.step_count - 2)
+        self.assertEqual(sum(row["steps"] for row in profile.blocks()), machine.step_count - 2)
+        self.assertEqual(sum(profile.opcodes().values()), machine.step_count - 1)
+
+    def test_binary_trace(self):
+        """The binary trace records every step, call and return."""
+        machine = Interpreter(self._compile("programs/fib.src", False))
+        fd = io.BytesIO()
+        self.assertEqual(machine.exec(observers=[BinaryTraceWriter(fd, machine)]), 2 * 55)
+        fd.seek(0)
+        header, records = read_trace(fd)
+        records = list(records)
+        self.assertEqual(len(header["code"]), len(machine.code))
+        self.assertEqual(sum(1 for r in records if r[0] == INSTR), machine.step_count)
+        calls = [r for r in records if r[0] == CALL]
+        # main, 177 calls of fib and one call of fib_iter
+        self.assertEqual(len(calls), 1 + 177 + 1)
+        self.assertEqual(calls[1], (CALL, header["functions"]["fib"], [10]))
+        self.assertEqual([r for r in records if r[0] == RETURN][-1], (RETURN, 2 * 55))
+
+    def test_text_trace(self):
+        """The call trace prints the operands of the Call instructions, not their values."""
+        machine = Interpreter(self._compile("programs/fib.src", False))
+        fd = io.StringIO()
+        with contextlib.redirect_stdout(fd):
+            self.assertEqual(machine.exec(calls=True), 2 * 55)
+        lines = fd.getvalue().splitlines()
+        calls = [line for line in lines if line.startswith("CALL func:fib ")]
+        self.assertEqual(len(calls), 177)
+        self.assertEqual(calls[0], "CALL func:fib [10]")
+        self.assertEqual(set(calls[1:]), {"CALL func:fib [t7]", "CALL func:fib [t9]"})
+        self.assertEqual(lines[-1], "RETURN func:main 110")
+
+
+# Start unit testing when module is directly loaded.
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,14 @@ from pathlib import Path
 from AST.analysis import SemanticAnalysis
 from CFG.codegen import CodeGeneration
 from CFG.interpreter import Interpreter
-from CFG.optimizer import Optimizer
-from CFG.types import Goto
+from CFG.optimizer import (
+    ConstantFolding,
+    DeadBlockElimination,
+    DeadStoreElimination,
+    Optimizer,
+    SparseConditionalConstantPropagation,
+)
+from CFG.types import Assign, Goto, IfGoto, Return
 
 
 def make_compile_run_test(filename, expected, max_steps=10000):
@@ -98,6 +104,104 @@ class TestOptimizer(unittest.TestCase):
 
         self.assertEqual(len(f1.variables), 0, "opt-dead-variables.src/f1(): Invalid number of variables")
 
+    def test_stats(self):
+        """The passes count their changes."""
+        with open("programs/opt-merge.src") as fd:
+            tree = self.parser.parse(fd.read())
+        SemanticAnalysis().traversal(tree)
+        ir = CodeGeneration().compile(tree)
+        f1 = ir.find_function("f1")
+        blocks = len(f1.basic_blocks)
+        optimizer = Optimizer()
+        optimizer.optimize_function(f1)
+        stats = optimizer.stats()
+        # if (1) is folded to a goto, then the blocks are merged into the entry block
+        self.assertEqual(stats["ConstantFolding"]["instructions rewritten"], 1)
+        self.assertEqual(stats["MergeBlocks"]["blocks merged"], 2)
+        self.assertEqual(stats["DeadBlockElimination"]["blocks removed"], blocks - len(f1.basic_blocks))
+
+        # A second run does not change anything
+        before = {name: counter.copy() for name, counter in stats.items()}
+        self.assertFalse(optimizer.optimize_function(f1))
+        self.assertEqual(optimizer.stats(), before)
+
+    def test_worklist(self):
+        """Local passes are only rerun on the changed blocks."""
+
+        class RecordingFolding(ConstantFolding):
+            def optimize_blocks(self, function, blocks):
+                runs.append(list(blocks))
+                return super().optimize_blocks(function, blocks)
+
+        runs = []
+        f1 = self._compile("programs/opt-merge.src", optimize=False).find_function("f1")
+        optimizer = Optimizer()
+        optimizer.optimizers[0] = RecordingFolding()
+        optimizer.optimize_function(f1)
+        # The first run covers all blocks, later runs only the blocks changed in between.
+        self.assertGreater(len(runs), 1)
+        self.assertEqual(len(runs[0]), 4)
+        for blocks in runs[1:]:
+            self.assertLess(len(blocks), 4)
+
+    def test_dead_stores(self):
+        """Writes that are overwritten before they are read are removed."""
+        source = """func main() : int {
+            var a : int; var b : int;
+            a := 1;
+            while (a <= 5) { b := a; a := 7; a := b + 1; }
+            return a;
+        }"""
+        tree = self.parser.parse(source)
+        SemanticAnalysis().traversal(tree)
+        ir = CodeGeneration().compile(tree)
+        main = ir.find_function("main")
+        expected, _ = self._run(ir)
+
+        dse = DeadStoreElimination()
+        self.assertTrue(dse.optimize_function(main))
+        self.assertEqual(dse.stats["stores removed"], 1)
+        for bb in main.basic_blocks:
+            for instr in bb.instructions:
+                self.assertFalse(isinstance(instr, Assign) and instr.value == 7, "a := 7 is a dead store")
+        self.assertFalse(dse.optimize_function(main))
+        self.assertEqual(self._run(ir)[0], expected)
+
+    def test_sparse_conditional_constants(self):
+        """Constant branches are folded in one run, so the dead blocks can be removed right away."""
+        ir = self._compile("programs/optimizer.src", optimize=False)
+        main = ir.find_function("main")
+        expected, _ = self._run(ir)
+
+        sccp = SparseConditionalConstantPropagation()
+        self.assertTrue(sccp.optimize_function(main))
+        self.assertEqual(sccp.stats["branches folded"], 2)
+        dbe = DeadBlockElimination()
+        while dbe.optimize_function(main):
+            pass
+        for bb in main.basic_blocks:
+            self.assertNotIsInstance(bb.instructions[-1], IfGoto)
+        self.assertFalse(sccp.optimize_function(main))
+        self.assertEqual(self._run(ir)[0], expected)
+
+    def test_sparse_conditional_loop(self):
+        """A variable that is only changed in a branch that is never taken stays constant in a loop."""
+        source = """func main() : int {
+            var a : int; var i : int;
+            a := 1; i := 0;
+            while (i <= 10) { if (a <= 1) { a := 1; } else { a := 2; } i := i + 1; }
+            return a;
+        }"""
+        tree = self.parser.parse(source)
+        SemanticAnalysis().traversal(tree)
+        ir = CodeGeneration().compile(tree)
+        Optimizer().optimize(ir)
+        main = ir.find_function("main")
+        returns = [bb.instructions[-1] for bb in main.basic_blocks if isinstance(bb.instructions[-1], Return)]
+        self.assertEqual([ret.value for ret in returns], [1])
+        self.assertEqual(len([bb for bb in main.basic_blocks if isinstance(bb.instructions[-1], IfGoto)]), 1)
+        self.assertEqual(self._run(ir)[0], 1)
+
     def test_fibonacci_compile(self):
         ir = self._compile("programs/fib.src")
         fib_iter = ir.find_function("fib_iter")
@@ -0,0 +1,44 @@
+# Unit testing framework
+import unittest
+
+# Entities to test
+from utils import double_dispatch
+
+
+class Base: ...
+
+
+class Derived(Base): ...
+
+
+class Dispatcher:
+    def visit_Base(self, obj):
+        return "Base"
+
+
+class OverridingDispatcher(Dispatcher):
+    def visit_Derived(self, obj):
+        return "Derived"
+
+
+class TestDoubleDispatch(unittest.TestCase):
+    """Test the cached double dispatch."""
+
+    def test_mro(self):
+        """The method for the most specific class of the object is called."""
+        self.assertEqual(double_dispatch(Dispatcher(), "visit_", Derived()), "Base")
+        self.assertEqual(double_dispatch(OverridingDispatcher(), "visit_", Derived()), "Derived")
+        self.assertEqual(double_dispatch(OverridingDispatcher(), "visit_", Base()), "Base")
+        # Repeated calls are served from the cache
+        self.assertEqual(double_dispatch(Dispatcher(), "visit_", Derived()), "Base")
+
+    def test_missing(self):
+        """Missing methods raise an error unless they are ignored."""
+        self.assertIsNone(double_dispatch(Dispatcher(), "fold_", Derived(), ignore_missing=True))
+        with self.assertRaises(RuntimeError):
+            double_dispatch(Dispatcher(), "fold_", Derived())
+
+
+# Start unit testing when module is directly loaded.
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,26 @@
+# Resolved dispatch targets: (class of self, prefix, class of object) -> method name or None
+_dispatch_cache = {}
+
+
 def double_dispatch(self, prefix, object, *args, ignore_missing=False, **kwargs):
-    for cls in type(object).__mro__:
-        method_name = prefix + cls.__name__
-        method = getattr(self, method_name, None)
-        if method:  # Method found. Call it!
-            return method(object, *args, **kwargs)
+    key = (type(self), prefix, type(object))
+    try:
+        method_name = _dispatch_cache[key]
+    except KeyError:
+        # First dispatch for this combination: Walk the MRO once and remember the result.
+        method_name = None
+        for cls in type(object).__mro__:
+            if getattr(self, prefix + cls.__name__, None):
+                method_name = prefix + cls.__name__
+                break
+        _dispatch_cache[key] = method_name
+
+    if method_name is not None:  # Method found. Call it!
+        return getattr(self, method_name)(object, *args, **kwargs)
 
     if not ignore_missing:
         raise RuntimeError("Double Dispatch: could not find {}-method for {}".format(prefix, type(object)))
+
+
+# Methods added to a class after its first dispatch are only found after clearing the cache.
+double_dispatch.cache_clear = _dispatch_cache.clear
@@ -1,37 +1,113 @@
 from typing import Optional, Set
 
-from parserll1.grammar import Grammar, Terminal, NonTerminal, Symbol, Word, Epsilon, isWord, Rule
+from parserll1.grammar import Grammar, Terminal, NonTerminal, Word, Epsilon, isWord, Rule
 
 
 class LL1Analysis:
+    """
+    Computes the EPS, FIRST, FOLLOW and PREDICT sets of a grammar.
+
+    The sets of all non-terminals are computed at once by an iterative
+    fixpoint on the first query and cached afterwards. Hence, the grammar
+    must not be modified after the first query.
+    """
+
     def __init__(self, grammar: Grammar):
         self.grammar = grammar
+        self._nullable: Optional[Set[NonTerminal]] = None
+        self._first: dict[NonTerminal, Set[Terminal]] = {}
+        self._follow: dict[NonTerminal, Set[Terminal]] = {}
+        self._predict: dict[Rule, Set[Terminal]] = {}
+
+    def _analyze(self):
+        """Computes nullable, FIRST and FOLLOW sets for all non-terminals."""
+        if self._nullable is not None:
+            return
+        rules = self.grammar.rules
+        nonterminals = set(self.grammar.nonterminals.values()) | {rule.lhs for rule in rules}
+        # Epsilons never contribute to any set, so we drop them once.
+        words = [(rule.lhs, [x for x in rule.rhs if not isinstance(x, Epsilon)]) for rule in rules]
+
+        # Nullable: A non-terminal is nullable if all symbols of one of its rules are nullable.
+        nullable: Set[NonTerminal] = set()
+        changed = True
+        while changed:
+            changed = False
+            for lhs, word in words:
+                if lhs not in nullable and all(x in nullable for x in word):
+                    nullable.add(lhs)
+                    changed = True
+        self._nullable = nullable
+
+        # FIRST: Union of the FIRST sets of the leading symbols up to the first non-nullable one.
+        first: dict[NonTerminal, Set[Terminal]] = {NT: set() for NT in nonterminals}
+        changed = True
+        while changed:
+            changed = False
+            for lhs, word in words:
+                size = len(first[lhs])
+                first[lhs] |= self._first_of(word, first)
+                changed |= size != len(first[lhs])
+        self._first = first
+
+        # FOLLOW: For A -> a B b, FOLLOW(B) contains FIRST(b) and, if b is nullable, FOLLOW(A).
+        follow: dict[NonTerminal, Set[Terminal]] = {NT: set() for NT in nonterminals}
+        # Constant FIRST(b) parts and the FOLLOW(A) -> FOLLOW(B) edges are collected once.
+        edges = set()
+        for lhs, word in words:
+            rest_first: Set[Terminal] = set()
+            rest_nullable = True
+            for symbol in reversed(word):
+                if isinstance(symbol, NonTerminal):
+                    follow[symbol] |= rest_first
+                    if rest_nullable and symbol is not lhs:
+                        edges.add((lhs, symbol))
+                if isinstance(symbol, Terminal):
+                    rest_first = {symbol}
+                    rest_nullable = False
+                elif symbol in nullable:
+                    rest_first = rest_first | first[symbol]
+                else:
+                    rest_first = set(first[symbol])
+                    rest_nullable = False
+        changed = True
+        while changed:
+            changed = False
+            for lhs, symbol in edges:
+                size = len(follow[symbol])
+                follow[symbol] |= follow[lhs]
+                changed |= size != len(follow[symbol])
+        self._follow = follow
+
+    def _first_of(self, word, first) -> Set[Terminal]:
+        """Returns the FIRST set of a word without epsilons using the given FIRST sets of non-terminals."""
+        result: Set[Terminal] = set()
+        for symbol in word:
+            if isinstance(symbol, Terminal):
+                result.add(symbol)
+                break
+            result |= first[symbol]
+            if symbol not in self._nullable:
+                break
+        return result
 
-    def EPS(self, word: Word, visited: Optional[Set[NonTerminal]] = None) -> bool:
+    def EPS(self, word: Word) -> bool:
         """
         Returns true if all non-terminals within word can result
         in the empty word via their derivations.
         """
         assert isWord(word), "{} is no word".format(word)
-
-        if not visited:
-            visited = set()
+        self._analyze()
 
         for symbol in word:
-            if isinstance(symbol, Epsilon):
-                continue
-            elif isinstance(symbol, Terminal):
+            if isinstance(symbol, Terminal):
+                return False
+            elif isinstance(symbol, NonTerminal) and symbol not in self._nullable:
                 return False
-            elif isinstance(symbol, NonTerminal):
-                if symbol in visited:
-                    continue
-                visited.add(symbol)
-                if not any(self.EPS(rule.rhs, visited) for rule in symbol.rules):
-                    return False
 
         return True
 
-    def FIRST(self, word: Word, visited: Optional[Set[NonTerminal]] = None) -> Set[Terminal]:
+    def FIRST(self, word: Word) -> Set[Terminal]:
         """
         Returns the FIRST set of word.
 
@@ -39,56 +115,21 @@ class LL1Analysis:
         of a given non-terminal.
         """
         assert isWord(word), "{} is no word".format(word)
+        self._analyze()
 
-        first = set()
-
-        if not visited:
-            visited = set()
+        return self._first_of([x for x in word if not isinstance(x, Epsilon)], self._first)
 
-        for symbol in word:
-            if isinstance(symbol, Epsilon):
-                continue
-            elif isinstance(symbol, Terminal):
-                first.add(symbol)
-                break
-            elif isinstance(symbol, NonTerminal):
-                if symbol in visited:
-                    continue
-                visited.add(symbol)
-                for rule in symbol.rules:
-                    for x in self.FIRST(rule.rhs, visited):
-                        first.add(x)
-                if not any(self.EPS(rule.rhs) for rule in symbol.rules):
-                    break
-        
-        return first
-
-    def FOLLOW(self, symbol: NonTerminal, visited: Optional[Set[NonTerminal]] = None) -> Set[Terminal]:
+    def FOLLOW(self, symbol: NonTerminal) -> Set[Terminal]:
         """
         Returns the FOLLOW set of symbol.
 
         The FOLLOW set contains all terminals which occur right after the given non-terminal symbol
         when derivating from the start symbol S.
         """
-        assert isinstance(symbol, NonTerminal),\
-            "{} is no NonTerminal".format(symbol)
-
-        follow = set()
-
-        if not visited:
-            visited = set()
+        assert isinstance(symbol, NonTerminal), "{} is no NonTerminal".format(symbol)
+        self._analyze()
 
-        for rule in self.grammar.rules:
-            for index, value in [(i, v) for i, v in enumerate(rule.rhs) if v == symbol]:
-                rest = rule.rhs[(index + 1):]
-                for x in self.FIRST(rest):
-                    follow.add(x)
-                if self.EPS(rest) and rule.lhs not in visited:
-                    visited.add(rule.lhs)
-                    for x in self.FOLLOW(rule.lhs, visited):
-                        follow.add(x)
-
-        return follow
+        return set(self._follow.get(symbol, ()))
 
     def PREDICT(self, rule: Rule) -> Set[Terminal]:
         """
@@ -99,15 +140,13 @@ class LL1Analysis:
         If a, however, can become the empty word via derivation then
         the PREDICT set also contains the FOLLOW set of the non-terminal A.
         """
-        assert isinstance(rule, Rule), \
-            "{} is no rule".format(rule)
-
-        predict = set()
-
-        for x in self.FIRST(rule.rhs):
-            predict.add(x)
-        if self.EPS(rule.rhs):
-            for x in self.FOLLOW(rule.lhs):
-                predict.add(x)
-        
-        return predict
+        assert isinstance(rule, Rule), "{} is no rule".format(rule)
+
+        predict = self._predict.get(rule)
+        if predict is None:
+            predict = self.FIRST(rule.rhs)
+            if self.EPS(rule.rhs):
+                predict |= self.FOLLOW(rule.lhs)
+            self._predict[rule] = predict
+
+        return set(predict)
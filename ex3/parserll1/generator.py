@@ -2,8 +2,14 @@ import re
 import sys
 import os
 import pathlib
+import hashlib
+import functools
+import tempfile
 import importlib
+import importlib.util
 import logging
+import marshal
+import types
 from parserll1.grammar import Terminal, Epsilon, Grammar
 from parserll1.analysis import LL1Analysis
 
@@ -78,6 +84,56 @@ class ParserGenerator:
         writeLn("    else:")
         writeLn("        print(str(scanner_result))")
 
+    def predicts(self, NT):
+        """Returns the PREDICT set of every rule of the given non-terminal.
+
+        :param NT: The non-terminal.
+        :return: A list of (rule, PREDICT set) tuples in rule order.
+        """
+        predicts = {}
+        ret = []
+        assert len(NT.rules) > 0, "{} has no rules, probably you mixed up tokens and rules".format(NT.name)
+        for rule in NT.rules:
+            PREDICT = self.analysis.PREDICT(rule)
+
+            # Make sure that the PREDICT set for all rules of a specific non-terminal is unique.
+            # This is necessary because if multiple rules of one non-terminal share the same PREDICT set
+            # then we can't decide which rule has been taken (the first? the last? something between?).
+            common_predict = PREDICT & predicts.keys()
+            if len(common_predict) != 0:
+                msg = "Grammar is not in LL(1): {} does predict:\n".format(common_predict)
+                for lookahead in common_predict:
+                    msg += " " + repr(predicts[lookahead]) + "\n"
+                msg += " " + repr(rule) + "\n"
+                raise RuntimeError(msg)
+
+            # Save PREDICT terminals for the upper verification of further non-terminal rules.
+            for lookahead in PREDICT:
+                predicts[lookahead] = rule
+            ret.append((rule, PREDICT))
+        return ret
+
+    def variables(self, rule):
+        """Returns the variable names for the symbols of a rule.
+
+        The first entry is the name of the non-terminal ($0), followed
+        by one variable for every non-epsilon symbol ($1, $2, ...).
+        """
+        variables = [repr(rule.lhs.name)]
+        for idx, symbol in enumerate(rule.rhs):
+            if not isinstance(symbol, Epsilon):
+                variables.append("var_{}".format(idx))
+        return variables
+
+    def action(self, rule):
+        """Returns the action of a rule as Python expression, or None if the rule has no action."""
+        if not rule.action:
+            return None
+        action_value = rule.action
+        for idx, value in enumerate(self.variables(rule)):
+            action_value = action_value.replace("${}".format(idx), value)
+        return action_value.strip()
+
     def generate(self, writeLn):
         """Generates the parser for an initially given grammar.
 
@@ -95,56 +151,32 @@ class ParserGenerator:
             writeLn()
             writeLn()
             writeLn(S * 0 + "def {}(token_stream: BaseScanner, parse_tree=False):".format(NT.name))
-            predicts = {}
-            assert len(NT.rules) > 0, "{} has no rules, probably you mixed up tokens and rules".format(NT.name)
             # For every rule use the PREDICT set to decide which tokens to expect.
-            for rule in NT.rules:
-                PREDICT = self.analysis.PREDICT(rule)
+            for rule, PREDICT in self.predicts(NT):
                 writeLn(S * 1 + "#  PREDICT({}): {}".format(rule, PREDICT))
 
-                # Make sure that the PREDICT set for all rules of a specific non-terminal is unique.
-                # This is necessary because if multiple rules of one non-terminal share the same PREDICT set
-                # then we can't decide which rule has been taken (the first? the last? something between?).
-                common_predict = PREDICT & predicts.keys()
-                if len(common_predict) != 0:
-                    msg = "Grammar is not in LL(1): {} does predict:\n".format(common_predict)
-                    for lookahead in common_predict:
-                        msg += " " + repr(predicts[lookahead]) + "\n"
-                    msg += " " + repr(rule) + "\n"
-                    raise RuntimeError(msg)
-
-                # Save PREDICT terminals for the upper verification of further non-terminal rules.
-                for lookahead in PREDICT:
-                    predicts[lookahead] = rule
-
                 # The next token has to be one of our PREDICT terminals.
                 writeLn(S * 1 + "if token_stream.peek() in {}:".format([x.name for x in PREDICT]))
-                variables = [repr(rule.lhs.name)]
                 # Create a variable for every word of the right-hand side of the rule.
                 for idx, symbol in enumerate(rule.rhs):
                     name = "var_{}".format(idx)
                     # Read the terminal token by expecting its type.
                     if isinstance(symbol, Terminal):
                         writeLn(S * 2 + "{} = token_stream.read(expected={})".format(name, repr(symbol.name)))
-                        variables.append(name)
                     elif isinstance(symbol, Epsilon):
                         writeLn(S * 2 + "# Skip Epsilon")
                     # Non-terminal because a symbol can only be a terminal, a non-terminal or epsilon.
                     # For non-terminals we call the corresponding functions.
                     else:
                         writeLn(S * 2 + "{} = {}(token_stream, parse_tree)".format(name, symbol.name))
-                        variables.append(name)
                 # If an action has been defined within the grammar definition use that return format
                 # if the parse_tree parameter is false.
-                if rule.action:
-                    action_value = rule.action
-                    for idx, value in enumerate(variables):
-                        action_value = action_value.replace("${}".format(idx), value)
-
+                action = self.action(rule)
+                if action is not None:
                     writeLn(S * 2 + "if not parse_tree:")
-                    writeLn(S * 2 + "    return {}".format(action_value.strip()))
+                    writeLn(S * 2 + "    return {}".format(action))
                 # Otherwise simply return all variables as a list.
-                parse_tree = "[{}]".format(", ".join(variables))
+                parse_tree = "[{}]".format(", ".join(self.variables(rule)))
                 writeLn(S * 2 + "return {}".format(parse_tree))
             # Raise an error because if we reach this statement that means that the next token
             # is not one of our predicted terminals of the PREDICT set and this is an error.
@@ -161,6 +193,105 @@ class ParserGenerator:
         self.__gen_pretty_print__(writeLn)
 
 
+class TableParserGenerator(ParserGenerator):
+    """Creates a table-driven parser for a given grammar.
+
+    Instead of one recursive function per non-terminal, the generated
+    module contains an integer-encoded PREDICT table (non-terminal x
+    terminal -> rule index) and the encoded rules. The iterative stack
+    machine in parserll1.parser.TableParser walks these tables. Thereby,
+    choosing a rule is a table lookup and deeply nested input does not
+    run into Python's recursion limit.
+    """
+
+    def generate(self, writeLn):
+        """Generates the table-driven parser for an initially given grammar.
+
+        :param writeLn: A function used to write the output.
+        """
+        # Indent
+        S = "    "
+
+        writeLn("################################################################")
+        writeLn("from parserll1.parser import TableParser")
+        for name, module in self.grammar.imports.items():
+            writeLn("import {} as {}".format(module, name))
+
+        terminals = list(self.grammar.terminals.values())
+        nonterminals = list(self.grammar.nonterminals.values())
+        terminal_ids = {T: idx for idx, T in enumerate(terminals)}
+        nonterminal_ids = {NT: idx for idx, NT in enumerate(nonterminals)}
+
+        # Non-terminals are encoded by their row in the PREDICT table,
+        # terminals by the bitwise complement (~idx) of their column.
+        rules = []
+        table = []
+        for NT in nonterminals:
+            row = [-1] * len(terminals)
+            for rule, PREDICT in self.predicts(NT):
+                for lookahead in PREDICT:
+                    row[terminal_ids[lookahead]] = len(rules)
+                rules.append(rule)
+            table.append(row)
+
+        writeLn()
+        writeLn("TERMINALS = {}".format([T.name for T in terminals]))
+        writeLn("NONTERMINALS = {}".format([NT.name for NT in nonterminals]))
+        writeLn()
+        writeLn("# PREDICT[non-terminal][terminal] -> rule index (-1: syntax error)")
+        writeLn("PREDICT = (")
+        for NT, row in zip(nonterminals, table):
+            writeLn(S * 1 + "{},  # {}".format(tuple(row), NT.name))
+        writeLn(")")
+
+        # Every rule is a (lhs, rhs) tuple of encoded symbols. Epsilons are dropped.
+        writeLn()
+        writeLn("RULES = (")
+        for idx, rule in enumerate(rules):
+            rhs = []
+            for symbol in rule.rhs:
+                if isinstance(symbol, Terminal):
+                    rhs.append(~terminal_ids[symbol])
+                elif not isinstance(symbol, Epsilon):
+                    rhs.append(nonterminal_ids[symbol])
+            writeLn(S * 1 + "({}, {}),  # {}: {}".format(nonterminal_ids[rule.lhs], tuple(rhs), idx, rule))
+        writeLn(")")
+
+        # The rule actions get the values of the non-epsilon symbols as arguments.
+        for idx, rule in enumerate(rules):
+            action = self.action(rule)
+            if action is None:
+                continue
+            writeLn()
+            writeLn()
+            writeLn("def __action_{}__({}):".format(idx, ", ".join(self.variables(rule)[1:])))
+            writeLn(S * 1 + "return {}".format(action))
+
+        writeLn()
+        writeLn()
+        writeLn("ACTIONS = (")
+        for idx, rule in enumerate(rules):
+            writeLn(S * 1 + "{},".format("__action_{}__".format(idx) if self.action(rule) is not None else None))
+        writeLn(")")
+        writeLn()
+        writeLn("__parser__ = TableParser(TERMINALS, NONTERMINALS, PREDICT, RULES, ACTIONS)")
+
+        # Keep the interface of the recursive-descent parser: one function per non-terminal
+        for NT in nonterminals:
+            writeLn()
+            writeLn()
+            writeLn("def {}(token_stream: BaseScanner, parse_tree=False):".format(NT.name))
+            writeLn(S * 1 + "return __parser__.parse(token_stream, {}, parse_tree)".format(nonterminal_ids[NT]))
+
+        writeLn()
+        writeLn()
+        writeLn("def parse(text, *args, **kwargs):")
+        writeLn("    scanner = Scanner(text)")
+        writeLn("    return {}(scanner, *args, **kwargs)".format(self.grammar.start_symbol.name))
+
+        self.__gen_pretty_print__(writeLn)
+
+
 class ScannerGenerator:
     """Creates a scanner for a given grammar.
 
@@ -223,13 +354,16 @@ def _get_parser_directory():
     return os.path.join(base_path, "generated")
 
 
-def _get_parser_path(grammar_name):
+def _get_parser_path(grammar_name, table=False):
     """Returns the relative file path of a generated parser for the given grammar name.
 
     :param grammar_name: The name of the grammar.
+    :param table: Return the path of the table-driven parser.
     :return: Relative path to the parser file, starting at the current directory.
     """
     base, _ = os.path.splitext(grammar_name)
+    if table:
+        base += "_table"
     return os.path.join(_get_parser_directory(), base + ".py")
 
 
@@ -322,16 +456,156 @@ def parse_grammar(file_path):
     return grammar
 
 
-def load_parser(grammar_name, silent=False):
+# Source files whose content determines the generated code. Changing one of them invalidates all cached parsers.
+_GENERATOR_SOURCES = ["generator.py", "grammar.py", "analysis.py"]
+_CACHE_HEADER = "# parserll1 cache key: "
+# The umask can only be read by setting it, which is only safe at import time before any threads write files.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@functools.cache
+def _generator_version():
+    """Returns a hash of the parser generator sources.
+
+    :return: Hex digest identifying the version of the generator.
+    """
+    digest = hashlib.sha256()
+    for name in _GENERATOR_SOURCES:
+        with open(os.path.join(os.path.dirname(__file__), name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _get_cache_key(grammar_file_path, table=False):
+    """Returns the cache key of a parser generated from the given grammar file.
+
+    :param grammar_file_path: Path to the grammar file.
+    :param table: Whether the key is for a table-driven parser.
+    :return: Hex digest over the grammar text, the generator version and the parser kind.
+    """
+    digest = hashlib.sha256()
+    with open(grammar_file_path, "rb") as f:
+        digest.update(f.read())
+    digest.update(_generator_version().encode())
+    digest.update(b"table" if table else b"recursive")
+    return digest.hexdigest()
+
+
+def _read_cache_key(parser_file_path):
+    """Returns the cache key stored in the header of a generated parser or None if there is none.
+
+    :param parser_file_path: Path to the generated parser.
+    """
+    try:
+        with open(parser_file_path) as f:
+            header = f.readline()
+    except FileNotFoundError:
+        return None
+    if not header.startswith(_CACHE_HEADER):
+        return None
+    return header[len(_CACHE_HEADER) :].strip()
+
+
+def _atomic_write(file_path, data: bytes):
+    """Atomically replaces the file under file_path with the given data.
+
+    The data is written to a temporary file in the same directory, which
+    is renamed afterwards. Thereby, concurrent processes either see the
+    old or the new file but never a partially written one. Like a file
+    created by open(), the new file gets the permissions of the umask
+    (read at import time).
+
+    :param file_path: Path to the file to write.
+    :param data: The new content of the file.
+    """
+    directory = os.path.dirname(file_path)
+    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        # mkstemp() creates the file only readable by the owner.
+        os.fchmod(fd, 0o666 & ~_UMASK)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def generate_source(grammar, table=False):
+    """Returns the Python source of a scanner and a parser for the given grammar.
+
+    :param grammar: The grammar to generate the parser for.
+    :param table: Generate a table-driven parser instead of a recursive-descent parser.
+    :return: The source code of the parser module.
+    """
+    lines = []
+
+    # Pass a write function to the generator classes.
+    def writeLn(x=""):
+        lines.append(x + "\n")
+
+    ScannerGenerator(grammar).generate(writeLn)
+    (TableParserGenerator if table else ParserGenerator)(grammar).generate(writeLn)
+    return "".join(lines)
+
+
+def build_parser(grammar, table=False, name="parser", cache_dir=None):
+    """Builds a parser for the given grammar in memory.
+
+    The generated source is compiled and executed within a fresh module
+    object, nothing is written to the source tree. If cache_dir is given,
+    the compiled bytecode is stored there, keyed by the hash of the
+    generated source and the Python version.
+
+    :param grammar: The grammar to build a parser for.
+    :param table: Build a table-driven parser instead of a recursive-descent parser.
+    :param name: The name of the module object.
+    :param cache_dir: Optional directory for a persistent bytecode cache.
+    :return: Module object of the parser providing parse(), pprint(), Scanner and the non-terminal functions.
+    """
+    source = generate_source(grammar, table)
+    filename = "<parser {}>".format(name)
+
+    code = None
+    if cache_dir is not None:
+        digest = hashlib.sha256(importlib.util.MAGIC_NUMBER + source.encode())
+        cache_path = os.path.join(cache_dir, digest.hexdigest() + ".pyc")
+        try:
+            with open(cache_path, "rb") as f:
+                code = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            code = None
+    if code is None:
+        code = compile(source, filename, "exec")
+        if cache_dir is not None:
+            try:
+                _atomic_write(cache_path, marshal.dumps(code))
+            except OSError as e:
+                logger.warning("Cannot write bytecode cache {}: {}".format(cache_path, e))
+
+    module = types.ModuleType(name)
+    module.__file__ = filename
+    exec(code, module.__dict__)
+    return module
+
+
+def load_parser(grammar_name, silent=False, table=False):
     """Loads a parser for a given grammar name.
 
+    The generated parser is cached under parserll1/generated. It is only
+    regenerated if the cache key in its header does not match the hash of
+    the grammar text and the generator version. If the generated parser
+    cannot be written (e.g. in a read-only source tree), the parser is
+    built in memory instead.
+
     :param grammar_name: The name of the grammar to load a parser for.
+    :param table: Load a table-driven parser instead of a recursive-descent parser.
     :return: Loaded parser file of the given grammar.
     """
-    parser_file_path = _get_parser_path(grammar_name)
+    parser_file_path = _get_parser_path(grammar_name, table)
     grammar_file_path = _get_grammar_path(grammar_name)
-    directory = os.path.dirname(__file__)
-    files = [grammar_file_path] + [os.path.join(directory, x) for x in os.listdir(directory)]
 
     if not grammar_file_path and not os.path.exists(parser_file_path):
         raise RuntimeError("No grammar or parser for {} was found".format(grammar_name))
@@ -339,31 +613,19 @@ def load_parser(grammar_name, silent=False):
     # We want to generate a new parser for the given grammar if:
     # - The grammar exists
     # - Currently no parser exists
-    # - The files within the directory have been updated and therefore
+    # - The grammar or the generator has been changed and therefore
     #   the existing parser is out-of-date.
-    if grammar_file_path and (
-        not os.path.exists(parser_file_path)
-        or any([fn and os.stat(fn).st_mtime >= os.stat(parser_file_path).st_mtime for fn in files])
-    ):
-        grammar = load_grammar(grammar_name)
-        logger.info("Generating parser: {}".format(parser_file_path))
-        try:
-            parser_dir = _get_parser_directory()
-            pathlib.Path(parser_dir).mkdir(parents=True, exist_ok=True)
-
-            # Pass a write function to the generator classes.
-            # Using the write function the generator classes can write directly
-            # to the file under the path parser_file_path.
-            with open(parser_file_path, "w+") as fd:
-
-                def writeLn(x=""):
-                    fd.write(x + "\n")
-
-                ScannerGenerator(grammar).generate(writeLn)
-                ParserGenerator(grammar).generate(writeLn)
-        except Exception as e:
-            os.unlink(parser_file_path)
-            raise e
+    if grammar_file_path:
+        cache_key = _get_cache_key(grammar_file_path, table)
+        if _read_cache_key(parser_file_path) != cache_key:
+            grammar = load_grammar(grammar_name)
+            logger.info("Generating parser: {}".format(parser_file_path))
+            source = generate_source(grammar, table)
+            try:
+                _atomic_write(parser_file_path, (_CACHE_HEADER + cache_key + "\n" + source).encode())
+            except OSError as e:
+                logger.warning("Cannot write {}, building the parser in memory: {}".format(parser_file_path, e))
+                return build_parser(grammar, table, name=os.path.splitext(grammar_name)[0])
 
     # After parser generation load the generated parser module.
     return _load_module(parser_file_path)
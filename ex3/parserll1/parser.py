@@ -0,0 +1,78 @@
+from typing import Callable, Optional, Sequence
+
+from parserll1.scanner import BaseScanner
+
+
+class TableParser:
+    """Iterative LL(1) parser driven by a PREDICT table.
+
+    Symbols are encoded as integers: a non-terminal by its row in the
+    PREDICT table, a terminal by the bitwise complement (~idx) of its
+    column. Every rule is a (lhs, rhs) tuple of encoded symbols without
+    epsilons. Instead of calling one function per non-terminal, the parser
+    keeps an explicit stack of the symbols still to be matched. Hence, the
+    nesting depth of the input is not limited by Python's recursion limit.
+    """
+
+    def __init__(
+        self,
+        terminals: Sequence[str],
+        nonterminals: Sequence[str],
+        predict: Sequence[Sequence[int]],
+        rules: Sequence[tuple[int, Sequence[int]]],
+        actions: Sequence[Optional[Callable]],
+    ):
+        self.terminals = list(terminals)
+        self.nonterminals = list(nonterminals)
+        self.rules = rules
+        self.actions = actions
+        # Rows of the PREDICT table keyed by token type for a single lookup per expansion.
+        self.predict = [{terminals[t]: rule for t, rule in enumerate(row) if rule >= 0} for row in predict]
+        # Symbols pushed on the stack when a rule is expanded, in reversed order: Non-terminals
+        # by their index, terminals by their name and a marker (~rule index) to reduce the rule.
+        self.expansions = [
+            (~idx, *[terminals[~x] if x < 0 else x for x in reversed(rhs)]) for idx, (_, rhs) in enumerate(rules)
+        ]
+        # (number of values, action, non-terminal name) of every rule
+        self.reductions = [(len(rhs), action, nonterminals[lhs]) for (lhs, rhs), action in zip(rules, actions)]
+
+    def parse(self, token_stream: BaseScanner, start: int, parse_tree=False):
+        """Parses the token stream starting with the given non-terminal.
+
+        :param token_stream: The token stream to parse.
+        :param start: The encoded start non-terminal.
+        :param parse_tree: Return the parse tree instead of applying the rule actions.
+        :return: The value of the start non-terminal.
+        """
+        predict, expansions, reductions = self.predict, self.expansions, self.reductions
+        tokens = token_stream.token_stream
+
+        # Symbols still to be matched and values of the symbols matched so far.
+        stack = [start]
+        values: list = []
+        while stack:
+            symbol = stack.pop()
+            if symbol.__class__ is str:
+                # Terminal: consume the next token if it has the expected type.
+                if tokens[0].type != symbol:
+                    token_stream.raise_error(expected=symbol)
+                values.append(tokens.popleft())
+            elif symbol >= 0:
+                # Non-terminal: expand the rule predicted by the next token.
+                rule = predict[symbol].get(tokens[0].type)
+                if rule is None:
+                    token_stream.raise_error()
+                stack.extend(expansions[rule])
+            else:
+                # The rule has been matched completely, reduce its values to a single value.
+                count, action, name = reductions[~symbol]
+                if count:
+                    args = values[-count:]
+                    del values[-count:]
+                else:
+                    args = []
+                if parse_tree or action is None:
+                    values.append([name, *args])
+                else:
+                    values.append(action(*args))
+        return values[0]
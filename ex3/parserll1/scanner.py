@@ -1,5 +1,6 @@
 import re
-from typing import Optional, NoReturn
+from collections import deque
+from typing import Callable, Iterator, Optional, NoReturn, Sequence
 
 
 class ScannerError(RuntimeError):
@@ -23,7 +24,7 @@ class Token:
 
 class BaseScanner:
     scanner_table: list[tuple[str, str, bool]] = []
-    token_stream: list[Token]
+    token_stream: deque[Token]
     regex: dict[str, re.Pattern]
     skip: dict[str, bool]
 
@@ -34,50 +35,109 @@ class BaseScanner:
             self.regex[token] = re.compile(regex, re.M)
             self.skip[token] = skip
 
-        # This scanner is very ineffective and scans the whole text
-        # before doing anything else. However, thereby you can look at
-        # the token_stream at any given point in time.
-        self.token_stream = []
-
-        # Just lex the whole text
+        # We still scan the whole text before doing anything else.
+        # Thereby, you can look at the token_stream at any given point
+        # in time. Use scan() directly to get the tokens lazily. The
+        # deque lets us consume tokens from the front in O(1).
+        self.token_stream = deque(self.scan(text))
+
+    @classmethod
+    def _combined_regex(cls) -> Optional[tuple[re.Pattern, tuple[int, ...]]]:
+        """Returns a single pattern that tries all token regexes at once.
+
+        Every token regex is wrapped into an optional lookahead with its
+        own group. Thereby, one match() call reports the lexeme of every
+        token that matches at the given position and we can still pick
+        the longest one. Returns None if the regexes cannot be combined
+        (e.g., because they use numbered backreferences or inline flags).
+        """
+        if "_combined" not in cls.__dict__:
+            cls._combined = None
+            regexes = [regex for _, regex, _ in cls.scanner_table]
+            # Numbered backreferences would point to the wrong group after combining
+            if not any(re.search(r"\\[1-9]", regex) for regex in regexes):
+                parts = ["(?=(?P<_T{}>{}))?".format(idx, regex) for idx, regex in enumerate(regexes)]
+                try:
+                    pattern = re.compile("".join(parts), re.M)
+                    groups = tuple(pattern.groupindex["_T{}".format(idx)] for idx in range(len(parts)))
+                    cls._combined = (pattern, groups)
+                except re.error:
+                    pass
+        return cls._combined
+
+    def _matcher(self, text: str) -> Callable[[int], Sequence[Optional[str]]]:
+        """Returns a function that gives the lexeme of every token (in
+        table order) at a given position in text, or None if it does not match."""
+        combined = self._combined_regex()
+        if combined:
+            pattern, groups = combined
+            if len(groups) == 1:
+                return lambda pos: (pattern.match(text, pos).group(groups[0]),)
+            return lambda pos: pattern.match(text, pos).group(*groups)
+
+        regexes = [self.regex[name] for name, _, _ in self.scanner_table]
+
+        def match(pos):
+            return [m.group(0) if m else None for m in (regex.match(text, pos) for regex in regexes)]
+
+        return match
+
+    def scan(self, text: str) -> Iterator[Token]:
+        """Lazily produces the (non-skipped) tokens of text.
+
+        Instead of slicing off every lexeme, we only move a position
+        through the text. Thereby, scanning is linear in the size of
+        the text. If multiple tokens match, the longest lexeme wins;
+        on a tie, the token that comes first in the scanner_table wins.
+        """
+        names = [name for name, _, _ in self.scanner_table]
+        skip = self.skip
+        match = self._matcher(text)
+        end = len(text)
         line = 1
         col = 0
+        pos = 0
         while True:
-            token, lexeme = None, ""
-            for name, regex in self.regex.items():
-                m = regex.match(text)
-                if m and (not token or len(m.group(0)) > len(lexeme)):
-                    token = name
-                    lexeme = m.group(0)
-            if token is None:
-                msg = "Cannot scan: {}...".format(repr(text[:20]))
+            lexemes = match(pos)
+            lengths = [-1 if candidate is None else len(candidate) for candidate in lexemes]
+            # max() and index() pick the first token with the longest lexeme
+            length = max(lengths)
+            if length < 0 or (length == 0 and pos < end):
+                msg = "Cannot scan: {}...".format(repr(text[pos : pos + 20]))
                 raise ScannerError(msg)
 
+            idx = lengths.index(length)
+            token, lexeme = names[idx], lexemes[idx]
+
             # Push token to token stream
-            if not self.skip[token]:
-                self.token_stream.append(Token(token, lexeme, line, col))
+            if not skip[token]:
+                yield Token(token, lexeme, line, col)
 
             # Consume text
-            text = text[len(lexeme) :]
+            pos += length
             if "\n" in lexeme:
                 line += lexeme.count("\n")
-                col = len(lexeme[lexeme.rindex("\n") + 1 :])
+                col = length - lexeme.rindex("\n") - 1
             else:
-                col += len(lexeme)
+                col += length
 
-            if text == "" and lexeme == "":
+            if pos == end and length == 0:
                 break
 
-    def peek(self):
-        return self.token_stream[0].type
+    def peek(self, k: int = 0) -> str:
+        """Returns the type of the k-th next token without consuming it.
+        Looking beyond the end of the stream yields the last token (EOF)."""
+        if k >= len(self.token_stream):
+            k = len(self.token_stream) - 1
+        return self.token_stream[k].type
 
     def read(self, expected: Optional[str] = None):
         if expected and self.peek() != expected:
             self.raise_error(expected=expected)
-        return self.token_stream.pop(0)
+        return self.token_stream.popleft()
 
     def raise_error(self, expected: Optional[str] = None) -> NoReturn:
-        token = self.token_stream.pop(0)
+        token = self.token_stream.popleft()
         msg = "Unexpected token: {} (line: {}, col: {})".format(token.type, token.line, token.col)
         if expected:
             msg += ", expected: {}".format(expected)
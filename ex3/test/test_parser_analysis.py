@@ -3,7 +3,7 @@ import unittest
 
 # Entities to test
 from parserll1.analysis import LL1Analysis
-from parserll1.grammar import Terminal
+from parserll1.grammar import Grammar, Terminal
 
 
 class TestLL1Analysis(unittest.TestCase):
@@ -1087,6 +1087,31 @@ class TestLL1Analysis(unittest.TestCase):
         self.assertEqual(len(errors), 0, msg=full_message)
 
 
+class TestLL1AnalysisFixpoint(unittest.TestCase):
+    """Tests the fixpoint computation on mutually recursive, nullable non-terminals."""
+
+    def test_mutual_recursion(self):
+        """Sets propagate through cycles of nullable non-terminals."""
+        grammar = Grammar()
+        a, b, eof = grammar.T("a", "a"), grammar.T("b", "b"), grammar.T("EOF", "$")
+        S, A, B = grammar.NT("S", True), grammar.NT("A"), grammar.NT("B")
+        grammar.addRule(S, [A, eof])
+        grammar.addRule(A, [B, a, A])
+        grammar.addRule(A, [grammar.E])
+        grammar.addRule(B, [A, b])
+        grammar.addRule(B, [grammar.E])
+        analysis = LL1Analysis(grammar)
+
+        self.assertTrue(analysis.EPS([A, B]))
+        self.assertFalse(analysis.EPS([A, b]))
+        self.assertEqual(analysis.FIRST([A]), {a, b})
+        self.assertEqual(analysis.FIRST([grammar.E, B, eof]), {a, b, eof})
+        self.assertEqual(analysis.FOLLOW(A), {b, eof})
+        self.assertEqual(analysis.FOLLOW(B), {a})
+        self.assertEqual(analysis.PREDICT(A.rules[0]), {a, b})
+        self.assertEqual(analysis.PREDICT(A.rules[1]), {b, eof})
+
+
 # Start unit testing when module is directly loaded.
 if __name__ == "__main__":
     unittest.main()
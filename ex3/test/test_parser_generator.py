@@ -0,0 +1,146 @@
+# Unit testing framework
+import os
+import tempfile
+import unittest
+
+# Entities to test
+from parserll1 import generator
+from parserll1.generator import _get_grammar_path, _get_parser_path, build_parser, load_grammar, load_parser
+from parserll1.grammar import Grammar
+from parserll1.scanner import ParserError
+
+
+def generate(grammar_name, table=False):
+    """Builds a parser for the given grammar in memory."""
+    return build_parser(load_grammar(grammar_name), table, name=grammar_name)
+
+
+class TestTableParser(unittest.TestCase):
+    """Tests the table-driven parser against the recursive-descent parser."""
+
+    program = """
+        func fib(n : int) : int {
+            var a : int;
+            a := 0;
+            while (n >= 2) {
+                if (n == 2) { a := a + 1; } else { a := a + fib(n - 1) * 2 / 3; }
+                n := n - 1;
+            }
+            return !a <= -(&a) + *b;
+        }
+    """
+
+    def test_parse_tree(self):
+        """Both parsers build the same parse tree."""
+        recursive = generate("L")
+        table = generate("L", table=True)
+        tree = table.parse(self.program, parse_tree=True)
+        self.assertEqual(tree[0], "program")
+        self.assertEqual(repr(tree), repr(recursive.parse(self.program, parse_tree=True)))
+
+    def test_actions(self):
+        """The rule actions get the values of the matched symbols."""
+        recursive = generate("intAdd")
+        table = generate("intAdd", table=True)
+        result = table.parse("1 + 2 + 3")
+        self.assertEqual([x if isinstance(x, str) else x.load for x in result], ["+", "1", "2", "3"])
+        self.assertEqual(repr(result), repr(recursive.parse("1 + 2 + 3")))
+
+    def test_syntax_error(self):
+        """Tokens outside of the PREDICT set are reported like in the recursive-descent parser."""
+        table = generate("L", table=True)
+        with self.assertRaisesRegex(ParserError, "^Unexpected token: SEMICOLON \\(line: 1, col: 20\\)$"):
+            table.parse("func f() : int { 1 +; }")
+
+    def test_deep_nesting(self):
+        """Input nested deeper than the recursion limit can be parsed."""
+        table = generate("L", table=True)
+        depth = 5000
+        program = "func f() : int { return " + "(" * depth + "1" + ")" * depth + "; }"
+        table.parse(program, parse_tree=True)
+        result = generate("intAdd", table=True).parse(" + ".join(["1"] * depth))
+        self.assertEqual(len(result), depth + 1)
+
+
+class TestBuildParser(unittest.TestCase):
+    """Tests building parsers in memory."""
+
+    def grammar(self):
+        """A grammar for lists of numbers which is not stored in a file."""
+        grammar = Grammar()
+        grammar.T("NUM", "[0-9]+")
+        grammar.T("COMMA", ",")
+        grammar.T("EOF", "$")
+        grammar.T("WS", "[ ]+", skip=True)
+        lst, tail = grammar.NT("list", True), grammar.NT("tail")
+        num, comma, eof = grammar.T("NUM"), grammar.T("COMMA"), grammar.T("EOF")
+        grammar.addRule(lst, [num, tail, eof], "[int($1.load)] + $2")
+        grammar.addRule(tail, [comma, num, tail], "[int($2.load)] + $3")
+        grammar.addRule(tail, [grammar.E], "[]")
+        return grammar
+
+    def test_custom_grammar(self):
+        """Parsers for grammars built in-process run without touching the generated directory."""
+        before = os.listdir(os.path.dirname(_get_parser_path("list")))
+        for table in (False, True):
+            parser = build_parser(self.grammar(), table, name="list")
+            self.assertEqual(parser.__name__, "list")
+            self.assertEqual(parser.parse("1, 2 ,3"), [1, 2, 3])
+        self.assertEqual(os.listdir(os.path.dirname(_get_parser_path("list"))), before)
+
+    def test_bytecode_cache(self):
+        """The compiled parser is stored in and loaded from the cache directory."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            build_parser(self.grammar(), cache_dir=cache_dir)
+            (cache_file,) = os.listdir(cache_dir)
+            mtime = os.stat(os.path.join(cache_dir, cache_file)).st_mtime_ns
+            parser = build_parser(self.grammar(), cache_dir=cache_dir)
+            self.assertEqual(parser.parse("4,2"), [4, 2])
+            self.assertEqual(os.listdir(cache_dir), [cache_file])
+            self.assertEqual(os.stat(os.path.join(cache_dir, cache_file)).st_mtime_ns, mtime)
+
+
+class TestParserCache(unittest.TestCase):
+    """Tests the content-hash based cache of generated parsers."""
+
+    def setUp(self):
+        self.parser_file_path = _get_parser_path("intAdd", table=True)
+        self.existed = os.path.exists(self.parser_file_path)
+        self.grammar_file_path = _get_grammar_path("intAdd")
+        self.grammar_stat = os.stat(self.grammar_file_path)
+
+    def tearDown(self):
+        os.utime(self.grammar_file_path, ns=(self.grammar_stat.st_atime_ns, self.grammar_stat.st_mtime_ns))
+        if not self.existed and os.path.exists(self.parser_file_path):
+            os.unlink(self.parser_file_path)
+
+    def test_unchanged_grammar(self):
+        """A parser is only regenerated if its cache key does not match."""
+        with open(self.parser_file_path, "w") as f:
+            f.write("# outdated\n")
+        with self.assertLogs("parser", "INFO"):
+            load_parser("intAdd", table=True)
+        with open(self.parser_file_path) as f:
+            content = f.read()
+        self.assertTrue(content.startswith("# parserll1 cache key: "))
+
+        # Touching the grammar does not change its content.
+        os.utime(self.grammar_file_path)
+        with self.assertNoLogs("parser", "INFO"):
+            load_parser("intAdd", table=True)
+        with open(self.parser_file_path) as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual([x for x in os.listdir(os.path.dirname(self.parser_file_path)) if x.endswith(".tmp")], [])
+
+    def test_permissions(self):
+        """A regenerated parser gets the permissions of the umask, like a file created by open()."""
+        with open(self.parser_file_path, "w") as f:
+            f.write("# outdated\n")
+        with self.assertLogs("parser", "INFO"):
+            load_parser("intAdd", table=True)
+        self.assertEqual(os.stat(self.parser_file_path).st_mode & 0o777, 0o666 & ~generator._UMASK)
+
+
+# Start unit testing when module is directly loaded.
+if __name__ == "__main__":
+    unittest.main()
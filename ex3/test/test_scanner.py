@@ -0,0 +1,81 @@
+# Unit testing framework
+import unittest
+
+# Entities to test
+from parserll1.scanner import BaseScanner, ParserError, ScannerError
+
+
+class Scanner(BaseScanner):
+    """A small scanner whose keywords are prefixes of identifiers."""
+
+    scanner_table = [
+        ("EOF", "$", False),
+        ("WS", "[\n\t ]+", True),
+        ("VAR", "var", False),
+        ("IDENT", "[a-z]+", False),
+        ("ASSIGN", ":=", False),
+        ("COLON", ":", False),
+    ]
+
+
+class TestScanner(unittest.TestCase):
+    """Tests the streaming scanner."""
+
+    def tokens(self, text):
+        return [(t.type, t.load, t.line, t.col) for t in Scanner(text).token_stream]
+
+    def test_longest_match(self):
+        """The longest lexeme wins, on a tie the first entry of the scanner table wins."""
+        self.assertEqual(
+            self.tokens("var variable := x:y"),
+            [
+                ("VAR", "var", 1, 0),
+                ("IDENT", "variable", 1, 4),
+                ("ASSIGN", ":=", 1, 13),
+                ("IDENT", "x", 1, 16),
+                ("COLON", ":", 1, 17),
+                ("IDENT", "y", 1, 18),
+                ("EOF", "", 1, 19),
+            ],
+        )
+
+    def test_line_and_column(self):
+        """Skipped tokens still advance the line and column counters."""
+        self.assertEqual(
+            self.tokens("a\n  b \n\nc"),
+            [("IDENT", "a", 1, 0), ("IDENT", "b", 2, 2), ("IDENT", "c", 4, 0), ("EOF", "", 4, 1)],
+        )
+
+    def test_lazy_scan(self):
+        """scan() produces tokens before it reaches the invalid part of the text."""
+        tokens = Scanner("").scan("a b ?")
+        self.assertEqual(next(tokens).load, "a")
+        self.assertEqual(next(tokens).load, "b")
+        with self.assertRaises(ScannerError):
+            next(tokens)
+
+    def test_error(self):
+        """Invalid characters are reported with the remaining text."""
+        with self.assertRaisesRegex(ScannerError, "Cannot scan: '\\?b'"):
+            Scanner("a ?b")
+
+    def test_peek_and_read(self):
+        """peek(k) looks ahead without consuming, read() consumes in order."""
+        scanner = Scanner("var x := y")
+        self.assertEqual([scanner.peek(k) for k in range(6)], ["VAR", "IDENT", "ASSIGN", "IDENT", "EOF", "EOF"])
+        self.assertEqual(scanner.read(expected="VAR").load, "var")
+        self.assertEqual(scanner.read().load, "x")
+        self.assertEqual(scanner.peek(), "ASSIGN")
+        self.assertEqual(scanner.peek(1), "IDENT")
+
+    def test_unexpected_token(self):
+        """Reading an unexpected token reports its position and the expected token."""
+        scanner = Scanner("x\n  :=")
+        scanner.read()
+        with self.assertRaisesRegex(ParserError, "^Unexpected token: ASSIGN \\(line: 2, col: 2\\), expected: COLON$"):
+            scanner.read(expected="COLON")
+
+
+# Start unit testing when module is directly loaded.
+if __name__ == "__main__":
+    unittest.main()